@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.core.db import get_db
 from app.services.agent_export_service import AgentExportService
@@ -15,6 +18,25 @@ def export_all(db: Session = Depends(get_db)):
     return AgentExportService.export_all(db)
 
 
+@router.get("/export/stream", summary="Exportar todos os agentes (NDJSON)")
+def export_stream(
+    gzip: bool = Query(False, description="Comprime o fluxo em gzip (.ndjson.gz)"),
+    db: Session = Depends(get_db),
+):
+    """
+    Transmite todos os agentes com seus prompts em NDJSON (cabeçalho + um agente
+    por linha), lidos do banco em lotes: a memória não cresce com o catálogo.
+    """
+    stream = AgentExportService.export_ndjson(db, compress=gzip)
+    if gzip:
+        return StreamingResponse(
+            stream,
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="agents.ndjson.gz"'},
+        )
+    return StreamingResponse(stream, media_type="application/x-ndjson")
+
+
 @router.get("/{agent_id}/export", response_model=AgentsExportPackage, summary="Exportar agente específico")
 def export_one(agent_id: int, db: Session = Depends(get_db)):
     """
@@ -27,13 +49,46 @@ def export_one(agent_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/import", summary="Importar agentes")
-def import_agents(agents: list[AgentImportSchema], db: Session = Depends(get_db)):
+def import_agents(
+    agents: list[AgentImportSchema],
+    dry_run: bool = Query(False, description="Apenas calcula as estatísticas, sem gravar"),
+    db: Session = Depends(get_db),
+):
+    """
+    Importa agentes e prompts a partir de um pacote exportado (upsert em lotes).
+    Retorna estatísticas de criação/atualização de agentes e prompts.
+    """
+    try:
+        stats = AgentExportService.import_agents(db, agents, dry_run=dry_run)
+        return {"status": "ok", "stats": stats}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Erro ao importar agentes: {str(e)}")
+
+
+@router.post("/import/stream", summary="Importar agentes (NDJSON)")
+async def import_stream(
+    request: Request,
+    dry_run: bool = Query(False, description="Apenas calcula as estatísticas, sem gravar"),
+    db: Session = Depends(get_db),
+):
     """
-    Importa agentes e prompts a partir de um pacote exportado.
-    Retorna estatísticas de criação/atualização.
+    Importa o NDJSON de `/agents/export/stream` (gzip ou não) enviado no corpo,
+    lote a lote, à medida que o corpo é recebido.
     """
+    body = request.stream()
+
+    def chunks():
+        # a importação roda numa thread; cada bloco do corpo é lido no event loop
+        while True:
+            try:
+                yield anyio.from_thread.run(body.__anext__)
+            except StopAsyncIteration:
+                return
+
     try:
-        stats = AgentExportService.import_agents(db, agents)
+        stats = await run_in_threadpool(
+            AgentExportService.import_stream, db, AgentExportService.parse_ndjson(chunks()), dry_run=dry_run
+        )
         return {"status": "ok", "stats": stats}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao importar agentes: {str(e)}")
@@ -1,18 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import json
 from openai import RateLimitError, AuthenticationError
 
-from app.core.db import get_db
+from app.core.db import get_db, get_async_db
 from app.models.agent import Agent
 from app.schemas.agent import AgentSchema, AgentCreate, RunRequest
+from app.schemas.execution_cost import ExecutionCostSchema
 from app.core.logging import get_logger
 from app.services.agent_service import AgentService
 from app.services.agent_execution_service import AgentExecutionService
-from app.services.cost_service import CostService
-from app.services.memory_service import MemoryService
+from app.services.cost_service import (
+    CostService, DEFAULT_PAGE_SIZE as COSTS_PAGE_SIZE, MAX_PAGE_SIZE as COSTS_MAX_PAGE_SIZE
+)
+from app.services.memory_service import memory_service
 
 router = APIRouter(prefix="/agents", tags=["Agentes"])
 logger = get_logger(__name__)
@@ -20,7 +24,6 @@ logger = get_logger(__name__)
 agent_service = AgentService()
 agent_execution_service = AgentExecutionService()
 cost_service = CostService()
-memory_service = MemoryService()
 
 
 # ------------------------
@@ -32,22 +35,25 @@ def create_agent(agent: AgentCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[AgentSchema], summary="Listar agentes")
-def list_agents(db: Session = Depends(get_db)):
-    return agent_service.list(db)
+async def list_agents(db: AsyncSession = Depends(get_async_db)):
+    return await agent_service.alist(db)
 
 
 # ------------------------
 # EXECUÇÃO STREAMING
 # ------------------------
 @router.post("/{agent_id}/run/stream", summary="Executar agente em modo streaming")
-def run_agent_stream(agent_id: int, payload: RunRequest, db: Session = Depends(get_db)):
-    agent = db.query(Agent).filter(Agent.id == agent_id).first()
+async def run_agent_stream(agent_id: int, payload: RunRequest, db: AsyncSession = Depends(get_async_db)):
+    agent = await db.get(Agent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agente não encontrado")
 
-    def generate():
+    # encerra a transação de leitura: a conexão volta ao pool durante a geração
+    await db.commit()
+
+    async def generate():
         try:
-            for event in agent_execution_service.run_stream(db, agent, payload.input):
+            async for event in agent_execution_service.arun_stream(db, agent, payload.input):
                 yield json.dumps(event, ensure_ascii=False) + "\n"
         except RateLimitError:
             yield json.dumps(
@@ -60,7 +66,7 @@ def run_agent_stream(agent_id: int, payload: RunRequest, db: Session = Depends(g
                 ensure_ascii=False,
             ) + "\n"
         except Exception as e:
-            logger.error(f"Erro no streaming: {e}")
+            logger.error("Erro no streaming: %s", e)
             yield json.dumps(
                 {"type": "error", "message": f"Erro inesperado: {str(e)}"},
                 ensure_ascii=False,
@@ -72,17 +78,32 @@ def run_agent_stream(agent_id: int, payload: RunRequest, db: Session = Depends(g
 # ------------------------
 # CUSTOS
 # ------------------------
-@router.get("/{agent_id}/costs", summary="Listar custos de execuções")
-def list_agent_costs(agent_id: int, db: Session = Depends(get_db)):
-    costs = cost_service.list_agent_costs(db, agent_id)
-    if not costs:
+@router.get("/{agent_id}/costs", response_model=List[ExecutionCostSchema], summary="Listar custos de execuções")
+async def list_agent_costs(
+    agent_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(COSTS_PAGE_SIZE, ge=1, le=COSTS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Custos mais recentes do agente, em páginas de até `limit` itens;
+    o cursor da próxima página vem no header `X-Next-Cursor`.
+    """
+    try:
+        costs, next_cursor = await cost_service.alist_agent_costs(db, agent_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not costs and not cursor:
         raise HTTPException(status_code=404, detail="Nenhum custo encontrado para este agente")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return costs
 
 
 @router.get("/{agent_id}/costs/summary", summary="Resumo de custos do agente")
-def summarize_agent_costs(agent_id: int, db: Session = Depends(get_db)):
-    return cost_service.summarize_agent_costs(db, agent_id)
+async def summarize_agent_costs(agent_id: int, db: AsyncSession = Depends(get_async_db)):
+    return await cost_service.asummarize_agent_costs(db, agent_id)
 
 @router.delete("/{agent_id}/memory")
 def clear_memory(agent_id: int, db: Session = Depends(get_db)):
@@ -91,8 +112,8 @@ def clear_memory(agent_id: int, db: Session = Depends(get_db)):
     """
     try:
         memory_service.clear(agent_id)
-        logger.info(f"Memória do agente {agent_id} limpa com sucesso")
+        logger.info("Memória do agente %s limpa com sucesso", agent_id)
         return {"status": "ok", "message": f"Memória do agente {agent_id} foi limpa"}
     except Exception as e:
-        logger.error(f"Erro ao limpar memória do agente {agent_id}: {e}")
+        logger.error("Erro ao limpar memória do agente %s: %s", agent_id, e)
         raise HTTPException(status_code=500, detail="Erro ao limpar memória do agente")
\ No newline at end of file
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from datetime import datetime
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.core.db import get_db
-from app.services.cost_service import CostService
-from app.schemas.execution_cost import AgentCostResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.db import get_db, get_async_db
+from app.services.cost_service import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, CostService
+from app.schemas.execution_cost import AgentCostResponse, ExecutionCostSchema
 from app.core.logging import get_logger
 
 router = APIRouter(prefix="/costs", tags=["Custos"])
@@ -16,21 +21,62 @@ cost_service = CostService()
     response_model=AgentCostResponse,
     summary="Consultar custos de um agente"
 )
-def get_agent_costs(agent_id: int, db: Session = Depends(get_db)):
+async def get_agent_costs(
+    agent_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    bucket: Optional[Literal["hour", "day", "month"]] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
     """
-    Retorna os custos totais e execuções detalhadas de um agente específico.
+    Retorna o custo total e o nº de execuções do agente (agregados no banco),
+    uma página das execuções detalhadas (`next_cursor` leva à próxima) e, com
+    `bucket`, os custos agrupados por hora, dia ou mês.
+    `created_from`/`created_to` limitam o período dos totais, da página e dos agrupamentos.
     """
-    logger.info(f"Consultando custos do agente {agent_id}")
-    costs = cost_service.list_agent_costs(db, agent_id)
+    logger.info("Consultando custos do agente %s", agent_id)
+    total_cost, count = await cost_service.aagent_cost_totals(db, agent_id, created_from, created_to)
 
-    if not costs:
+    if not count:
         raise HTTPException(status_code=404, detail="Nenhum custo encontrado para este agente")
 
-    total_cost = sum(c.cost for c in costs)
-    logger.info(f"Agente {agent_id} possui {len(costs)} execuções, custo total: {total_cost}")
+    try:
+        costs, next_cursor = await cost_service.alist_agent_costs(
+            db, agent_id, limit, cursor, created_from, created_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Agente %s possui %s execuções, custo total: %s", agent_id, count, total_cost)
+
+    rollups = None
+    if bucket:
+        rollups = await cost_service.arollup_agent_costs(db, agent_id, bucket, created_from, created_to)
 
     return {
         "agent_id": agent_id,
         "total_cost": total_cost,
-        "executions": costs
-    }
\ No newline at end of file
+        "executions_count": count,
+        "executions": costs,
+        "next_cursor": next_cursor,
+        "rollups": rollups,
+    }
+
+
+@router.get("/agent/{agent_id}/stream", summary="Exportar custos de um agente (NDJSON)")
+def stream_agent_costs(
+    agent_id: int,
+    db: Session = Depends(get_db),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """
+    Transmite todos os custos do agente em NDJSON (um por linha), lidos do
+    banco em lotes: o histórico completo não é montado em memória.
+    """
+    def generate():
+        for cost in cost_service.iter_agent_costs(db, agent_id, created_from, created_to):
+            yield ExecutionCostSchema.model_validate(cost).model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
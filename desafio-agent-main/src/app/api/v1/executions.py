@@ -1,10 +1,12 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_db
-from app.schemas.execution import ExecutionCreateSchema, ExecutionResponseSchema
-from app.services.execution_service import ExecutionService
+from app.core.db import get_db, get_async_db
+from app.schemas.execution import ExecutionCreateSchema, ExecutionResponseSchema, ExecutionPageSchema
+from app.services.execution_service import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, ExecutionService
 from app.core.logging import get_logger
 
 router = APIRouter(prefix="/executions", tags=["Execuções"])
@@ -28,24 +30,46 @@ def run_execution(exec: ExecutionCreateSchema, db: Session = Depends(get_db)):
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"Erro ao executar agente {exec.agent_id}: {str(e)}")
+        logger.error("Erro ao executar agente %s: %s", exec.agent_id, e)
         raise HTTPException(status_code=500, detail="Erro interno ao executar agente")
 
 
 @router.get(
     "/",
-    response_model=List[ExecutionResponseSchema],
+    response_model=ExecutionPageSchema,
+    response_model_exclude_unset=True,
     summary="Listar execuções"
 )
-def list_executions(
-    db: Session = Depends(get_db),
-    agent_id: Optional[int] = None
+async def list_executions(
+    db: AsyncSession = Depends(get_async_db),
+    agent_id: Optional[int] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="Campos separados por vírgula, ex.: id,agent_id,created_at"),
 ):
     """
-    Lista todas as execuções registradas.
-    Se `agent_id` for fornecido, lista apenas execuções do agente específico.
+    Lista as execuções registradas, das mais recentes para as mais antigas,
+    em páginas de até `limit` itens.
+    Se `agent_id` for fornecido, lista apenas execuções do agente específico;
+    `created_from`/`created_to` limitam o intervalo de datas.
+    Para a próxima página, envie o `next_cursor` recebido em `cursor`.
+    `fields` restringe as colunas retornadas (omitir `input`/`output` deixa a listagem leve).
     """
-    return execution_service.list_executions(db, agent_id)
+    try:
+        items, next_cursor = await execution_service.alist_executions(
+            db,
+            agent_id,
+            limit=limit,
+            cursor=cursor,
+            created_from=created_from,
+            created_to=created_to,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.get(
@@ -53,11 +77,11 @@ def list_executions(
     response_model=ExecutionResponseSchema,
     summary="Buscar execução por ID"
 )
-def get_execution(execution_id: int, db: Session = Depends(get_db)):
+async def get_execution(execution_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retorna os detalhes de uma execução pelo seu ID.
     """
-    exec = execution_service.get_execution(db, execution_id)
+    exec = await execution_service.aget_execution(db, execution_id)
     if not exec:
         raise HTTPException(status_code=404, detail="Execução não encontrada")
     return exec
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
-from app.core.db import get_db
+from app.core.db import get_db, pool_metrics
 from app.services.health_service import HealthService
-from app.core.logging import get_logger
+from app.core.llm_registry import llm_registry
+from app.core.embedding_cache import embedding_cache
+from app.services.rag_answer_cache import rag_answer_cache
+from app.services.rag_store import rag_store_registry
+from app.services.execution_writer import execution_writer
+from app.services.pricing import pricing_engine
+from app.core.logging import get_logger, logging_stats
 
 router = APIRouter(prefix="/health", tags=["Health"])
 logger = get_logger(__name__)
@@ -21,3 +27,68 @@ def health_check(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=status)
 
     return status
+
+
+@router.get("/llm-clients", summary="Estatísticas do registro de clientes LLM")
+def llm_clients_stats():
+    """
+    Retorna tamanho, hits/misses e evicções do registro de clientes LLM.
+    """
+    return llm_registry.stats()
+
+
+@router.get("/embedding-cache", summary="Estatísticas do cache de embeddings")
+def embedding_cache_stats():
+    """
+    Retorna tamanho dos níveis memória/disco, hits por nível, misses e hit rate do cache de embeddings.
+    """
+    return embedding_cache.stats()
+
+
+@router.get("/rag-answer-cache", summary="Estatísticas do cache semântico de respostas RAG")
+def rag_answer_cache_stats():
+    """
+    Retorna tamanho, hits/misses, evicções e invalidações do cache semântico de respostas.
+    """
+    return rag_answer_cache.stats()
+
+
+@router.get("/rag-stores", summary="Partições RAG carregadas")
+def rag_stores_stats():
+    """
+    Retorna as partições RAG (coleções por agente) abertas, carregamentos e descarregamentos.
+    """
+    return rag_store_registry.stats()
+
+
+@router.get("/execution-writer", summary="Estado do buffer write-behind de execuções")
+def execution_writer_stats():
+    """
+    Retorna o modo de gravação, execuções pendentes no buffer, lotes gravados e falhas.
+    """
+    return execution_writer.stats()
+
+
+@router.get("/pricing", summary="Tabela de preços em uso")
+def pricing_stats():
+    """
+    Retorna a versão, o arquivo e o nº de modelos da tabela de preços carregada.
+    """
+    return pricing_engine.stats()
+
+
+@router.get("/db-pool", summary="Telemetria dos pools de conexão")
+def db_pool_stats():
+    """
+    Retorna, para os engines sync e async: conexões em uso/ociosas/overflow, pico
+    de uso, histograma da espera no checkout (ms), timeouts, invalidações e pings.
+    """
+    return {name: metrics.stats() for name, metrics in pool_metrics.items()}
+
+
+@router.get("/logging", summary="Estado da fila de logs")
+def logging_queue_stats():
+    """
+    Retorna tamanho e ocupação da fila de logs e os registros descartados ou amostrados sob sobrecarga.
+    """
+    return logging_stats()
@@ -1,39 +1,134 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.schemas.rag import QueryRequest, QueryResponse, UploadResponse
+import asyncio
+import json
+import os
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.db import get_async_db, get_db
+from app.models.agent import Agent
+from app.schemas.rag import (
+    QueryRequest, QueryResponse, RagJobResponse, RagDocument, SearchRequest, SearchResult
+)
 from app.core.logging import get_logger
-from app.services.rag import RagService
-from app.services.rag_index import index_document
+from app.services.rag import RagService, search_result
+from app.services.rag_index import SUPPORTED_EXTENSIONS, list_documents
+from app.services.rag_jobs import QueueFullError, rag_job_queue, save_upload
 
 router = APIRouter(prefix="/rag", tags=["RAG"])
 logger = get_logger(__name__)
 
 rag_service = RagService()
 
+
+def _require_agent(db: Session, agent_id: int | None):
+    """404 para agente inexistente: leituras não abrem partições de agentes arbitrários."""
+    if agent_id is not None and not db.get(Agent, agent_id):
+        raise HTTPException(status_code=404, detail="Agente não encontrado")
+    # encerra a transação de leitura: a conexão volta ao pool durante a busca/geração
+    db.commit()
+
+
 @router.post("/query", response_model=QueryResponse, summary="Consultar documentos indexados (RAG)")
-def rag_query(payload: QueryRequest):
+def rag_query(payload: QueryRequest, db: Session = Depends(get_db)):
     """
     Realiza uma consulta nos documentos indexados no ChromaDB usando RAG (Retrieval-Augmented Generation).
     """
-    logger.info(f"Consulta RAG recebida: {payload.question}")
+    logger.info("Consulta RAG recebida: %s", payload.question)
+    _require_agent(db, payload.agent_id)
     try:
-        result = rag_service.query_rag(payload.question)
+        result = rag_service.query_rag(payload.question, payload.agent_id, payload.mode)
         logger.info("Consulta RAG concluída com sucesso")
         return {"answer": result}
     except Exception as e:
-        logger.error(f"Erro no RAG query: {e}")
+        logger.error("Erro no RAG query: %s", e)
         raise HTTPException(status_code=500, detail=f"Erro ao processar a query: {str(e)}")
 
 
-@router.post("/upload", response_model=UploadResponse, summary="Indexar documento no ChromaDB")
-async def rag_upload(file: UploadFile = File(...)):
+@router.post("/search", response_model=list[SearchResult], summary="Buscar chunks indexados (sem LLM)")
+def rag_search(payload: SearchRequest, db: Session = Depends(get_db)):
     """
-    Envia um documento (PDF, TXT ou Markdown) para ser processado e indexado no ChromaDB.
+    Retorna os chunks mais relevantes sem gerar resposta. No modo `keyword`
+    (BM25) não há chamada ao Ollama: a busca é local e leva poucos milissegundos.
+    Com `agent_id`, busca só nos documentos do agente.
     """
-    logger.info(f"Upload de arquivo para indexação: {file.filename}")
+    _require_agent(db, payload.agent_id)
     try:
-        result = await index_document(file)
-        logger.info(f"Arquivo indexado com sucesso: {file.filename}")
-        return result
+        results = rag_service.search(payload.question, payload.mode, payload.agent_id)
+        return [search_result(doc) for doc in results]
     except Exception as e:
-        logger.error(f"Erro ao indexar documento {file.filename}: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        logger.error("Erro na busca RAG: %s", e)
+        raise HTTPException(status_code=500, detail=f"Erro ao processar a busca: {str(e)}")
+
+
+@router.post("/query/stream", summary="Consultar documentos indexados (RAG) em streaming")
+async def rag_query_stream(payload: QueryRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Consulta RAG em streaming NDJSON: primeiro as fontes recuperadas (`sources`),
+    depois os tokens (`token`) e por fim a resposta completa com os tempos de
+    condensação, busca e geração (`end`).
+    """
+    logger.info("Consulta RAG (stream) recebida: %s", payload.question)
+    if payload.agent_id is not None and not await db.get(Agent, payload.agent_id):
+        raise HTTPException(status_code=404, detail="Agente não encontrado")
+    await db.commit()
+
+    async def generate():
+        try:
+            async for event in rag_service.aquery_stream(payload.question, payload.agent_id, payload.mode):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error("Erro no RAG query (stream): %s", e)
+            yield json.dumps(
+                {"type": "error", "message": f"Erro ao processar a query: {str(e)}"},
+                ensure_ascii=False,
+            ) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.post("/upload", response_model=RagJobResponse, status_code=202, summary="Indexar documento no ChromaDB")
+async def rag_upload(
+    file: UploadFile = File(...),
+    agent_id: int | None = Form(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Envia um documento (PDF, TXT ou Markdown) para indexação no ChromaDB.
+    Com `agent_id`, o documento fica na coleção do agente e só é consultado por ele.
+    A indexação roda em background; acompanhe o progresso em `GET /rag/jobs/{job_id}`.
+    """
+    logger.info("Upload de arquivo para indexação: %s (agente=%s)", file.filename, agent_id)
+    if not (file.filename or "").endswith(SUPPORTED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Formato de arquivo não suportado")
+    if agent_id is not None and not await db.get(Agent, agent_id):
+        raise HTTPException(status_code=404, detail="Agente não encontrado")
+
+    path = await asyncio.to_thread(save_upload, file)
+    try:
+        return rag_job_queue.submit(file.filename, path, agent_id)
+    except QueueFullError as e:
+        os.remove(path)
+        logger.warning("Upload recusado (%s): %s", file.filename, e)
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/jobs/{job_id}", response_model=RagJobResponse, summary="Progresso de um job de indexação")
+def rag_job_status(job_id: str):
+    """
+    Retorna o estado de um job de indexação: páginas lidas, chunks gravados e ETA.
+    """
+    job = rag_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+
+@router.get("/documents", response_model=list[RagDocument], summary="Listar documentos indexados")
+def rag_documents(agent_id: int | None = None, db: Session = Depends(get_db)):
+    """
+    Inventário do índice (da coleção do agente, se informado): chunks, páginas,
+    modelo de embeddings e data da última indexação por arquivo.
+    """
+    _require_agent(db, agent_id)
+    return list_documents(agent_id=agent_id)
@@ -1,11 +1,30 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.error_handler import ErrorHandlerMiddleware
+from app.core import metrics, tracing
 from app.api.router import api_router
+from app.core.db import engine
+from app.services.agent_export_service import AgentExportService
+from app.services.cost_rollup_service import cost_rollup_service
+from app.services.execution_writer import execution_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # upserts de rollup/import dependem do dialeto: um banco sem suporte falha aqui
+    for service in (cost_rollup_service, AgentExportService):
+        service.check_dialect(engine.dialect.name)
+    yield
+    # grava as execuções ainda no buffer write-behind antes de encerrar
+    await asyncio.to_thread(execution_writer.close)
+    tracing.shutdown()
+
 
 def create_app() -> FastAPI:
-    app = FastAPI(title=settings.APP_NAME)
+    app = FastAPI(title=settings.APP_NAME, lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
@@ -17,7 +36,12 @@ def create_app() -> FastAPI:
 
     app.add_middleware(ErrorHandlerMiddleware)
 
+    if settings.METRICS_ENABLED:
+        # o mais externo: mede também as respostas de erro do ErrorHandlerMiddleware
+        app.add_middleware(metrics.MetricsMiddleware)
+
     app.include_router(api_router)
+    tracing.instrument_app(app)
 
     @app.get("/")
     def root():
@@ -27,4 +51,10 @@ def create_app() -> FastAPI:
             "debug": settings.APP_DEBUG,
         }
 
+    if settings.METRICS_ENABLED:
+        @app.get("/metrics", include_in_schema=False)
+        def prometheus_metrics():
+            body, content_type = metrics.render()
+            return Response(body, media_type=content_type)
+
     return app
@@ -26,12 +26,28 @@ class Settings(BaseSettings):
     DATABASE_USER: str = Field("postgres", description="Usuário do banco de dados")
     DATABASE_PASSWORD: str = Field("postgres", description="Senha do banco de dados")
     DATABASE_NAME: str = Field("postgres", description="Nome do banco de dados")
+    DATABASE_ASYNC_URL: str | None = Field(None, description="URL assíncrona do banco (derivada de DATABASE_URL se vazia)")
+    DATABASE_POOL_SIZE: int = Field(10, description="Conexões mantidas no pool (por engine: sync e async)")
+    DATABASE_MAX_OVERFLOW: int = Field(20, description="Conexões extras além do pool em picos")
+    DATABASE_POOL_TIMEOUT: float = Field(30.0, description="Espera máxima (s) por uma conexão livre")
+    DATABASE_POOL_RECYCLE: int = Field(1800, description="Idade máxima (s) de uma conexão antes de ser reaberta (-1 = nunca)")
+    DATABASE_POOL_PING_IDLE: float = Field(30.0, description="Testa no checkout só conexões ociosas há mais que isso (s); 0 = todas, -1 = nunca")
 
     # URL montada automaticamente
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql+psycopg2://{self.database_user}:{self.database_password}@{self.database_host}:{self.database_port}/{self.database_name}"
 
+    # --------------------
+    # EXECUTION WRITE-BEHIND
+    # --------------------
+    EXECUTION_WRITE_MODE: str = Field("sync", description="Gravação das execuções: sync, buffered (write-behind) ou durable (group commit)")
+    EXECUTION_BATCH_SIZE: int = Field(200, description="Execuções por lote gravado (modos buffered/durable)")
+    EXECUTION_FLUSH_INTERVAL: float = Field(0.5, description="Intervalo máximo (s) entre gravações do buffer")
+    EXECUTION_ID_BLOCK_SIZE: int = Field(100, description="Ids de execução pré-alocados por round-trip à sequence")
+    EXECUTION_MAX_RETRIES: int = Field(5, description="Tentativas de gravar uma execução antes de descartá-la para o log (modo buffered)")
+    EXECUTION_MAX_PENDING: int = Field(10000, description="Execuções no buffer; cheio, novas execuções esperam e depois são recusadas")
+
     # --------------------
     # REDIS
     # --------------------
@@ -46,8 +62,18 @@ class Settings(BaseSettings):
     # --------------------
     # Prometheus
     # --------------------
-    #  
-    prometheus_port: int | None = Field(9090)
+    prometheus_port: int | None = Field(9090, description="Porta do servidor Prometheus (o scrape lê GET /metrics da API)")
+    METRICS_ENABLED: bool = Field(True, description="Expõe /metrics e instrumenta as requisições")
+    PROMETHEUS_MULTIPROC_DIR: str | None = Field(None, description="Diretório compartilhado das métricas com vários workers (limpo antes de iniciar)")
+
+    # --------------------
+    # Tracing (OpenTelemetry)
+    # --------------------
+    TRACING_ENABLED: bool = Field(False, description="Gera spans OpenTelemetry (API, serviços, banco, Redis e LLM)")
+    TRACING_EXPORTER: str = Field("console", description="Destino dos spans: console, file ou otlp")
+    TRACING_FILE: str = Field("/tmp/desafio-agent-traces.jsonl", description="Arquivo do exporter file (um span JSON por linha)")
+    TRACING_OTLP_ENDPOINT: str = Field("http://localhost:4317", description="Collector OTLP (gRPC) do exporter otlp")
+    TRACING_SAMPLE_RATIO: float = Field(1.0, description="Fração dos traces amostrados (0 a 1)")
 
     # --------------------
     # CORS
@@ -61,12 +87,23 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = Field("INFO", description="Nível de log (DEBUG, INFO, WARNING, ERROR)")
     LOG_MAX_BYTES: int = Field(10 * 1024 * 1024, description="Tamanho máximo do log em bytes")
     LOG_BACKUP_COUNT: int = Field(5, description="Número de arquivos de backup")
+    LOG_QUEUE_SIZE: int = Field(10000, description="Registros na fila do logging assíncrono (0 = handlers síncronos)")
+    LOG_OVERLOAD_SAMPLE: int = Field(10, description="Com a fila quase cheia, mantém 1 a cada N registros abaixo de WARNING")
 
     # --------------------
     # AGENT MEMORY
     # --------------------
     AGENT_MEMORY_LIMIT: int = Field(5, description="Número máximo de interações salvas na memória do agente")
     AGENT_MEMORY_TTL: int = Field(0, description="Tempo de expiração da memória em segundos (0 = infinito)")
+    AGENT_MEMORY_CACHE_TTL: float = Field(2.0, description="TTL do cache local de leitura da memória em segundos (0 = desativado)")
+    AGENT_MEMORY_CACHE_SIZE: int = Field(1024, description="Número máximo de agentes no cache local de memória")
+    AGENT_PROMPT_MAX_TOKENS: int = Field(4096, description="Orçamento de tokens do prompt (histórico + entrada)")
+    AGENT_PROMPT_SUMMARY_TOKENS: int = Field(256, description="Tokens reservados ao resumo das interações antigas quando o histórico não cabe no orçamento (0 = apenas descarta)")
+
+    # --------------------
+    # AGENT IMPORT
+    # --------------------
+    AGENT_IMPORT_BATCH_SIZE: int = Field(1000, description="Agentes por lote no import em massa (POST /agents/import)")
 
     # --------------------
     # API
@@ -79,6 +116,12 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str | None = Field(None, description="Chave de API do OpenAI")
     OPENAI_MODEL: str = Field("gpt-4o-mini", description="Modelo padrão do OpenAI")
 
+    # --------------------
+    # PRICING
+    # --------------------
+    PRICING_FILE: str | None = Field(None, description="Tabela de preços (JSON); vazio = tabela embutida em app/data/pricing.json")
+    PRICING_RELOAD_INTERVAL: float = Field(30.0, description="Intervalo (s) para verificar mudanças na tabela de preços")
+
     # --------------------
     # RAG / Ollama / Chroma / LLM
     # --------------------
@@ -87,9 +130,42 @@ class Settings(BaseSettings):
     OLLAMA_MODEL: str = Field("gemma:2b-instruct", description="Modelo do Ollama usado no RAG")
     OLLAMA_TEMPERATURE: float = Field(0.0, description="Temperatura do modelo Ollama")
     RAG_TOP_K: int = Field(4, description="Número de documentos recuperados no RAG")
+    RAG_RETRIEVAL_MODE: str = Field("hybrid", description="Busca padrão do RAG: vector, keyword ou hybrid")
+    RAG_HYBRID_CANDIDATES: int = Field(20, description="Candidatos de cada busca (vetorial/BM25) antes da fusão")
+    RAG_RRF_K: int = Field(60, description="Constante k do reciprocal rank fusion")
+    RAG_ANSWER_CACHE_SIZE: int = Field(1000, description="Máximo de respostas no cache semântico (0 = desativado)")
+    RAG_ANSWER_CACHE_TTL: int = Field(3600, description="Validade (s) das respostas em cache (0 = sem expiração)")
+    RAG_ANSWER_CACHE_THRESHOLD: float = Field(0.95, description="Similaridade de cosseno mínima para reaproveitar uma resposta")
     CHROMA_PERSIST_DIR: str = Field("./chroma_db", description="Diretório para persistência do Chroma")
+    RAG_STORE_CACHE_SIZE: int = Field(32, description="Partições RAG (coleção + BM25 por agente) mantidas abertas")
+    RAG_STORE_IDLE_TTL: int = Field(900, description="Tempo (s) ocioso até fechar uma partição RAG (0 = nunca)")
+    RAG_VECTOR_MEMORY_LIMIT_MB: int = Field(1024, description="Memória para índices HNSW carregados; os frios são descarregados (0 = sem limite)")
+    RAG_CHUNK_SIZE: int = Field(1000, description="Tamanho (caracteres) de cada chunk indexado")
+    RAG_CHUNK_OVERLAP: int = Field(150, description="Sobreposição (caracteres) entre chunks consecutivos")
+    RAG_EMBED_BATCH_SIZE: int = Field(64, description="Chunks por lote de embeddings/gravação no Chroma")
+    RAG_EMBED_CONCURRENCY: int = Field(4, description="Lotes de embeddings processados em paralelo")
+    RAG_JOB_WORKERS: int = Field(2, description="Workers locais que processam jobs de indexação")
+    RAG_JOB_MAX_PENDING: int = Field(100, description="Máximo de jobs de indexação na fila/em execução")
+    RAG_JOB_HISTORY: int = Field(1000, description="Jobs finalizados mantidos para consulta")
+
+    # --------------------
+    # EMBEDDING CACHE
+    # --------------------
+    EMBEDDING_CACHE_PATH: str = Field("./embedding_cache/embeddings.sqlite3", description="Arquivo SQLite do cache de embeddings (vazio = só memória)")
+    EMBEDDING_CACHE_MEMORY_SIZE: int = Field(10000, description="Máximo de vetores no cache em memória")
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES: int = Field(500000, description="Máximo de vetores no cache em disco")
     LLM_PROVIDER: str = Field("./llm_provider", description="Qual provider é o padrão")
 
+    # --------------------
+    # LLM CLIENTS (registro/pool)
+    # --------------------
+    LLM_CLIENT_CACHE_SIZE: int = Field(64, description="Máximo de clientes LLM mantidos no registro")
+    LLM_CLIENT_TTL: int = Field(900, description="Tempo ocioso (s) até remover um cliente do registro (0 = nunca)")
+    LLM_CLIENT_SHARDS: int = Field(4, description="Clientes (pools HTTP) por configuração, usados em round-robin")
+    LLM_HTTP_MAX_CONNECTIONS: int = Field(1000, description="Máximo de conexões HTTP por cliente LLM")
+    LLM_HTTP_MAX_KEEPALIVE: int = Field(200, description="Conexões keep-alive mantidas por cliente LLM")
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = Field(60.0, description="Expiração (s) de conexões keep-alive ociosas")
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,19 +1,30 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from app.core.config import settings
+from app.core.metrics import instrument_engine, register_pools
+from app.core.pool_metrics import PoolMetrics
+from app.core.tracing import trace_engine
 from app.models.base import Base
 
 connect_args = {}
 if settings.DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
+# sem pool_pre_ping (um round-trip por checkout): PoolMetrics testa só as
+# conexões ociosas e pool_recycle renova as antigas
+pool_args = {
+    "pool_size": settings.DATABASE_POOL_SIZE,
+    "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+    "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+    "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+}
+
 engine = create_engine(
     settings.DATABASE_URL,
     connect_args=connect_args,
-    pool_pre_ping=True,          # reconecta conexões quebradas
-    pool_size=10,                # nº conexões no pool
-    max_overflow=20,             # conexões extras
     future=True,                 # usa API moderna
+    **pool_args,
 )
 
 SessionLocal = sessionmaker(
@@ -28,4 +39,51 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --------------------
+# Engine assíncrono (asyncpg / aiosqlite)
+# --------------------
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Converte a URL síncrona do banco para o driver assíncrono equivalente"""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+async_engine = create_async_engine(
+    settings.DATABASE_ASYNC_URL or to_async_url(settings.DATABASE_URL),
+    **pool_args,
+)
+
+# telemetria dos pools (espera no checkout, uso, timeouts) e ping de conexões ociosas
+pool_metrics = {
+    "sync": PoolMetrics(engine, "sync", ping_idle=settings.DATABASE_POOL_PING_IDLE),
+    "async": PoolMetrics(async_engine.sync_engine, "async", ping_idle=settings.DATABASE_POOL_PING_IDLE),
+}
+register_pools(pool_metrics)
+
+# consultas por requisição (`http_request_db_queries` no /metrics)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+trace_engine(engine)
+trace_engine(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,      # evita lazy-load implícito após commit
+)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Cache de embeddings em dois níveis, chaveado por (modelo, sha256(texto)).
+
+    - memória: LRU limitado a `memory_size` vetores;
+    - disco: SQLite (vetores float32), LRU por `last_used` limitado a
+      `disk_max_entries`. Desativado se `path` for vazio.
+
+    A conexão SQLite é aberta sob demanda, no primeiro acesso ao disco.
+    """
+
+    def __init__(self, path: str | None, memory_size: int, disk_max_entries: int):
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_max_entries = disk_max_entries
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            if missing and self.path:
+                from_disk = self._disk_get(missing)
+                self.disk_hits += len(from_disk)
+                for key, vector in from_disk.items():
+                    self._remember(key, vector)
+                found.update(from_disk)
+
+            self.misses += len([k for k in keys if k not in found])
+        return found
+
+    def put_many(self, items: dict[str, list[float]]):
+        if not items:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            if self.path:
+                self._disk_put(items)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_size": len(self._memory),
+                "memory_max_size": self.memory_size,
+                "disk_size": self._disk_count() if self.path else 0,
+                "disk_max_entries": self.disk_max_entries if self.path else 0,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.path:
+                self._connection().execute("DELETE FROM embeddings")
+                self._connection().commit()
+
+    # --------------------
+    # Memória
+    # --------------------
+    def _remember(self, key: str, vector: list[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    # --------------------
+    # Disco (SQLite)
+    # --------------------
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        return self._conn
+
+    def _disk_get(self, keys: list[str]) -> dict[str, list[float]]:
+        conn = self._connection()
+        found = {}
+        # limite de variáveis por consulta do SQLite
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        if found:
+            now = time.time()
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found])
+            conn.commit()
+        return found
+
+    def _disk_put(self, items: dict[str, list[float]]):
+        conn = self._connection()
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(k, np.asarray(v, dtype=np.float32).tobytes(), now) for k, v in items.items()],
+        )
+        conn.commit()
+
+        # verificação de tamanho amortizada: a contagem não é feita a cada escrita
+        self._disk_writes += len(items)
+        if self._disk_writes >= max(1, self.disk_max_entries // 100):
+            self._disk_writes = 0
+            self._disk_evict()
+
+    def _disk_evict(self):
+        conn = self._connection()
+        excess = self._disk_count() - self.disk_max_entries
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        conn.commit()
+        self.evictions += excess
+        logger.debug("Cache de embeddings: %s vetores removidos do disco (LRU)", excess)
+
+    def _disk_count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings com cache: só os textos ausentes do cache vão ao modelo,
+    numa única chamada em lote.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [EmbeddingCache.key(self.model, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {k: t for k, t in zip(keys, texts) if k not in found}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+# único cache global
+embedding_cache = EmbeddingCache(
+    path=settings.EMBEDDING_CACHE_PATH,
+    memory_size=settings.EMBEDDING_CACHE_MEMORY_SIZE,
+    disk_max_entries=settings.EMBEDDING_CACHE_DISK_MAX_ENTRIES,
+)
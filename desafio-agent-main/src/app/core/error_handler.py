@@ -14,9 +14,7 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
             return response
 
         except HTTPException as e:
-            logger.warning(
-                f"Erro HTTP {e.status_code} em {request.url.path}: {e.detail}"
-            )
+            logger.warning("Erro HTTP %s em %s: %s", e.status_code, request.url.path, e.detail)
             return JSONResponse(
                 status_code=e.status_code,
                 content={
@@ -26,7 +24,7 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
             )
 
         except ValidationError as e:
-            logger.warning(f"Erro de validação em {request.url.path}: {str(e)}")
+            logger.warning("Erro de validação em %s: %s", request.url.path, e)
             return JSONResponse(
                 status_code=422,
                 content={
@@ -36,9 +34,7 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
             )
 
         except Exception as e:
-            logger.error(
-                f"Erro não tratado em {request.url.path}: {str(e)}\n{traceback.format_exc()}"
-            )
+            logger.error("Erro não tratado em %s: %s\n%s", request.url.path, e, traceback.format_exc())
             return JSONResponse(
                 status_code=500,
                 content={"erro": "Erro interno do servidor"},
@@ -0,0 +1,213 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+import httpx
+from langchain_ollama import ChatOllama
+from langchain_openai import ChatOpenAI
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SUPPORTED_PROVIDERS = ("ollama", "openai")
+# clientes removidos só são fechados após este intervalo (s): streams em andamento terminam
+CLOSE_GRACE = 300
+
+
+class LLMClientRegistry:
+    """
+    Registro de clientes LLM reutilizáveis.
+    Mantém clientes por (provider, model, base_url, temperature), com conexões
+    HTTP keep-alive em pool, evicção LRU/TTL (por ociosidade) e contadores de hit/miss.
+
+    Cada configuração tem `shards` clientes usados em round-robin: o pool do
+    httpcore varre todas as conexões a cada requisição, então pools menores
+    mantêm esse custo baixo com centenas de streams simultâneos.
+
+    Clientes removidos (LRU/TTL) têm os pools HTTP fechados após `CLOSE_GRACE`
+    segundos, para não interromper requisições que ainda os usam.
+    """
+
+    def __init__(self, max_size: int, ttl: int, shards: int = 1):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shards = max(1, shards)
+        self._clients: OrderedDict = OrderedDict()
+        # removidos aguardando o fechamento: (instante da remoção, clientes)
+        self._retired: list = []
+        # event loop dos clientes assíncronos (o fechamento precisa rodar nele)
+        self._loop = None
+        self._closing: set = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, provider: str, model: str, base_url: str | None, temperature: float):
+        """
+        Retorna o cliente em cache para a configuração, criando-o se necessário.
+        Retorna None para providers não suportados.
+        """
+        if provider not in SUPPORTED_PROVIDERS:
+            return None
+        key = (provider, model, base_url, temperature)
+        now = time.monotonic()
+        self._remember_loop()
+
+        with self._lock:
+            self._evict_expired(now)
+            closable = self._take_closable(now)
+            entry = self._clients.get(key)
+            if entry:
+                self._clients.move_to_end(key)
+                entry[1] = now
+                entry[2] += 1
+                self.hits += 1
+                clients = entry[0]
+                client = clients[entry[2] % len(clients)]
+            else:
+                self.misses += 1
+                client = None
+        self._close_all(closable)
+        if client is not None:
+            return client
+
+        # construção fora do lock: cria clientes HTTP/SSL e é cara
+        clients = [self._build(provider, model, base_url, temperature) for _ in range(self.shards)]
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                self._clients[key] = [clients, now, 0]
+                while len(self._clients) > self.max_size:
+                    evicted, (evicted_clients, _, _) = self._clients.popitem(last=False)
+                    self._retire(evicted_clients, now)
+                    logger.debug("Cliente LLM removido (LRU): %s", evicted)
+        if entry is not None:
+            # outra requisição criou o mesmo cliente em paralelo: os nossos nunca foram usados
+            self._close_all(clients)
+            return entry[0][0]
+
+        logger.info("Cliente LLM criado: provider=%s, model=%s, base_url=%s", provider, model, base_url)
+        return clients[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._clients),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "shards": self.shards,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "closing": sum(len(clients) for _, clients in self._retired),
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def clear(self):
+        """Remove e fecha todos os clientes (inclusive os aguardando fechamento)."""
+        with self._lock:
+            closable = [c for clients, _, _ in self._clients.values() for c in clients]
+            closable += [c for _, clients in self._retired for c in clients]
+            self._clients.clear()
+            self._retired.clear()
+        self._close_all(closable)
+
+    def _evict_expired(self, now: float):
+        if self.ttl <= 0:
+            return
+        expired = [k for k, (_, last_used, _) in self._clients.items() if now - last_used > self.ttl]
+        for key in expired:
+            self._retire(self._clients.pop(key)[0], now)
+            logger.debug("Cliente LLM removido (TTL): %s", key)
+
+    def _retire(self, clients: list, now: float):
+        self._retired.append((now, clients))
+        self.evictions += 1
+
+    def _take_closable(self, now: float) -> list:
+        closable = [c for retired_at, clients in self._retired if now - retired_at >= CLOSE_GRACE for c in clients]
+        if closable:
+            self._retired = [r for r in self._retired if now - r[0] < CLOSE_GRACE]
+        return closable
+
+    def _remember_loop(self):
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    def _close_all(self, llms: list):
+        for llm in llms:
+            sync_client, async_client = _http_clients(llm)
+            try:
+                if sync_client is not None:
+                    sync_client.close()
+                if async_client is not None:
+                    self._aclose(async_client)
+            except Exception as e:
+                logger.warning("Falha ao fechar cliente LLM: %s", e)
+
+    def _aclose(self, client):
+        # as conexões do cliente assíncrono pertencem ao event loop onde foram abertas
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is not None and loop.is_running() and loop is not running:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        elif running is not None:
+            task = running.create_task(client.aclose())
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        else:
+            # nenhum event loop ativo: as conexões (se houver) já não têm quem as use
+            asyncio.run(client.aclose())
+
+    def _build(self, provider: str, model: str, base_url: str | None, temperature: float):
+        if provider == "ollama":
+            return ChatOllama(
+                model=model,
+                base_url=base_url,
+                temperature=temperature,
+                client_kwargs={"limits": _http_limits()},
+            )
+        return ChatOpenAI(
+                model=model,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                temperature=temperature,
+                # uso de tokens no último chunk do stream (stream_options.include_usage)
+                stream_usage=True,
+                http_client=httpx.Client(limits=_http_limits()),
+                http_async_client=httpx.AsyncClient(limits=_http_limits()),
+            )
+
+
+def _http_clients(llm) -> tuple:
+    """Clientes httpx (síncrono, assíncrono) de um ChatOllama/ChatOpenAI."""
+    if isinstance(llm, ChatOpenAI):
+        return llm.http_client, llm.http_async_client
+    sync_client, async_client = getattr(llm, "_client", None), getattr(llm, "_async_client", None)
+    # ChatOllama: clientes do pacote `ollama`, cada um com o seu httpx interno
+    return getattr(sync_client, "_client", None), getattr(async_client, "_client", None)
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+# único registro global
+llm_registry = LLMClientRegistry(
+    max_size=settings.LLM_CLIENT_CACHE_SIZE,
+    ttl=settings.LLM_CLIENT_TTL,
+    shards=settings.LLM_CLIENT_SHARDS,
+)
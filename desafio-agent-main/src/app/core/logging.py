@@ -1,14 +1,46 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-import json
 from app.core.config import settings
 
+try:
+    import orjson
+except ImportError:  # sem orjson: json da biblioteca padrão
+    orjson = None
+
 LOG_DIR = Path(settings.LOG_DIR)
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / "app.log"
 
-class JsonFormatter(logging.Formatter):
+# fração da fila a partir da qual registros abaixo de WARNING são amostrados
+OVERLOAD_THRESHOLD = 0.8
+# espera máxima (s) de um WARNING+ por espaço na fila cheia
+BLOCK_TIMEOUT = 0.5
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter com o `asctime` padrão, reaproveitando a parte até os segundos."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._second = (None, "")
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second, prefix = self._second
+        if second != int(record.created):
+            second = int(record.created)
+            prefix = time.strftime(self.default_time_format, self.converter(record.created))
+            self._second = (second, prefix)
+        return f"{prefix},{int(record.msecs):03d}"
+
+
+class JsonFormatter(CachedTimeFormatter):
     def format(self, record):
         log_record = {
             "timestamp": self.formatTime(record, self.datefmt),
@@ -20,9 +52,118 @@ class JsonFormatter(logging.Formatter):
         }
         if record.exc_info:
             log_record["erro"] = self.formatException(record.exc_info)
+        if orjson is not None:
+            return orjson.dumps(log_record, default=str).decode()
         return json.dumps(log_record, ensure_ascii=False)
 
-text_formatter = logging.Formatter(
+
+class LogQueueHandler(QueueHandler):
+    """
+    Handler do logger raiz quando `LOG_QUEUE_SIZE` > 0: só enfileira o registro;
+    a formatação (mensagem, JSON) e o I/O ficam com a thread do `QueueListener`.
+
+    A fila é limitada. Sob sobrecarga:
+    - acima de `OVERLOAD_THRESHOLD` da fila, registros abaixo de WARNING são
+      amostrados (1 a cada `sample`);
+    - com a fila cheia, registros abaixo de WARNING são descartados e WARNING+
+      esperam até `BLOCK_TIMEOUT` por espaço antes de serem descartados.
+    As perdas são contadas (`stats`) e avisadas no log quando a fila esvazia.
+    """
+
+    def __init__(self, log_queue: queue.Queue, sample: int):
+        super().__init__(log_queue)
+        self.sample = max(1, sample)
+        self.high_water = int(log_queue.maxsize * OVERLOAD_THRESHOLD)
+        self.enqueued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self._overloaded = 0
+        self._reported = 0
+
+    def prepare(self, record):
+        # mensagem e exceção são formatadas no listener, não na thread da requisição
+        return record
+
+    def enqueue(self, record):
+        # chamado sob o lock do handler: contadores sem lock próprio
+        important = record.levelno >= logging.WARNING
+        if not important and self.queue.qsize() >= self.high_water:
+            self._overloaded += 1
+            if self._overloaded % self.sample:
+                self.sampled_out += 1
+                return
+        try:
+            if important:
+                self.queue.put(record, timeout=BLOCK_TIMEOUT)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self.enqueued += 1
+
+        lost = self.dropped + self.sampled_out - self._reported
+        if lost and self.queue.qsize() < self.high_water:
+            self._reported += lost
+            self.queue.put_nowait(logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": "%d registros de log descartados ou amostrados sob sobrecarga",
+                "args": (lost,),
+            }))
+
+    def stats(self) -> dict:
+        return {
+            "queue_size": self.queue.maxsize,
+            "pending": self.queue.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+        }
+
+
+class LogQueueListener(QueueListener):
+    def handle(self, record):
+        super().handle(record)
+        # flush em lote: só quando a fila esvazia
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+    def enqueue_sentinel(self):
+        # com a fila cheia, espera espaço (o padrão `put_nowait` falharia)
+        self.queue.put(self._sentinel)
+
+
+class QueuedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler para a thread do `LogQueueListener`: formata cada
+    registro uma vez (o original formata de novo para decidir a rotação),
+    acompanha o tamanho do arquivo em memória (em bytes) em vez de `seek`/`tell` por
+    registro e deixa o flush para o listener.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._size = os.path.getsize(self.baseFilename) if os.path.exists(self.baseFilename) else 0
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.encoding or "utf-8"))
+            if self.maxBytes > 0 and self._size + size >= self.maxBytes:
+                self.doRollover()
+                self._size = 0
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._size += size
+        except Exception:
+            self.handleError(record)
+
+
+text_formatter = CachedTimeFormatter(
     "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
 )
 json_formatter = JsonFormatter()
@@ -31,7 +172,8 @@ _console_handler = logging.StreamHandler()
 _console_handler.setFormatter(text_formatter)
 _console_handler.setLevel(settings.LOG_LEVEL)
 
-_file_handler = RotatingFileHandler(
+# com a fila, o arquivo só é escrito pela thread do listener
+_file_handler = (QueuedRotatingFileHandler if settings.LOG_QUEUE_SIZE > 0 else RotatingFileHandler)(
     str(LOG_FILE),
     maxBytes=settings.LOG_MAX_BYTES,
     backupCount=settings.LOG_BACKUP_COUNT,
@@ -40,6 +182,14 @@ _file_handler = RotatingFileHandler(
 _file_handler.setFormatter(json_formatter)
 _file_handler.setLevel(settings.LOG_LEVEL)
 
+_queue_handler = None
+_listener = None
+if settings.LOG_QUEUE_SIZE > 0:
+    _log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = LogQueueHandler(_log_queue, settings.LOG_OVERLOAD_SAMPLE)
+    _queue_handler.setLevel(settings.LOG_LEVEL)
+    _listener = LogQueueListener(_log_queue, _console_handler, _file_handler, respect_handler_level=True)
+
 def configure_logging(force: bool = False) -> None:
     """Configura logging global"""
     root = logging.getLogger()
@@ -51,8 +201,27 @@ def configure_logging(force: bool = False) -> None:
             root.removeHandler(h)
 
     root.setLevel(settings.LOG_LEVEL)
-    root.addHandler(_console_handler)
-    root.addHandler(_file_handler)
+    if _queue_handler is None:
+        root.addHandler(_console_handler)
+        root.addHandler(_file_handler)
+        return
+
+    root.addHandler(_queue_handler)
+    if _listener._thread is None:
+        _listener.start()
+        # grava o que ainda estiver na fila ao encerrar o processo
+        atexit.register(stop_logging)
+
+def stop_logging() -> None:
+    """Esvazia a fila de logs e encerra a thread do listener."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def logging_stats() -> dict:
+    """Estado da fila de logs (vazio com `LOG_QUEUE_SIZE=0`)."""
+    if _queue_handler is None:
+        return {"mode": "sync"}
+    return {"mode": "queue", "overload_sample": _queue_handler.sample, **_queue_handler.stats()}
 
 def get_logger(name: str = None) -> logging.Logger:
     """Obtém um logger nomeado"""
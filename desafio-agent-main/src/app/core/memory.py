@@ -1,39 +1,228 @@
 import json
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
 from typing import List, Dict
 from app.core.redis import redis_client
 from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import REDIS_READ, REDIS_WRITE
+from app.core.tracing import span
+
+logger = get_logger(__name__)
 
 # Limite de memória (configurável via .env)
 MEMORY_LIMIT = settings.AGENT_MEMORY_LIMIT
 MEMORY_TTL = settings.AGENT_MEMORY_TTL  # expiração opcional em segundos
 
-class AgentMemory:
+KEY_PREFIX = settings.APP_NAME.lower().replace(" ", "-")
+
+# atributos dos spans de round-trip ao Redis
+_REDIS_SPAN = {"db.system": "redis"}
+
+
+class MemoryBackend(ABC):
     """
-    Gerenciador de memória de curto prazo dos agentes.
-    Usa Redis para armazenar interações recentes.
+    Interface de armazenamento da memória de curto prazo dos agentes.
+    O histórico é retornado em ordem cronológica (mais antiga primeiro).
+    """
+
+    @abstractmethod
+    def add(self, agent_id: int, user_input: str, agent_output: str) -> None:
+        ...
+
+    @abstractmethod
+    def get(self, agent_id: int) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def clear(self, agent_id: int) -> None:
+        ...
+
+    @abstractmethod
+    def clear_all(self) -> None:
+        ...
+
+
+class InMemoryBackend(MemoryBackend):
     """
+    Backend local ao processo, usado quando o Redis não está disponível.
+    """
+
+    def __init__(self, limit: int = MEMORY_LIMIT):
+        self.limit = limit
+        self._store = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, agent_id: int, user_input: str, agent_output: str) -> None:
+        with self._lock:
+            history = self._store[agent_id]
+            history.append({"input": user_input, "output": agent_output})
+            if self.limit and len(history) > self.limit:
+                self._store[agent_id] = history[-self.limit:]
+
+    def get(self, agent_id: int) -> List[Dict]:
+        with self._lock:
+            return list(self._store.get(agent_id, []))
+
+    def clear(self, agent_id: int) -> None:
+        with self._lock:
+            self._store.pop(agent_id, None)
+
+    def clear_all(self) -> None:
+        with self._lock:
+            self._store.clear()
+
+
+class RedisMemoryBackend(MemoryBackend):
+    """
+    Backend compartilhado entre workers, armazenado no Redis.
+
+    Escritas usam um único pipeline (LPUSH + LTRIM + EXPIRE + PUBLISH).
+    Leituras passam por um cache local read-through com TTL curto; cada
+    escrita publica uma invalidação para que os demais workers descartem
+    a entrada em cache.
+    """
+
+    def __init__(self, client, limit: int = MEMORY_LIMIT, ttl: int = MEMORY_TTL,
+                 cache_ttl: float = settings.AGENT_MEMORY_CACHE_TTL,
+                 cache_size: int = settings.AGENT_MEMORY_CACHE_SIZE):
+        self.client = client
+        self.limit = limit
+        self.ttl = ttl
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.channel = f"{KEY_PREFIX}:memory:invalidate"
+        self._node_id = uuid.uuid4().hex
+        self._cache: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener = None
+        if self.cache_ttl > 0:
+            self._start_listener()
 
     @staticmethod
     def _key(agent_id: int) -> str:
-        return f"{settings.APP_NAME.lower().replace(' ', '-')}:agent:{agent_id}:memory"
+        return f"{KEY_PREFIX}:agent:{agent_id}:memory"
 
-    @classmethod
-    def save(cls, agent_id: int, user_input: str, agent_output: str):
-        entry = json.dumps({"input": user_input, "output": agent_output})
-        key = cls._key(agent_id)
+    def add(self, agent_id: int, user_input: str, agent_output: str) -> None:
+        entry = {"input": user_input, "output": agent_output}
+        key = self._key(agent_id)
+
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lpush(key, json.dumps(entry))
+        if self.limit:
+            pipe.ltrim(key, 0, self.limit - 1)
+        if self.ttl > 0:
+            pipe.expire(key, self.ttl)
+        self._publish(pipe, agent_id)
+        started = time.perf_counter()
+        with span("redis.write", _REDIS_SPAN):
+            pipe.execute()
+        REDIS_WRITE.observe(time.perf_counter() - started)
+
+        # write-through: o próprio worker já enxerga a nova interação
+        with self._lock:
+            cached = self._cache.get(agent_id)
+            if cached:
+                history = cached[1] + [entry]
+                if self.limit:
+                    history = history[-self.limit:]
+                self._cache[agent_id] = (time.monotonic() + self.cache_ttl, history)
+
+    def get(self, agent_id: int) -> List[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(agent_id)
+            if cached and cached[0] > now:
+                self._cache.move_to_end(agent_id)
+                return list(cached[1])
+
+        started = time.perf_counter()
+        with span("redis.read", _REDIS_SPAN):
+            raw = self.client.lrange(self._key(agent_id), 0, -1)
+        REDIS_READ.observe(time.perf_counter() - started)
+        history = [json.loads(r) for r in reversed(raw)] if raw else []
+
+        if self.cache_ttl > 0:
+            with self._lock:
+                self._cache[agent_id] = (now + self.cache_ttl, history)
+                self._cache.move_to_end(agent_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return list(history)
+
+    def clear(self, agent_id: int) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.delete(self._key(agent_id))
+        self._publish(pipe, agent_id)
+        pipe.execute()
+        self._invalidate(agent_id)
+
+    def clear_all(self) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key in self.client.scan_iter(match=self._key("*"), count=500):
+            pipe.delete(key)
+        self._publish(pipe, "*")
+        pipe.execute()
+        self._invalidate("*")
+
+    # --------------------
+    # Cache local / invalidação
+    # --------------------
+    def _publish(self, pipe, agent_id) -> None:
+        if self.cache_ttl > 0:
+            pipe.publish(self.channel, f"{self._node_id}:{agent_id}")
+
+    def _invalidate(self, agent_id) -> None:
+        with self._lock:
+            if agent_id == "*":
+                self._cache.clear()
+            else:
+                self._cache.pop(agent_id, None)
+
+    def _on_invalidate(self, message) -> None:
+        node_id, _, agent_id = str(message["data"]).partition(":")
+        if node_id == self._node_id:
+            return
+        self._invalidate(agent_id if agent_id == "*" else int(agent_id))
 
-        redis_client.lpush(key, entry)
-        redis_client.ltrim(key, 0, MEMORY_LIMIT - 1)
+    def _start_listener(self) -> None:
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_invalidate})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            # sem invalidação remota, o TTL do cache limita a defasagem
+            logger.warning("Invalidação de memória via pub/sub indisponível: %s", e)
 
-        if MEMORY_TTL > 0:
-            redis_client.expire(key, MEMORY_TTL)
+
+def _init_backend() -> MemoryBackend:
+    if redis_client is None:
+        logger.warning("⚠️ Memória de agentes em modo local (Redis indisponível)")
+        return InMemoryBackend()
+    return RedisMemoryBackend(redis_client)
+
+
+# único backend global, compartilhado por MemoryService e AgentMemory
+memory_backend = _init_backend()
+
+
+class AgentMemory:
+    """
+    Gerenciador de memória de curto prazo dos agentes.
+    Usa o backend compartilhado (Redis, ou local se indisponível).
+    """
+
+    @classmethod
+    def save(cls, agent_id: int, user_input: str, agent_output: str):
+        memory_backend.add(agent_id, user_input, agent_output)
 
     @classmethod
     def get(cls, agent_id: int) -> List[Dict]:
-        key = cls._key(agent_id)
-        raw = redis_client.lrange(key, 0, -1)
-        return [json.loads(r) for r in raw] if raw else []
+        return memory_backend.get(agent_id)
 
     @classmethod
     def clear(cls, agent_id: int):
-        redis_client.delete(cls._key(agent_id))
\ No newline at end of file
+        memory_backend.clear(agent_id)
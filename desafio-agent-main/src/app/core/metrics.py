@@ -0,0 +1,192 @@
+import os
+import time
+from contextvars import ContextVar
+from app.core.config import settings
+
+# o prometheus_client escolhe o modo (um processo ou multiprocess) na importação
+if settings.PROMETHEUS_MULTIPROC_DIR:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess  # noqa: E402
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from app.core.pool_metrics import CHECKOUT_BUCKETS_MS  # noqa: E402
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota",
+    ["method", "route", "status"],
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "Consultas ao banco por requisição HTTP",
+    ["method", "route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Tempo até o primeiro token do stream do LLM",
+    ["provider", "model"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "llm_tokens_per_second", "Tokens gerados por segundo após o primeiro token",
+    ["provider", "model"], buckets=(1, 5, 10, 20, 40, 80, 160, 320),
+)
+RAG_STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds", "Duração de cada etapa do pipeline RAG",
+    ["stage"], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds", "Latência das operações no Redis (round-trip)",
+    ["operation"], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+# séries de label fixo, ligadas uma vez
+RAG_CONDENSE = RAG_STAGE_LATENCY.labels("condense")
+RAG_RETRIEVAL = RAG_STAGE_LATENCY.labels("retrieval")
+RAG_GENERATION = RAG_STAGE_LATENCY.labels("generation")
+REDIS_READ = REDIS_LATENCY.labels("read")
+REDIS_WRITE = REDIS_LATENCY.labels("write")
+
+# consultas ao banco da requisição corrente (lista de um item, mutável entre threads/tasks)
+_db_queries: ContextVar[list | None] = ContextVar("db_queries", default=None)
+
+# séries de labels dinâmicos já ligadas: (métrica, *labels) -> filha
+_children: dict = {}
+
+
+def _child(metric, *labels):
+    child = _children.get((metric, *labels))
+    if child is None:
+        child = _children.setdefault((metric, *labels), metric.labels(*labels))
+    return child
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latência por rota (template, não o path) e número de
+    consultas ao banco de cada requisição. Requisições sem rota entram como
+    `<unmatched>`, para não criar uma série por URL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _db_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _db_queries.reset(token)
+            route, method = _route_template(scope), scope["method"]
+            _child(REQUEST_LATENCY, method, route, str(status)).observe(elapsed)
+            _child(REQUEST_DB_QUERIES, method, route).observe(queries[0])
+
+
+def _route_template(scope) -> str:
+    # routers aninhados: no FastAPI 0.143 `route.path_format` vem sem os prefixos
+    # de `include_router`; o template completo só existe no contexto (interno) da
+    # rota efetiva, por isso a versão fixada em requirements.txt
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    template = getattr(context, "path_format", None)
+    if template:
+        return template
+    route = scope.get("route")
+    return route.path_format if route is not None else UNMATCHED_ROUTE
+
+
+def instrument_engine(engine):
+    """Conta as consultas de `engine` na requisição corrente (se houver)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        queries = _db_queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+
+def observe_llm_stream(
+    provider: str, model: str, started: float, first_token: float | None, finished: float, tokens: int
+):
+    """
+    Registra o tempo até o primeiro token e a vazão (tokens/s entre o primeiro
+    token e o fim) de um stream do LLM. Instantes vêm de `time.perf_counter`.
+    """
+    if first_token is None:
+        return
+    provider, model = provider or "", model or ""
+    _child(LLM_TIME_TO_FIRST_TOKEN, provider, model).observe(first_token - started)
+    if tokens and finished > first_token:
+        _child(LLM_TOKENS_PER_SECOND, provider, model).observe(tokens / (finished - first_token))
+
+
+class PoolCollector:
+    """
+    Exporta a telemetria dos pools (`PoolMetrics`) no scrape. Os valores são
+    do processo que atende o scrape (no modo multiprocess, de um dos workers).
+    """
+
+    def __init__(self, pools: dict):
+        self.pools = pools
+
+    def collect(self):
+        in_use = GaugeMetricFamily("db_pool_connections_in_use", "Conexões em uso", labels=["pool"])
+        idle = GaugeMetricFamily("db_pool_connections_idle", "Conexões ociosas no pool", labels=["pool"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Conexões abertas além do pool_size", labels=["pool"])
+        peak = GaugeMetricFamily("db_pool_connections_peak_in_use", "Pico de conexões em uso", labels=["pool"])
+        timeouts = CounterMetricFamily("db_pool_checkout_timeouts", "Timeouts aguardando conexão", labels=["pool"])
+        invalidations = CounterMetricFamily("db_pool_invalidations", "Conexões invalidadas", labels=["pool"])
+        wait = HistogramMetricFamily(
+            "db_pool_checkout_wait_seconds", "Espera por uma conexão no checkout", labels=["pool"]
+        )
+        limits = [str(ms / 1000) for ms in CHECKOUT_BUCKETS_MS] + ["+Inf"]
+
+        for name, metrics in self.pools.items():
+            stats = metrics.stats()
+            in_use.add_metric([name], stats["in_use"] or 0)
+            idle.add_metric([name], stats["idle"] or 0)
+            overflow.add_metric([name], stats["overflow"])
+            peak.add_metric([name], stats["peak_in_use"])
+            timeouts.add_metric([name], stats["timeouts"])
+            invalidations.add_metric([name], stats["invalidations"])
+            wait.add_metric(
+                [name],
+                buckets=list(zip(limits, stats["wait_ms"]["buckets"].values())),
+                sum_value=metrics.wait_ms_sum / 1000,
+            )
+        yield from (in_use, idle, overflow, peak, timeouts, invalidations, wait)
+
+
+def _serving_registry() -> CollectorRegistry:
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    # multiprocess: cada worker grava as séries em arquivos; o scrape soma todos
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+# registry exportado no `/metrics`
+registry = _serving_registry()
+
+
+def register_pools(pools: dict):
+    registry.register(PoolCollector(pools))
+
+
+def render() -> tuple[bytes, str]:
+    """Corpo e content-type do `/metrics`."""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,145 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# limites (ms) dos buckets do histograma de espera no checkout
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """
+    Telemetria do pool de conexões de um engine.
+
+    - espera no checkout (histograma em ms) e timeouts: mede `pool.connect`;
+    - conexões abertas, invalidadas e pings: eventos do pool;
+    - em uso / overflow / ociosas: lidos do pool na hora (`stats`).
+
+    Com `ping_idle` >= 0, substitui o `pool_pre_ping`: só conexões ociosas há
+    mais de `ping_idle` segundos são testadas no checkout (0 = todas). Uma
+    conexão morta (ex.: Postgres reiniciado) é descartada e o pool tenta outra.
+    """
+
+    def __init__(self, engine: Engine, name: str, ping_idle: float = -1):
+        self.engine = engine
+        self.name = name
+        self.ping_idle = ping_idle
+        self._lock = threading.Lock()
+        self.buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.wait_ms_sum = 0.0
+        self.wait_ms_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.peak_in_use = 0
+        self._instrument()
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            return {
+                "pool": type(pool).__name__,
+                "size": _call(pool, "size"),
+                "in_use": _call(pool, "checkedout"),
+                "idle": _call(pool, "checkedin"),
+                "overflow": max(0, _call(pool, "overflow") or 0),
+                "max_overflow": getattr(pool, "_max_overflow", None),
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "avg": round(self.wait_ms_sum / self.checkouts, 3) if self.checkouts else 0.0,
+                    "max": round(self.wait_ms_max, 3),
+                    "buckets": self.histogram(),
+                },
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+            }
+
+    def histogram(self) -> dict:
+        """Contagens cumulativas por limite (`le`, em ms), como um histograma do Prometheus."""
+        total, cumulative = 0, {}
+        for limit, count in zip((*CHECKOUT_BUCKETS_MS, "+Inf"), self.buckets):
+            total += count
+            cumulative[str(limit)] = total
+        return cumulative
+
+    def observe_checkout(self, wait_ms: float):
+        index = next((i for i, limit in enumerate(CHECKOUT_BUCKETS_MS) if wait_ms <= limit), len(CHECKOUT_BUCKETS_MS))
+        in_use = _call(self.engine.pool, "checkedout") or 0
+        with self._lock:
+            self.buckets[index] += 1
+            self.checkouts += 1
+            self.wait_ms_sum += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            self.peak_in_use = max(self.peak_in_use, in_use)
+
+    def _instrument(self):
+        self._wrap_connect(self.engine.pool)
+        # `engine.dispose()` troca o pool (os eventos são copiados, o wrapper não)
+        event.listen(self.engine, "engine_disposed", lambda engine: self._wrap_connect(engine.pool))
+
+        @event.listens_for(self.engine, "connect")
+        def on_connect(dbapi_connection, record):
+            record.info["last_used"] = time.monotonic()
+            with self._lock:
+                self.connects += 1
+
+        @event.listens_for(self.engine, "checkin")
+        def on_checkin(dbapi_connection, record):
+            record.info["last_used"] = time.monotonic()
+
+        @event.listens_for(self.engine, "invalidate")
+        def on_invalidate(dbapi_connection, record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+        if self.ping_idle >= 0:
+            event.listen(self.engine, "checkout", self._ping_idle)
+
+    def _wrap_connect(self, pool):
+        connect = pool.connect
+
+        # o pool não emite evento antes do checkout: a espera é medida em volta de `connect`
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                connection = connect()
+            except exc.TimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                logger.warning("Pool %s: timeout aguardando conexão", self.name)
+                raise
+            self.observe_checkout((time.perf_counter() - started) * 1000)
+            return connection
+
+        pool.connect = timed_connect
+
+    def _ping_idle(self, dbapi_connection, record, proxy):
+        if time.monotonic() - record.info.get("last_used", 0) <= self.ping_idle:
+            return
+        with self._lock:
+            self.pings += 1
+        try:
+            alive = self.engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            logger.warning("Pool %s: conexão ociosa inválida (%s); reconectando", self.name, e)
+            alive = False
+        if not alive:
+            with self._lock:
+                self.ping_failures += 1
+            # o pool descarta a conexão e tenta o checkout de novo
+            raise exc.DisconnectionError()
+
+
+def _call(pool, method: str):
+    fn = getattr(pool, method, None)
+    return fn() if fn else None
@@ -19,10 +19,10 @@ def init_redis_client():
             health_check_interval=30,
         )
         client.ping()
-        logger.info(f"✅ Conectado ao Redis: {settings.REDIS_URL}")
+        logger.info("✅ Conectado ao Redis: %s", settings.REDIS_URL)
         return client
     except ConnectionError as e:
-        logger.error(f"❌ Falha ao conectar ao Redis: {e}")
+        logger.error("❌ Falha ao conectar ao Redis: %s", e)
         return None
 
 # único cliente global
@@ -0,0 +1,228 @@
+from contextlib import contextmanager, nullcontext
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+TRACING_EXPORTERS = ("console", "file", "otlp")
+
+# tamanho máximo do SQL gravado nos spans de consulta
+STATEMENT_MAX_LENGTH = 1000
+
+
+class _NoopSpan:
+    """Span devolvido com o tracing desativado: todas as operações são no-op."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+# desativado, `span`/`stream_span` devolvem sempre o mesmo context manager: sem alocação
+_NOOP = nullcontext(NOOP_SPAN)
+
+_provider = None
+_tracer = None
+
+
+def configure(provider=None):
+    """
+    Liga o tracing com `provider` (TracerProvider) ou, sem ele, com o exporter
+    das settings (`TRACING_EXPORTER`). Sem o opentelemetry-sdk instalado, o
+    tracing continua desativado.
+    """
+    global _provider, _tracer
+    try:
+        provider = provider or _build_provider()
+    except ImportError as e:
+        logger.warning("Tracing desativado: opentelemetry não instalado (%s)", e)
+        return
+    _provider = provider
+    _tracer = provider.get_tracer("app")
+    logger.info("Tracing ativo (exporter: %s)", settings.TRACING_EXPORTER)
+
+
+def shutdown():
+    """Grava os spans pendentes e desliga o tracing."""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+    _provider, _tracer = None, None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, attributes: dict | None = None, parent=None, links=None):
+    """
+    Context manager de um span, corrente durante o bloco (consultas e chamadas
+    internas viram filhas). Exceções são registradas no span.
+    Não atravessa `yield`: em generators de streaming, use `stream_span`.
+    """
+    if _tracer is None:
+        return _NOOP
+    from opentelemetry import trace
+
+    return _tracer.start_as_current_span(
+        name,
+        context=trace.set_span_in_context(parent) if parent is not None else None,
+        attributes=attributes,
+        links=[trace.Link(c) for c in links if c is not None] if links else None,
+    )
+
+
+def stream_span(name: str, attributes: dict | None = None, parent=None):
+    """
+    Span que não vira o corrente, para envolver generators de streaming: o
+    contexto corrente não sobrevive entre `yield`s (cada chunk pode ser
+    consumido em outra thread/task). Etapas internas usam `span(..., parent=)`.
+    """
+    if _tracer is None:
+        return _NOOP
+    return _detached_span(name, attributes, parent)
+
+
+@contextmanager
+def _detached_span(name: str, attributes: dict | None, parent):
+    from opentelemetry import trace
+
+    current = _tracer.start_span(
+        name,
+        context=trace.set_span_in_context(parent) if parent is not None else None,
+        attributes=attributes,
+    )
+    try:
+        yield current
+    except GeneratorExit:
+        # o cliente desconectou antes do fim do stream
+        current.set_attribute("stream.cancelled", True)
+        raise
+    except BaseException as e:
+        current.record_exception(e)
+        current.set_status(trace.Status(trace.StatusCode.ERROR, str(e)))
+        raise
+    finally:
+        current.end()
+
+
+def current_span_context():
+    """Contexto do span corrente (para `links` em trabalho agrupado), ou None."""
+    if _tracer is None:
+        return None
+    from opentelemetry import trace
+
+    context = trace.get_current_span().get_span_context()
+    return context if context.is_valid else None
+
+
+def bind_context(fn):
+    """
+    Amarra `fn` ao contexto de tracing atual, para rodar em outra thread
+    (executors, filas): os spans criados lá continuam no mesmo trace.
+    """
+    if _tracer is None:
+        return fn
+    from opentelemetry import context as otel_context
+
+    captured = otel_context.get_current()
+
+    def run(*args, **kwargs):
+        token = otel_context.attach(captured)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            otel_context.detach(token)
+
+    return run
+
+
+def trace_engine(engine):
+    """Um span por consulta de `engine` (só registra os eventos com o tracing ativo)."""
+    if _tracer is None:
+        return
+    from sqlalchemy import event
+    from opentelemetry import trace
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        if context is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        context._trace_span = _tracer.start_span(f"db.{operation.lower() or 'query'}", attributes={
+            "db.system": engine.dialect.name,
+            "db.operation": operation,
+            "db.statement": statement[:STATEMENT_MAX_LENGTH],
+        })
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        current = getattr(context, "_trace_span", None)
+        if current is not None:
+            current.end()
+
+    @event.listens_for(engine, "handle_error")
+    def failed_query(exception_context):
+        current = getattr(exception_context.execution_context, "_trace_span", None)
+        if current is not None:
+            current.record_exception(exception_context.original_exception)
+            current.set_status(trace.Status(trace.StatusCode.ERROR))
+            current.end()
+
+
+def instrument_app(app):
+    """Span de servidor por requisição (e propagação do `traceparent` recebido)."""
+    if _tracer is None:
+        return
+    try:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    except ImportError:
+        logger.warning("opentelemetry-instrumentation-fastapi não instalado: sem spans de requisição")
+        return
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=_provider, excluded_urls="metrics")
+
+
+def _build_provider():
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.APP_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_build_exporter(settings.TRACING_EXPORTER)))
+    return provider
+
+
+def _build_exporter(name: str):
+    if name not in TRACING_EXPORTERS:
+        raise ValueError(f"Exporter de tracing inválido: {name}")
+    if name == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT, insecure=True)
+
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+    if name == "console":
+        return ConsoleSpanExporter()
+    # um span JSON por linha, para análise offline (benchmarks)
+    return ConsoleSpanExporter(
+        out=open(settings.TRACING_FILE, "a", encoding="utf-8"),
+        formatter=lambda s: s.to_json(indent=None) + "\n",
+    )
+
+
+if settings.TRACING_ENABLED:
+    configure()
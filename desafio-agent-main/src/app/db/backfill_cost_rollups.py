@@ -0,0 +1,21 @@
+"""
+Reconstrói as tabelas de rollup de custos a partir de `execution_costs`.
+
+Uso:
+    PYTHONPATH=src python -m app.db.backfill_cost_rollups
+"""
+from app.core.db import SessionLocal
+from app.services.cost_rollup_service import cost_rollup_service
+
+
+def main():
+    db = SessionLocal()
+    try:
+        result = cost_rollup_service.backfill(db)
+        print(f"Rollups reconstruídos: {result['totals']} totais, {result['daily']} diários")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
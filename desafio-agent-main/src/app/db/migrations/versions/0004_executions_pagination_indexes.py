@@ -0,0 +1,44 @@
+"""executions: índices compostos para paginação por cursor (created_at, id)
+
+Revision ID: 0004_executions_pagination_indexes
+Revises: 0003_export_import_setup
+Create Date: 2026-10-18 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# Revisões
+revision = "0004_executions_pagination_indexes"
+down_revision = "0003_export_import_setup"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "idx_execution_created_id": ["created_at", "id"],
+    "idx_execution_agent_created_id": ["agent_id", "created_at", "id"],
+}
+
+
+def _index_exists(conn, table: str, index_name: str) -> bool:
+    insp: Inspector = sa.inspect(conn)
+    indexes = [i["name"] for i in insp.get_indexes(table)]
+    return index_name in indexes
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # GET /executions percorre o índice na ordem (created_at DESC, id DESC):
+    # cada página é um range scan limitado, sem ordenar a tabela inteira
+    for name, columns in INDEXES.items():
+        if not _index_exists(conn, "executions", name):
+            op.create_index(name, "executions", columns, unique=False)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+
+    for name in INDEXES:
+        if _index_exists(conn, "executions", name):
+            op.drop_index(name, table_name="executions")
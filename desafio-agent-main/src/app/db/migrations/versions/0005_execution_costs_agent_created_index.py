@@ -0,0 +1,44 @@
+"""execution_costs: índice (agent_id, created_at, id) para paginação e agregações
+
+Revision ID: 0005_execution_costs_agent_created_index
+Revises: 0004_executions_pagination_indexes
+Create Date: 2026-10-18 11:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# Revisões
+revision = "0005_execution_costs_agent_created_index"
+down_revision = "0004_executions_pagination_indexes"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "idx_executioncost_agent_created_id"
+
+
+def _index_exists(conn, table: str, index_name: str) -> bool:
+    insp: Inspector = sa.inspect(conn)
+    indexes = [i["name"] for i in insp.get_indexes(table)]
+    return index_name in indexes
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # totais e agrupamentos por período leem só o índice (cost vem no INCLUDE)
+    if not _index_exists(conn, "execution_costs", INDEX_NAME):
+        op.create_index(
+            INDEX_NAME,
+            "execution_costs",
+            ["agent_id", "created_at", "id"],
+            unique=False,
+            postgresql_include=["cost"],
+        )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+
+    if _index_exists(conn, "execution_costs", INDEX_NAME):
+        op.drop_index(INDEX_NAME, table_name="execution_costs")
@@ -0,0 +1,56 @@
+"""cost rollups: agent_cost_totals e agent_cost_daily
+
+Revision ID: 0006_cost_rollup_tables
+Revises: 0005_execution_costs_agent_created_index
+Create Date: 2026-10-18 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# Revisões
+revision = "0006_cost_rollup_tables"
+down_revision = "0005_execution_costs_agent_created_index"
+branch_labels = None
+depends_on = None
+
+
+def _has_table(conn, name: str) -> bool:
+    insp = sa.inspect(conn)
+    return insp.has_table(name)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    if not _has_table(conn, "agent_cost_totals"):
+        op.create_table(
+            "agent_cost_totals",
+            sa.Column("agent_id", sa.Integer(), sa.ForeignKey("agents.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("provider", sa.String(length=100), primary_key=True, server_default=""),
+            sa.Column("model", sa.String(length=100), primary_key=True, server_default=""),
+            sa.Column("total_cost", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("executions", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+    if not _has_table(conn, "agent_cost_daily"):
+        op.create_table(
+            "agent_cost_daily",
+            sa.Column("agent_id", sa.Integer(), sa.ForeignKey("agents.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("provider", sa.String(length=100), primary_key=True, server_default=""),
+            sa.Column("model", sa.String(length=100), primary_key=True, server_default=""),
+            sa.Column("total_cost", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("executions", sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    # backfill do histórico: 0008_execution_costs_rollup_key (depois das colunas provider/model)
+
+def downgrade() -> None:
+    conn = op.get_bind()
+
+    if _has_table(conn, "agent_cost_daily"):
+        op.drop_table("agent_cost_daily")
+
+    if _has_table(conn, "agent_cost_totals"):
+        op.drop_table("agent_cost_totals")
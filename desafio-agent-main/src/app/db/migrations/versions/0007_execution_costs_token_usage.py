@@ -0,0 +1,44 @@
+"""execution_costs: tokens de prompt/completion e versão da tabela de preços
+
+Revision ID: 0007_execution_costs_token_usage
+Revises: 0006_cost_rollup_tables
+Create Date: 2026-10-18 13:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# Revisões
+revision = "0007_execution_costs_token_usage"
+down_revision = "0006_cost_rollup_tables"
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    ("prompt_tokens", sa.Integer()),
+    ("completion_tokens", sa.Integer()),
+    ("price_version", sa.String(length=50)),
+)
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    insp: Inspector = sa.inspect(conn)
+    cols = [c["name"] for c in insp.get_columns(table)]
+    return column in cols
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # colunas anuláveis: custos antigos (estimados por caracteres) ficam sem tokens
+    for name, type_ in COLUMNS:
+        if not _has_column(conn, "execution_costs", name):
+            op.add_column("execution_costs", sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+
+    for name, _ in reversed(COLUMNS):
+        if _has_column(conn, "execution_costs", name):
+            op.drop_column("execution_costs", name)
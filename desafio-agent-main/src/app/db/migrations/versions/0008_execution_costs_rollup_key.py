@@ -0,0 +1,68 @@
+"""execution_costs: provedor e modelo do custo (chave dos rollups) e backfill dos rollups
+
+Revision ID: 0008_execution_costs_rollup_key
+Revises: 0007_execution_costs_token_usage
+Create Date: 2026-10-18 14:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine.reflection import Inspector
+
+# Revisões
+revision = "0008_execution_costs_rollup_key"
+down_revision = "0007_execution_costs_token_usage"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("provider", "model")
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    insp: Inspector = sa.inspect(conn)
+    cols = [c["name"] for c in insp.get_columns(table)]
+    return column in cols
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    for name in COLUMNS:
+        if not _has_column(conn, "execution_costs", name):
+            op.add_column("execution_costs", sa.Column(name, sa.String(length=100), nullable=True))
+
+    # custos antigos: o provedor/modelo do agente é o melhor dado disponível
+    op.execute("""
+        UPDATE execution_costs SET
+            provider = (SELECT a.provider FROM agents a WHERE a.id = execution_costs.agent_id),
+            model = (SELECT a.model FROM agents a WHERE a.id = execution_costs.agent_id)
+        WHERE provider IS NULL AND model IS NULL
+    """)
+
+    # backfill: agrega o histórico pela chave gravada no custo (depois, `python -m app.db.backfill_cost_rollups`)
+    op.execute("DELETE FROM agent_cost_daily")
+    op.execute("DELETE FROM agent_cost_totals")
+    op.execute("""
+        INSERT INTO agent_cost_totals (agent_id, provider, model, total_cost, executions)
+        SELECT c.agent_id, COALESCE(c.provider, ''), COALESCE(c.model, ''), SUM(c.cost), COUNT(DISTINCT c.execution_id)
+        FROM execution_costs c
+        JOIN executions e ON e.id = c.execution_id
+        GROUP BY c.agent_id, COALESCE(c.provider, ''), COALESCE(c.model, '')
+    """)
+    # dia UTC do created_at da execução, como no registro em tempo real (rollup_day)
+    day = "DATE(e.created_at AT TIME ZONE 'UTC')" if conn.dialect.name == "postgresql" else "DATE(e.created_at)"
+    op.execute(f"""
+        INSERT INTO agent_cost_daily (agent_id, day, provider, model, total_cost, executions)
+        SELECT c.agent_id, {day}, COALESCE(c.provider, ''), COALESCE(c.model, ''),
+               SUM(c.cost), COUNT(DISTINCT c.execution_id)
+        FROM execution_costs c
+        JOIN executions e ON e.id = c.execution_id
+        GROUP BY c.agent_id, {day}, COALESCE(c.provider, ''), COALESCE(c.model, '')
+    """)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+
+    for name in reversed(COLUMNS):
+        if _has_column(conn, "execution_costs", name):
+            op.drop_column("execution_costs", name)
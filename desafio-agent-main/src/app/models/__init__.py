@@ -4,6 +4,7 @@ from .agent import Agent
 from .execution import Execution
 from .prompt import Prompt
 from .execution_cost import ExecutionCost
+from .cost_rollup import AgentCostTotal, AgentCostDaily
 
 __all__ = [
     "Base",
@@ -12,4 +13,6 @@ __all__ = [
     "Execution",
     "Prompt",
     "ExecutionCost",
+    "AgentCostTotal",
+    "AgentCostDaily",
 ]
\ No newline at end of file
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, String, func
+
+from .base import Base
+
+
+class AgentCostTotal(Base):
+    """
+    Custo acumulado por agente, provedor e modelo, mantido na mesma transação
+    que registra cada execução (resumo de custos sem varrer `execution_costs`).
+    """
+    __tablename__ = "agent_cost_totals"
+
+    agent_id = Column(Integer, ForeignKey("agents.id", ondelete="CASCADE"), primary_key=True)
+    provider = Column(String(100), primary_key=True, default="")
+    model = Column(String(100), primary_key=True, default="")
+
+    total_cost = Column(Float, nullable=False, default=0.0)
+    executions = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<AgentCostTotal(agent_id={self.agent_id}, provider={self.provider}, total={self.total_cost})>"
+
+
+class AgentCostDaily(Base):
+    """
+    Custo por agente, dia (UTC), provedor e modelo.
+    """
+    __tablename__ = "agent_cost_daily"
+
+    agent_id = Column(Integer, ForeignKey("agents.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    provider = Column(String(100), primary_key=True, default="")
+    model = Column(String(100), primary_key=True, default="")
+
+    total_cost = Column(Float, nullable=False, default=0.0)
+    executions = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<AgentCostDaily(agent_id={self.agent_id}, day={self.day}, total={self.total_cost})>"
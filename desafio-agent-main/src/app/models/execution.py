@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -26,4 +26,9 @@ class Execution(Base):
     )
 
     def __repr__(self):
-        return f"<Execution(id={self.id}, agent_id={self.agent_id}, input={self.input[:20]}...)>"
\ No newline at end of file
+        return f"<Execution(id={self.id}, agent_id={self.agent_id}, input={self.input[:20]}...)>"
+
+
+# paginação por cursor (created_at, id): listagem geral e por agente
+Index("idx_execution_created_id", Execution.created_at, Execution.id)
+Index("idx_execution_agent_created_id", Execution.agent_id, Execution.created_at, Execution.id)
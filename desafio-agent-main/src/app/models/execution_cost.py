@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, Float, ForeignKey, DateTime, func, UniqueConstraint, Index
+    Column, Integer, Float, String, ForeignKey, DateTime, func, UniqueConstraint, Index
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -19,6 +19,12 @@ class ExecutionCost(Base):
     agent = relationship("Agent")
 
     cost = Column(Float, nullable=False)
+    # provedor/modelo do agente no momento da execução: chave do custo nos rollups
+    provider = Column(String(100), nullable=True)
+    model = Column(String(100), nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    price_version = Column(String(50), nullable=True)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -30,4 +36,10 @@ class ExecutionCost(Base):
 UniqueConstraint("execution_id", "agent_id", name="uq_execution_agent")
 
 Index("idx_executioncost_execution", ExecutionCost.execution_id)
-Index("idx_executioncost_agent", ExecutionCost.agent_id)
\ No newline at end of file
+Index("idx_executioncost_agent", ExecutionCost.agent_id)
+# paginação por cursor e agregações por período; `cost` incluído para somas index-only (PostgreSQL)
+Index(
+    "idx_executioncost_agent_created_id",
+    ExecutionCost.agent_id, ExecutionCost.created_at, ExecutionCost.id,
+    postgresql_include=["cost"],
+)
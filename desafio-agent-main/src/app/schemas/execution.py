@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -26,4 +26,24 @@ class ExecutionResponseSchema(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ExecutionListItemSchema(BaseModel):
+    """
+    Execução na listagem paginada; com `fields`, só os campos pedidos são retornados.
+    """
+    id: int
+    agent_id: Optional[int] = None
+    input: Optional[str] = None
+    output: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class ExecutionPageSchema(BaseModel):
+    """
+    Página de execuções. `next_cursor` é repassado em `cursor` para a próxima
+    página; `None` indica a última.
+    """
+    items: List[ExecutionListItemSchema]
+    next_cursor: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -8,13 +8,30 @@ class ExecutionCostSchema(BaseModel):
     execution_id: int
     agent_id: int
     cost: float
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    price_version: Optional[str] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class CostRollupSchema(BaseModel):
+    """Custo agregado de um período (hora, dia ou mês)"""
+    bucket: datetime
+    total_cost: float
+    executions: int
+
+
 class AgentCostResponse(BaseModel):
+    """
+    Totais do agente (calculados no banco), uma página das execuções e,
+    se pedido, os custos agregados por período.
+    """
     agent_id: int
     total_cost: float
+    executions_count: int
     executions: List[ExecutionCostSchema]
+    next_cursor: Optional[str] = None
+    rollups: Optional[List[CostRollupSchema]] = None
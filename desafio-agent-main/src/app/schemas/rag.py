@@ -1,10 +1,28 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Any, Literal
 
 
 class QueryRequest(BaseModel):
     """Entrada para consultas no RAG"""
     question: str
+    agent_id: Optional[int] = None
+    mode: Optional[Literal["vector", "keyword", "hybrid"]] = None
+
+
+class SearchRequest(BaseModel):
+    """Busca nos documentos indexados, sem geração de resposta"""
+    question: str
+    agent_id: Optional[int] = None
+    mode: Optional[Literal["vector", "keyword", "hybrid"]] = None
+
+
+class SearchResult(BaseModel):
+    """Chunk retornado por uma busca"""
+    content: str
+    filename: Optional[str] = None
+    page: Optional[int] = None
+    chunk: Optional[int] = None
+    bm25: Optional[float] = None
 
 
 class QueryResponse(BaseModel):
@@ -12,8 +30,26 @@ class QueryResponse(BaseModel):
     answer: str
 
 
-class UploadResponse(BaseModel):
-    """Resposta ao indexar documento no ChromaDB"""
+class RagJobResponse(BaseModel):
+    """Estado de um job de indexação RAG"""
+    job_id: str
+    filename: str
+    agent_id: Optional[int] = None
     status: str
-    indexed_file: Optional[str] = None
-    detail: Optional[str] = None
+    pages_total: Optional[int] = None
+    pages_parsed: int = 0
+    chunks_parsed: int = 0
+    chunks_embedded: int = 0
+    elapsed_seconds: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[dict[str, Any]] = None
+
+
+class RagDocument(BaseModel):
+    """Documento presente no índice do ChromaDB"""
+    filename: str
+    chunks: int
+    pages: int
+    embed_model: Optional[str] = None
+    indexed_at: Optional[str] = None
@@ -1,15 +1,20 @@
-import os
+import asyncio
 import json
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.execution import Execution
 from app.services.execution_service import ExecutionService
 from app.services.cost_service import CostService
-from app.services.memory_service import MemoryService
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
+from app.services.memory_service import memory_service
+from app.services.pricing import pricing_engine
+from app.services.prompt_builder import PromptBuilder, count_tokens
+from app.core.llm_registry import llm_registry
+from app.core.metrics import observe_llm_stream
+from app.core.tracing import span, stream_span
 
 execution_service = ExecutionService()
 cost_service = CostService()
-memory_service = MemoryService()
+prompt_builder = PromptBuilder()
 
 
 class AgentExecutionService:
@@ -18,68 +23,146 @@ class AgentExecutionService:
     """
 
     def run_stream(self, db, agent, user_input: str):
-        full_answer, cost, usage = "", 0.0, {}
-
-        history = memory_service.get(agent.id) or ""
-        final_input = f"Histórico da conversa:\n{history}\n\nUsuário: {user_input}\nAgente:"
-
-        if agent.provider == "ollama":
-            llm = ChatOllama(
-                model=agent.model,
-                base_url=agent.base_url,
-                temperature=agent.temperature or 0
-            )
-            for chunk in llm.stream(final_input):
-                token = chunk.content or ""
-                full_answer += token
-                yield {"type": "token", "content": token}
-
-            cost = len(full_answer) * 0.001
-
-        elif agent.provider == "openai":
-            llm = ChatOpenAI(
-                model=agent.model,
-                api_key=os.getenv("OPENAI_API_KEY"),
-                temperature=agent.temperature or 0
-            )
-            for chunk in llm.stream(final_input):
-                token = chunk.content or ""
-                full_answer += token
-                yield {"type": "token", "content": token}
-
-                if hasattr(chunk, "response_metadata"):
-                    usage = chunk.response_metadata.get("token_usage", {}) or usage
-
-            cost = self._calculate_openai_cost(agent.model, usage)
-
-        else:
+        full_answer, usage = "", {}
+
+        llm = self._build_llm(agent)
+        if llm is None:
+            yield {"type": "error", "message": f"Provider {agent.provider} não suportado"}
+            return
+
+        with stream_span("agent.run", _span_attributes(agent)) as run:
+            with span("agent.input", parent=run):
+                prompt = self._build_input(agent, user_input)
+
+            with stream_span("llm.stream", _span_attributes(agent), parent=run) as llm_span:
+                started, first_token = time.perf_counter(), None
+                for chunk in llm.stream(prompt):
+                    token = chunk.content or ""
+                    if token and first_token is None:
+                        first_token = time.perf_counter()
+                        llm_span.add_event("first_token")
+                    full_answer += token
+                    yield {"type": "token", "content": token}
+                    usage = self._extract_usage(chunk) or usage
+
+                finished = time.perf_counter()
+                usage = self._complete_usage(agent, prompt, full_answer, usage)
+                llm_span.set_attributes(_usage_attributes(usage))
+            observe_llm_stream(agent.provider, agent.model, started, first_token, finished, usage["completion_tokens"])
+            cost = self._calculate_cost(agent, usage)
+
+            # 🔹 Salva execução e memória
+            with span("execution.create", parent=run):
+                execution = execution_service.create_execution(db, agent, user_input, full_answer, cost, usage)
+            with span("agent.memory.save", parent=run):
+                memory_service.add_interaction(agent.id, user_input, full_answer)
+
+            yield self._end_event(agent, full_answer, cost, usage, execution)
+
+    async def arun_stream(self, db: AsyncSession, agent, user_input: str):
+        """
+        Variante assíncrona de `run_stream`: consome `astream` dos providers e
+        persiste a execução via `AsyncSession`, sem ocupar o threadpool.
+        """
+        full_answer, usage = "", {}
+
+        llm = self._build_llm(agent)
+        if llm is None:
             yield {"type": "error", "message": f"Provider {agent.provider} não suportado"}
             return
 
-        # 🔹 Salva execução e memória
-        execution = execution_service.create_execution(db, agent, user_input, full_answer, cost)
-        memory_service.add_interaction(agent.id, user_input, full_answer)
-        history = memory_service.get(agent.id)
+        with stream_span("agent.run", _span_attributes(agent)) as run:
+            # memória fica no Redis: chamadas bloqueantes vão para thread
+            with span("agent.input", parent=run):
+                prompt = await asyncio.to_thread(self._build_input, agent, user_input)
+
+            with stream_span("llm.stream", _span_attributes(agent), parent=run) as llm_span:
+                started, first_token = time.perf_counter(), None
+                async for chunk in llm.astream(prompt):
+                    token = chunk.content or ""
+                    if token and first_token is None:
+                        first_token = time.perf_counter()
+                        llm_span.add_event("first_token")
+                    full_answer += token
+                    yield {"type": "token", "content": token}
+                    usage = self._extract_usage(chunk) or usage
+
+                finished = time.perf_counter()
+                usage = self._complete_usage(agent, prompt, full_answer, usage)
+                llm_span.set_attributes(_usage_attributes(usage))
+            observe_llm_stream(agent.provider, agent.model, started, first_token, finished, usage["completion_tokens"])
+            cost = self._calculate_cost(agent, usage)
 
-        yield {
+            # 🔹 Salva execução e memória
+            with span("execution.create", parent=run):
+                execution = await execution_service.acreate_execution(db, agent, user_input, full_answer, cost, usage)
+            with span("agent.memory.save", parent=run):
+                await asyncio.to_thread(memory_service.add_interaction, agent.id, user_input, full_answer)
+
+            yield await asyncio.to_thread(self._end_event, agent, full_answer, cost, usage, execution)
+
+    def _build_llm(self, agent):
+        return llm_registry.get(
+            agent.provider, agent.model, agent.base_url, agent.temperature or 0
+        )
+
+    def _build_input(self, agent, user_input: str) -> list:
+        with span("agent.memory.get"):
+            history = memory_service.get(agent.id)
+        with span("agent.prompt.build"):
+            return prompt_builder.build(agent.model, history, user_input)
+
+    def _extract_usage(self, chunk) -> dict:
+        """
+        Tokens informados pelo provider: `usage_metadata` (último chunk do stream;
+        no OpenAI via `stream_options.include_usage`) ou `token_usage` legado.
+        """
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+        token_usage = (getattr(chunk, "response_metadata", None) or {}).get("token_usage") or {}
+        if token_usage:
+            return {
+                "prompt_tokens": token_usage.get("prompt_tokens", 0),
+                "completion_tokens": token_usage.get("completion_tokens", 0),
+            }
+        return {}
+
+    def _complete_usage(self, agent, prompt: list, full_answer: str, usage: dict) -> dict:
+        """
+        Sem uso informado pelo provider, estima os tokens com o tokenizer do modelo.
+        """
+        if not usage:
+            usage = {
+                "prompt_tokens": prompt_builder.count(agent.model, prompt),
+                "completion_tokens": count_tokens(full_answer, agent.model),
+            }
+        return {**usage, "price_version": pricing_engine.version}
+
+    def _calculate_cost(self, agent, usage: dict) -> float:
+        return pricing_engine.cost(agent.provider, agent.model, usage["prompt_tokens"], usage["completion_tokens"])
+
+    def _end_event(self, agent, full_answer: str, cost: float, usage: dict, execution: Execution) -> dict:
+        return {
             "type": "end",
             "answer": full_answer,
-            "memory": history,
+            "memory": memory_service.get(agent.id),
             "cost": cost,
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"],
             "agent_name": agent.name,
             "provider": agent.provider,
             "model": agent.model,
             "execution_id": execution.id
         }
 
-    def _calculate_openai_cost(self, model: str, usage: dict) -> float:
-        OPENAI_PRICING = {
-            "gpt-4o": {"prompt": 0.005, "completion": 0.015},
-            "gpt-4o-mini": {"prompt": 0.003, "completion": 0.006},
-        }
-        pricing = OPENAI_PRICING.get(model)
-        if not pricing:
-            return 0.0
-        prompt_cost = (usage.get("prompt_tokens", 0) / 1000) * pricing["prompt"]
-        completion_cost = (usage.get("completion_tokens", 0) / 1000) * pricing["completion"]
-        return round(prompt_cost + completion_cost, 6)
\ No newline at end of file
+
+def _span_attributes(agent) -> dict:
+    return {"agent.id": agent.id, "gen_ai.system": agent.provider or "", "gen_ai.request.model": agent.model or ""}
+
+
+def _usage_attributes(usage: dict) -> dict:
+    return {
+        "gen_ai.usage.input_tokens": usage["prompt_tokens"],
+        "gen_ai.usage.output_tokens": usage["completion_tokens"],
+    }
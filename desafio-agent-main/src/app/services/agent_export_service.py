@@ -1,5 +1,14 @@
+import json
+import time
+import zlib
 from datetime import datetime
-from sqlalchemy.orm import Session, joinedload
+from itertools import chain, islice
+from typing import Callable, Iterable, Iterator
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.core.config import settings
 from app.models.agent import Agent
 from app.models.prompt import Prompt
 from app.schemas.agent_export import (
@@ -13,11 +22,14 @@ logger = get_logger(__name__)
 
 EXPORT_VERSION = 1
 
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+AGENT_FIELDS = ("description", "model", "temperature", "provider", "base_url", "active")
+
 class AgentExportService:
     @staticmethod
     def export_all(db: Session) -> AgentsExportPackage:
         agents = db.query(Agent).options(joinedload(Agent.prompts)).all()
-        logger.info(f"Exportando {len(agents)} agentes")
+        logger.info("Exportando %s agentes", len(agents))
         return AgentsExportPackage(
             version=EXPORT_VERSION,
             exported_at=datetime.utcnow(),
@@ -33,10 +45,10 @@ class AgentExportService:
             .first()
         )
         if not agent:
-            logger.warning(f"Tentativa de exportar agente inexistente id={agent_id}")
+            logger.warning("Tentativa de exportar agente inexistente id=%s", agent_id)
             raise ValueError("Agente não encontrado")
 
-        logger.info(f"Exportando agente {agent.id} - {agent.name}")
+        logger.info("Exportando agente %s - %s", agent.id, agent.name)
         return AgentsExportPackage(
             version=EXPORT_VERSION,
             exported_at=datetime.utcnow(),
@@ -44,79 +56,288 @@ class AgentExportService:
         )
 
     @staticmethod
-    def import_agents(db: Session, agents: list[AgentImportSchema]) -> dict:
-        created, updated = 0, 0
-        try:
-            for incoming in agents:
-                agent = (
-                    db.query(Agent)
-                    .filter(Agent.name == incoming.name, Agent.owner_id == incoming.owner_id)
-                    .first()
-                )
+    def iter_export(db: Session, chunk_size: int = 500) -> Iterator[AgentExportSchema]:
+        """
+        Percorre todos os agentes (com prompts) em lotes de `chunk_size`: cada lote
+        carrega seus prompts numa consulta (`selectinload`), sem montar o catálogo
+        inteiro em memória.
+        """
+        query = (
+            select(Agent)
+            .options(selectinload(Agent.prompts))
+            .order_by(Agent.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        for agent in db.scalars(query):
+            yield AgentExportSchema.model_validate(agent)
+
+    @staticmethod
+    def export_ndjson(db: Session, compress: bool = False, chunk_size: int = 500) -> Iterator[bytes]:
+        """
+        Exportação em NDJSON: uma linha de cabeçalho (`version`, `exported_at`) e
+        um agente por linha. Com `compress`, o fluxo sai em gzip.
+        """
+        gzip = zlib.compressobj(wbits=31) if compress else None
+        header = {"version": EXPORT_VERSION, "exported_at": datetime.utcnow().isoformat()}
+        lines = chain(
+            [json.dumps(header) + "\n"],
+            (agent.model_dump_json() + "\n" for agent in AgentExportService.iter_export(db, chunk_size)),
+        )
+        count = 0
+        for count, line in enumerate(lines):
+            data = line.encode("utf-8")
+            if gzip:
+                data = gzip.compress(data)
+            if data:
+                yield data
+        if gzip:
+            yield gzip.flush()
+        # o enumerate conta o cabeçalho a partir de 0: `count` é o nº de agentes
+        logger.info("Exportados %s agentes (NDJSON%s)", count, ", gzip" if compress else "")
 
+    @staticmethod
+    def parse_ndjson(chunks: Iterable[bytes]) -> Iterator[AgentImportSchema]:
+        """
+        Lê agentes de um fluxo NDJSON (gzip detectado pelo cabeçalho), linha a
+        linha, à medida que os blocos chegam. Aceita o formato de `export_ndjson`.
+        """
+        gunzip, buffer, number = None, b"", 0
+        for position, chunk in enumerate(chunks):
+            if position == 0 and chunk[:2] == b"\x1f\x8b":
+                gunzip = zlib.decompressobj(wbits=31)
+            buffer += gunzip.decompress(chunk) if gunzip else chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                number += 1
+                agent = _parse_line(line, number)
                 if agent:
-                    logger.info(f"Atualizando agente existente: {agent.name}")
-                    AgentExportService._update_agent(agent, incoming)
-                    updated += 1
-                else:
-                    logger.info(f"Criando novo agente: {incoming.name}")
-                    agent = AgentExportService._create_agent(db, incoming)
-                    created += 1
+                    yield agent
+        if gunzip:
+            buffer += gunzip.flush()
+        agent = _parse_line(buffer, number + 1)
+        if agent:
+            yield agent
 
-                AgentExportService._sync_prompts(db, agent, incoming.prompts)
+    @staticmethod
+    def import_agents(
+        db: Session,
+        agents: list[AgentImportSchema],
+        dry_run: bool = False,
+        batch_size: int | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> dict:
+        """
+        Importa agentes e prompts em massa, numa única transação.
 
-            db.commit()
+        Agentes são casados por (owner_id, name) e prompts por (agent_id, name):
+        os pares existentes são pré-carregados em poucas consultas e a gravação
+        é feita em lotes de `batch_size` agentes, com INSERT ... ON CONFLICT (id)
+        para os existentes e INSERT multi-row para os novos.
+        Com `dry_run`, só calcula as estatísticas (nada é gravado).
+        `progress(importados, total)` é chamado ao fim de cada lote.
+        """
+        batch_size = max(1, batch_size or settings.AGENT_IMPORT_BATCH_SIZE)
+        incoming = AgentExportService._merge_duplicates(agents)
+        keys = list(incoming)
+        batches = (
+            {key: incoming[key] for key in keys[start:start + batch_size]}
+            for start in range(0, len(keys), batch_size)
+        )
+        return AgentExportService._import(db, batches, len(keys), dry_run, progress)
+
+    @staticmethod
+    def import_stream(
+        db: Session,
+        agents: Iterable[AgentImportSchema],
+        dry_run: bool = False,
+        batch_size: int | None = None,
+        progress: Callable[[int, int | None], None] | None = None,
+    ) -> dict:
+        """
+        Como `import_agents`, mas consome os agentes sob demanda (ex.: `parse_ndjson`),
+        um lote por vez: a memória não depende do tamanho do pacote. Repetições
+        em lotes diferentes viram atualizações (na simulação, contam como criações).
+        """
+        batch_size = max(1, batch_size or settings.AGENT_IMPORT_BATCH_SIZE)
+        batches = (AgentExportService._merge_duplicates(chunk) for chunk in _chunks(agents, batch_size))
+        return AgentExportService._import(db, batches, None, dry_run, progress)
+
+    @staticmethod
+    def _import(db: Session, batches: Iterable[dict], total: int | None, dry_run: bool, progress) -> dict:
+        started = time.perf_counter()
+        stats = {"created": 0, "updated": 0, "prompts_created": 0, "prompts_updated": 0}
+        done = 0
+        try:
+            upsert = None if dry_run else AgentExportService._upsert(db)
+            for incoming in batches:
+                agent_ids = AgentExportService._existing_agents(db, list(incoming))
+                prompt_ids = AgentExportService._existing_prompts(db, list(agent_ids.values()))
+
+                for key, (_, prompts) in incoming.items():
+                    agent_id = agent_ids.get(key)
+                    stats["updated" if agent_id else "created"] += 1
+                    for name in prompts:
+                        stats["prompts_updated" if (agent_id, name) in prompt_ids else "prompts_created"] += 1
+
+                if not dry_run:
+                    batch = list(incoming.values())
+                    AgentExportService._write_agents(db, upsert, batch, agent_ids)
+                    AgentExportService._write_prompts(db, upsert, batch, agent_ids, prompt_ids)
+                done += len(incoming)
+                logger.info("Importação de agentes: %s/%s", done, total if total is not None else "?")
+                if progress:
+                    progress(done, total)
+            if not dry_run:
+                db.commit()
         except Exception as e:
             db.rollback()
-            logger.error(f"Erro ao importar agentes: {str(e)}")
+            logger.error("Erro ao importar agentes: %s", e)
             raise
 
-        return {"created": created, "updated": updated}
+        stats["dry_run"] = dry_run
+        stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(
+            "Importação %s: %s agentes criados, %s atualizados, %s prompts criados, %s atualizados",
+            "simulada" if dry_run else "concluída",
+            stats["created"], stats["updated"], stats["prompts_created"], stats["prompts_updated"],
+        )
+        return stats
 
     @staticmethod
-    def _update_agent(agent: Agent, data: AgentImportSchema):
-        agent.description = data.description
-        agent.model = data.model
-        agent.temperature = data.temperature
-        agent.provider = data.provider
-        agent.base_url = data.base_url
-        agent.active = data.active
+    def _upsert(db: Session):
+        dialect = db.get_bind().dialect.name
+        if dialect not in _INSERTS:
+            raise ValueError(f"Import em massa não suportado no banco {dialect}")
+        return _INSERTS[dialect]
 
     @staticmethod
-    def _create_agent(db: Session, data: AgentImportSchema) -> Agent:
-        agent = Agent(
-            name=data.name,
-            description=data.description,
-            model=data.model,
-            temperature=data.temperature,
-            owner_id=data.owner_id,
-            provider=data.provider,
-            base_url=data.base_url,
-            active=data.active,
-        )
-        db.add(agent)
-        db.flush()
-        return agent
+    def check_dialect(dialect: str):
+        """Falha na subida da aplicação, não no primeiro import, com um banco sem upsert."""
+        if dialect not in _INSERTS:
+            raise RuntimeError(f"Import em massa não suportado no banco {dialect}")
 
     @staticmethod
-    def _sync_prompts(db: Session, agent: Agent, prompts: list):
-        for pr in prompts:
-            prompt = (
-                db.query(Prompt)
-                .filter(Prompt.agent_id == agent.id, Prompt.name == pr.name)
-                .first()
-            )
-            if prompt:
-                logger.info(f"Atualizando prompt {pr.name} do agente {agent.id}")
-                prompt.description = pr.description
-                prompt.content = pr.content
+    def _merge_duplicates(agents: list[AgentImportSchema]) -> dict:
+        """
+        (owner_id, name) -> (agente, {nome do prompt: prompt}). Repetições no pacote
+        são mescladas: vale o último agente, com os prompts de todos (o último por nome).
+        """
+        merged: dict = {}
+        for agent in agents:
+            key = (agent.owner_id, agent.name)
+            prompts = merged[key][1] if key in merged else {}
+            prompts.update((pr.name, pr) for pr in agent.prompts)
+            merged[key] = (agent, prompts)
+        return merged
+
+    @staticmethod
+    def _existing_agents(db: Session, keys: list[tuple]) -> dict:
+        """(owner_id, name) -> id dos agentes já cadastrados (o de menor id, se repetidos)."""
+        found: dict = {}
+        if not keys:
+            return found
+        rows = db.execute(
+            select(Agent.id, Agent.owner_id, Agent.name)
+            .where(tuple_(Agent.owner_id, Agent.name).in_(keys))
+            .order_by(Agent.id)
+        ).all()
+        for agent_id, owner_id, name in rows:
+            found.setdefault((owner_id, name), agent_id)
+        return found
+
+    @staticmethod
+    def _existing_prompts(db: Session, agent_ids: list[int]) -> dict:
+        """(agent_id, name) -> id dos prompts já cadastrados dos agentes."""
+        found: dict = {}
+        if not agent_ids:
+            return found
+        rows = db.execute(
+            select(Prompt.id, Prompt.agent_id, Prompt.name)
+            .where(Prompt.agent_id.in_(agent_ids))
+            .order_by(Prompt.id)
+        ).all()
+        for prompt_id, agent_id, name in rows:
+            found.setdefault((agent_id, name), prompt_id)
+        return found
+
+    @staticmethod
+    def _write_agents(db: Session, upsert, batch: list[tuple], agent_ids: dict):
+        now = datetime.utcnow()
+        existing, new = [], []
+        for data, _ in batch:
+            row = {"owner_id": data.owner_id, "name": data.name, "updated_at": now}
+            row.update((field, getattr(data, field)) for field in AGENT_FIELDS)
+            agent_id = agent_ids.get((data.owner_id, data.name))
+            if agent_id:
+                existing.append({"id": agent_id, **row})
             else:
-                logger.info(f"Criando prompt {pr.name} para agente {agent.id}")
-                db.add(
-                    Prompt(
-                        agent_id=agent.id,
-                        name=pr.name,
-                        description=pr.description,
-                        content=pr.content,
-                    )
-                )
+                new.append({**row, "created_at": now})
+
+        if existing:
+            statement = upsert(Agent)
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[Agent.id],
+                    set_={field: statement.excluded[field] for field in AGENT_FIELDS + ("updated_at",)},
+                ),
+                existing,
+            )
+        if new:
+            ids = db.execute(
+                insert(Agent).returning(Agent.id, sort_by_parameter_order=True), new
+            ).scalars().all()
+            for row, agent_id in zip(new, ids):
+                agent_ids[(row["owner_id"], row["name"])] = agent_id
+
+    @staticmethod
+    def _write_prompts(db: Session, upsert, batch: list[tuple], agent_ids: dict, prompt_ids: dict):
+        existing, new = [], []
+        for data, prompts in batch:
+            agent_id = agent_ids[(data.owner_id, data.name)]
+            for name, pr in prompts.items():
+                row = {"agent_id": agent_id, "name": name, "description": pr.description, "content": pr.content}
+                prompt_id = prompt_ids.get((agent_id, name))
+                if prompt_id:
+                    existing.append({"id": prompt_id, **row})
+                else:
+                    new.append(row)
+
+        if existing:
+            statement = upsert(Prompt)
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[Prompt.id],
+                    set_={
+                        "description": statement.excluded.description,
+                        "content": statement.excluded.content,
+                        "updated_at": func.now(),
+                    },
+                ),
+                existing,
+            )
+        if new:
+            db.execute(insert(Prompt), new)
+
+
+def _parse_line(line: bytes, number: int) -> AgentImportSchema | None:
+    """Agente da linha NDJSON; linhas vazias e o cabeçalho da exportação são ignorados."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError("esperado um objeto JSON por linha")
+        if "version" in data and "name" not in data:
+            if data["version"] > EXPORT_VERSION:
+                raise ValueError(f"versão de exportação não suportada: {data['version']}")
+            return None
+        return AgentImportSchema.model_validate(data)
+    except (ValueError, ValidationError) as e:
+        raise ValueError(f"Linha {number} inválida: {e}") from e
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -1,3 +1,5 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.agent import Agent
 from app.db.openai_client import get_chat_completion
 from app.core.logging import get_logger
@@ -22,18 +24,22 @@ class AgentService:
         db.add(agent)
         db.commit()
         db.refresh(agent)
-        logger.info(f"Agente criado: {agent.id}")
+        logger.info("Agente criado: %s", agent.id)
         return agent
 
     def list(self, db):
         return db.query(Agent).all()
 
+    async def alist(self, db: AsyncSession):
+        """Versão assíncrona de `list`."""
+        return (await db.scalars(select(Agent))).all()
+
     async def run_task_async(self, agent: Agent, task: str) -> str:
         """
         Executa uma tarefa usando o agente.
         Integra com OpenAI (ou outro provider configurado).
         """
-        logger.info(f"Executando tarefa com o agente {agent.name} (id={agent.id})")
+        logger.info("Executando tarefa com o agente %s (id=%s)", agent.name, agent.id)
 
         messages = [
             {
@@ -55,5 +61,5 @@ class AgentService:
             )
             return response
         except Exception as e:
-            logger.error(f"Erro ao executar tarefa no agente {agent.id}: {str(e)}")
+            logger.error("Erro ao executar tarefa no agente %s: %s", agent.id, e)
             raise
\ No newline at end of file
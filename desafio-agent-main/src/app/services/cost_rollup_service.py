@@ -0,0 +1,184 @@
+from datetime import date, datetime, timezone
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.cost_rollup import AgentCostDaily, AgentCostTotal
+from app.models.execution import Execution
+from app.models.execution_cost import ExecutionCost
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def rollup_day(created_at: datetime | None) -> date:
+    """
+    Dia (em UTC) em que uma execução entra nos rollups diários, a partir do
+    `created_at` da execução; datetimes sem fuso são tratados como UTC.
+    """
+    if created_at is None:
+        return datetime.now(timezone.utc).date()
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def _utc_day(dialect: str, column):
+    # PostgreSQL: timestamptz convertido para UTC antes do corte (não no fuso da sessão);
+    # SQLite guarda o horário UTC sem fuso
+    if dialect == "postgresql":
+        return func.date(func.timezone("UTC", column))
+    return func.date(column)
+
+
+class CostRollupService:
+    """
+    Tabelas de custo pré-agregadas (totais por agente/provedor/modelo e por dia).
+
+    Cada custo registrado soma nas linhas correspondentes via upsert, na mesma
+    transação da execução; o resumo de custos lê só essas linhas, independente
+    do tamanho do histórico. `backfill` reconstrói as tabelas a partir de
+    `execution_costs`. O dia de um custo é sempre o dia UTC do `created_at`
+    da execução (`rollup_day`) e o provedor/modelo são os gravados no custo
+    (não os atuais do agente), no registro, na remoção e no backfill.
+    `executions` conta execuções distintas por linha.
+    """
+
+    @staticmethod
+    def check_dialect(dialect: str):
+        """Falha na subida da aplicação, não na primeira gravação, com um banco sem upsert."""
+        if dialect not in _INSERTS:
+            raise RuntimeError(f"Rollup de custos não suportado no banco {dialect}")
+
+    def record(
+        self, db: Session, agent_id: int, provider: str | None, model: str | None,
+        cost: float, created_at: datetime, executions: int = 1,
+    ):
+        """
+        Soma o custo nas tabelas de rollup (sem commit: usa a transação de `db`).
+        `provider`/`model` são os gravados no custo e `created_at` é o da execução.
+        """
+        for statement in self._upserts(db, agent_id, provider, model, cost, created_at, executions):
+            db.execute(statement)
+
+    async def arecord(
+        self, db: AsyncSession, agent_id: int, provider: str | None, model: str | None,
+        cost: float, created_at: datetime, executions: int = 1,
+    ):
+        """Versão assíncrona de `record`."""
+        for statement in self._upserts(db, agent_id, provider, model, cost, created_at, executions):
+            await db.execute(statement)
+
+    def remove(self, db: Session, execution: Execution):
+        """
+        Desconta dos rollups os custos de uma execução que será removida: por
+        provedor/modelo gravado, a soma dos custos e uma única execução (linhas
+        que ficam sem execuções são apagadas). Sem commit.
+        """
+        totals: dict = {}
+        for execution_cost in execution.costs:
+            key = (execution_cost.provider, execution_cost.model)
+            totals[key] = totals.get(key, 0.0) + execution_cost.cost
+        for (provider, model), cost in totals.items():
+            self.record(db, execution.agent_id, provider, model, -cost, execution.created_at, executions=-1)
+
+    def summary(self, db: Session, agent_id: int) -> dict:
+        """
+        Resumo de custos do agente lido das linhas de rollup (uma por provedor/modelo).
+        """
+        return self._summarize(db.scalars(self._summary_statement(agent_id)).all())
+
+    async def asummary(self, db: AsyncSession, agent_id: int) -> dict:
+        """Versão assíncrona de `summary`."""
+        return self._summarize((await db.scalars(self._summary_statement(agent_id))).all())
+
+    def backfill(self, db: Session) -> dict:
+        """
+        Reconstrói as tabelas de rollup a partir de `execution_costs` (INSERT ... SELECT
+        agregado no banco), numa única transação.
+        """
+        provider = func.coalesce(ExecutionCost.provider, "")
+        model = func.coalesce(ExecutionCost.model, "")
+        cost_sum = func.sum(ExecutionCost.cost)
+        cost_count = func.count(ExecutionCost.execution_id.distinct())
+        day = _utc_day(db.get_bind().dialect.name, Execution.created_at)
+        source = select(ExecutionCost).join(Execution, Execution.id == ExecutionCost.execution_id)
+
+        db.execute(delete(AgentCostDaily))
+        db.execute(delete(AgentCostTotal))
+        db.execute(insert(AgentCostTotal).from_select(
+            ["agent_id", "provider", "model", "total_cost", "executions"],
+            source.with_only_columns(ExecutionCost.agent_id, provider, model, cost_sum, cost_count)
+            .group_by(ExecutionCost.agent_id, provider, model),
+        ))
+        db.execute(insert(AgentCostDaily).from_select(
+            ["agent_id", "day", "provider", "model", "total_cost", "executions"],
+            source.with_only_columns(ExecutionCost.agent_id, day, provider, model, cost_sum, cost_count)
+            .group_by(ExecutionCost.agent_id, day, provider, model),
+        ))
+        db.commit()
+
+        result = {
+            "totals": db.query(func.count()).select_from(AgentCostTotal).scalar(),
+            "daily": db.query(func.count()).select_from(AgentCostDaily).scalar(),
+        }
+        logger.info("Rollups de custo reconstruídos: %d totais, %d diários", result["totals"], result["daily"])
+        return result
+
+    @staticmethod
+    def _summary_statement(agent_id: int):
+        return select(AgentCostTotal).where(AgentCostTotal.agent_id == agent_id)
+
+    @staticmethod
+    def _summarize(rows: list[AgentCostTotal]) -> dict:
+        total = sum(r.total_cost for r in rows)
+        count = sum(r.executions for r in rows)
+
+        by_provider: dict = {}
+        for r in rows:
+            provider = r.provider or None
+            by_provider[provider] = by_provider.get(provider, 0) + r.total_cost
+
+        return {
+            "total_cost": total,
+            "average_cost": total / count if count else 0,
+            "executions": count,
+            "by_provider": by_provider,
+        }
+
+    @staticmethod
+    def _upserts(
+        db, agent_id: int, provider: str | None, model: str | None,
+        cost: float, created_at: datetime, executions: int,
+    ):
+        dialect = db.get_bind().dialect.name
+        if dialect not in _INSERTS:
+            raise ValueError(f"Rollup de custos não suportado no banco {dialect}")
+        upsert = _INSERTS[dialect]
+        key = {"agent_id": agent_id, "provider": provider or "", "model": model or ""}
+        day: date = rollup_day(created_at)
+
+        for table, row, index in (
+            (AgentCostTotal, key, ["agent_id", "provider", "model"]),
+            (AgentCostDaily, {**key, "day": day}, ["agent_id", "day", "provider", "model"]),
+        ):
+            statement = upsert(table).values(**row, total_cost=cost, executions=executions)
+            yield statement.on_conflict_do_update(
+                index_elements=index,
+                set_={
+                    "total_cost": table.total_cost + statement.excluded.total_cost,
+                    "executions": table.executions + statement.excluded.executions,
+                },
+            )
+            if executions < 0:
+                # execução removida: a linha que zerou sai da tabela
+                yield delete(table).where(
+                    *[getattr(table, column) == value for column, value in row.items()],
+                    table.executions <= 0,
+                )
+
+
+# único serviço global
+cost_rollup_service = CostRollupService()
@@ -1,46 +1,197 @@
+from datetime import datetime
+from typing import Iterator
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
+from app.models.execution import Execution
 from app.models.execution_cost import ExecutionCost
 from app.models.agent import Agent
+from app.core.pagination import decode_cursor, encode_cursor
+from app.services.cost_rollup_service import cost_rollup_service
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+ROLLUP_BUCKETS = ("hour", "day", "month")
+# SQLite não tem date_trunc: trunca formatando a data
+_SQLITE_BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+    "month": "%Y-%m-01 00:00:00",
+}
+
 
 class CostService:
     def register_execution_cost(self, db: Session, execution_id: int, agent_id: int, cost: float):
+        """
+        Registra um custo para uma execução existente. Levanta ValueError se o
+        agente ou a execução não existirem.
+        """
+        agent = db.get(Agent, agent_id)
+        if agent is None:
+            raise ValueError("Agente não foi encontrado.")
+        execution = db.get(Execution, execution_id)
+        if execution is None:
+            raise ValueError("Execução não foi encontrada.")
+
+        # a execução conta uma vez por provedor/modelo nos rollups
+        counted = db.scalar(
+            select(func.count()).select_from(ExecutionCost).where(
+                ExecutionCost.execution_id == execution_id,
+                func.coalesce(ExecutionCost.provider, "") == (agent.provider or ""),
+                func.coalesce(ExecutionCost.model, "") == (agent.model or ""),
+            )
+        )
         execution_cost = ExecutionCost(
             execution_id=execution_id,
             agent_id=agent_id,
-            cost=cost
+            cost=cost,
+            created_at=execution.created_at,
+            provider=agent.provider,
+            model=agent.model,
         )
         db.add(execution_cost)
+        cost_rollup_service.record(
+            db, agent.id, agent.provider, agent.model, cost, execution.created_at, executions=0 if counted else 1
+        )
         db.commit()
-        logger.info(f"Custo registrado: agent_id={agent_id}, execution_id={execution_id}, cost={cost}")
+        logger.info("Custo registrado: agent_id=%s, execution_id=%s, cost=%s", agent_id, execution_id, cost)
+
+    def list_agent_costs(
+        self, db: Session, agent_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None,
+        created_from: datetime | None = None, created_to: datetime | None = None,
+    ) -> tuple[list[ExecutionCost], str | None]:
+        """
+        Custos do agente (mais recentes primeiro), paginados por cursor (created_at, id).
+        Retorna (página, próximo cursor).
+        """
+        statement, limit = self._page_statement(agent_id, limit, cursor, created_from, created_to)
+        return _page(db.scalars(statement).all(), limit)
+
+    async def alist_agent_costs(
+        self, db: AsyncSession, agent_id: int, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None,
+        created_from: datetime | None = None, created_to: datetime | None = None,
+    ) -> tuple[list[ExecutionCost], str | None]:
+        """Versão assíncrona de `list_agent_costs`."""
+        statement, limit = self._page_statement(agent_id, limit, cursor, created_from, created_to)
+        return _page((await db.scalars(statement)).all(), limit)
+
+    def iter_agent_costs(
+        self,
+        db: Session,
+        agent_id: int,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        batch_size: int = 1000,
+    ) -> Iterator[ExecutionCost]:
+        """
+        Percorre todos os custos do agente em lotes (cursor no servidor),
+        sem carregar o histórico inteiro em memória.
+        """
+        query = self._agent_filter(db.query(ExecutionCost), agent_id, created_from, created_to)
+        yield from (
+            query.order_by(ExecutionCost.created_at.desc(), ExecutionCost.id.desc())
+            .execution_options(stream_results=True)
+            .yield_per(batch_size)
+        )
+
+    def agent_cost_totals(
+        self, db: Session, agent_id: int,
+        created_from: datetime | None = None, created_to: datetime | None = None,
+    ) -> tuple[float, int]:
+        """
+        Custo total e nº de execuções do agente, agregados no banco.
+        """
+        total, count = db.execute(self._totals_statement(agent_id, created_from, created_to)).one()
+        return total or 0.0, count or 0
 
-    def list_agent_costs(self, db: Session, agent_id: int):
-        return db.query(ExecutionCost).filter(ExecutionCost.agent_id == agent_id).all()
+    async def aagent_cost_totals(
+        self, db: AsyncSession, agent_id: int,
+        created_from: datetime | None = None, created_to: datetime | None = None,
+    ) -> tuple[float, int]:
+        """Versão assíncrona de `agent_cost_totals`."""
+        total, count = (await db.execute(self._totals_statement(agent_id, created_from, created_to))).one()
+        return total or 0.0, count or 0
+
+    def rollup_agent_costs(
+        self, db: Session, agent_id: int, bucket: str,
+        created_from: datetime | None = None, created_to: datetime | None = None,
+    ) -> list[dict]:
+        """
+        Custos do agente agrupados por hora, dia ou mês (GROUP BY no banco).
+        """
+        rows = db.execute(self._rollup_statement(db, agent_id, bucket, created_from, created_to)).all()
+        return [{"bucket": b, "total_cost": total or 0.0, "executions": count} for b, total, count in rows]
+
+    async def arollup_agent_costs(
+        self, db: AsyncSession, agent_id: int, bucket: str,
+        created_from: datetime | None = None, created_to: datetime | None = None,
+    ) -> list[dict]:
+        """Versão assíncrona de `rollup_agent_costs`."""
+        statement = self._rollup_statement(db, agent_id, bucket, created_from, created_to)
+        rows = (await db.execute(statement)).all()
+        return [{"bucket": b, "total_cost": total or 0.0, "executions": count} for b, total, count in rows]
 
     def summarize_agent_costs(self, db: Session, agent_id: int):
-        total, avg, count = db.query(
-            func.sum(ExecutionCost.cost),
-            func.avg(ExecutionCost.cost),
-            func.count(ExecutionCost.id)
-        ).filter(ExecutionCost.agent_id == agent_id).first()
-
-        breakdown = (
-            db.query(Agent.provider, func.sum(ExecutionCost.cost))
-            .join(Agent, Agent.id == ExecutionCost.agent_id)
-            .filter(ExecutionCost.agent_id == agent_id)
-            .group_by(Agent.provider)
-            .all()
+        """
+        Resumo (total, média, nº de execuções, custo por provedor) lido das
+        tabelas de rollup: custo constante, independente do histórico.
+        """
+        return cost_rollup_service.summary(db, agent_id)
+
+    async def asummarize_agent_costs(self, db: AsyncSession, agent_id: int):
+        """Versão assíncrona de `summarize_agent_costs`."""
+        return await cost_rollup_service.asummary(db, agent_id)
+
+    def _page_statement(
+        self, agent_id: int, limit: int, cursor: str | None,
+        created_from: datetime | None = None, created_to: datetime | None = None,
+    ):
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        statement = self._agent_filter(select(ExecutionCost), agent_id, created_from, created_to)
+        if cursor:
+            created_at, cost_id = decode_cursor(cursor)
+            statement = statement.where(tuple_(ExecutionCost.created_at, ExecutionCost.id) < (created_at, cost_id))
+        statement = statement.order_by(ExecutionCost.created_at.desc(), ExecutionCost.id.desc()).limit(limit + 1)
+        return statement, limit
+
+    def _totals_statement(self, agent_id: int, created_from: datetime | None, created_to: datetime | None):
+        statement = select(func.sum(ExecutionCost.cost), func.count(ExecutionCost.id))
+        return self._agent_filter(statement, agent_id, created_from, created_to)
+
+    def _rollup_statement(
+        self, db, agent_id: int, bucket: str, created_from: datetime | None, created_to: datetime | None
+    ):
+        if bucket not in ROLLUP_BUCKETS:
+            raise ValueError(f"Intervalo inválido: {bucket}")
+        period = _bucket_expression(db, bucket).label("bucket")
+        statement = select(period, func.sum(ExecutionCost.cost), func.count(ExecutionCost.id))
+        return (
+            self._agent_filter(statement, agent_id, created_from, created_to)
+            .group_by(period)
+            .order_by(period)
         )
 
-        provider_costs = {provider: cost or 0 for provider, cost in breakdown}
+    @staticmethod
+    def _agent_filter(query, agent_id: int, created_from: datetime | None, created_to: datetime | None):
+        query = query.filter(ExecutionCost.agent_id == agent_id)
+        if created_from:
+            query = query.filter(ExecutionCost.created_at >= created_from)
+        if created_to:
+            query = query.filter(ExecutionCost.created_at < created_to)
+        return query
+
+
+def _page(rows: list[ExecutionCost], limit: int) -> tuple[list[ExecutionCost], str | None]:
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].created_at, page[-1].id) if len(rows) > limit else None
+    return page, next_cursor
+
 
-        return {
-            "total_cost": total or 0,
-            "average_cost": avg or 0,
-            "executions": count or 0,
-            "by_provider": provider_costs
-        }
+def _bucket_expression(db: Session | AsyncSession, bucket: str):
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime(_SQLITE_BUCKET_FORMATS[bucket], ExecutionCost.created_at)
+    return func.date_trunc(bucket, ExecutionCost.created_at)
@@ -1,15 +1,28 @@
+import asyncio
 import openai
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timezone
 
 from app.models.execution import Execution
 from app.models.execution_cost import ExecutionCost
 from app.models.agent import Agent
 from app.schemas.execution import ExecutionCreateSchema
+from app.core.pagination import decode_cursor, encode_cursor
+from app.services.cost_rollup_service import cost_rollup_service
+from app.services.execution_writer import execution_writer, usage_columns
+from app.services.pricing import pricing_engine
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# campos projetáveis na listagem; id e created_at sempre vêm (formam o cursor)
+LIST_FIELDS = ("id", "agent_id", "input", "output", "created_at", "updated_at")
+
 
 class ExecutionService:
     """
@@ -17,18 +30,28 @@ class ExecutionService:
     """
 
     def create_execution(
-        self, db: Session, agent: Agent, input_text: str, output_text: str, cost: float
+        self, db: Session, agent: Agent, input_text: str, output_text: str, cost: float,
+        usage: dict | None = None,
     ) -> Execution:
         """
         Cria uma nova execução associada a um agente e salva o custo.
+        `usage` traz os tokens de prompt/completion e a versão da tabela de preços.
+        Com write-behind ativo (`EXECUTION_WRITE_MODE`), a gravação vai para o
+        buffer em lote; no modo `durable`, aguarda o commit do lote.
         """
-        logger.info(f"Criando execução para agente {agent.id} - {agent.name}")
+        if execution_writer.enabled:
+            execution, written = execution_writer.submit(agent, input_text, output_text, cost, usage)
+            if execution_writer.durable:
+                written.result()
+            return execution
+
+        logger.info("Criando execução para agente %s - %s", agent.id, agent.name)
 
         execution = Execution(
             agent_id=agent.id,
             input=input_text,
             output=output_text,
-            created_at=datetime.utcnow(),
+            created_at=datetime.now(timezone.utc),
         )
         db.add(execution)
         db.flush()
@@ -37,15 +60,67 @@ class ExecutionService:
             execution_id=execution.id,
             agent_id=agent.id,
             cost=cost,
+            # mesmo instante da execução: o dia do rollup não depende do relógio do banco
+            created_at=execution.created_at,
+            provider=agent.provider,
+            model=agent.model,
+            **usage_columns(usage),
         )
         db.add(execution_cost)
+        # rollups atualizados na mesma transação: o resumo de custos nunca diverge
+        cost_rollup_service.record(db, agent.id, agent.provider, agent.model, cost, execution.created_at)
 
         db.commit()
         db.refresh(execution)
 
-        logger.info(
-            f"Execução {execution.id} criada para agente {agent.id} com custo {cost}"
+        logger.info("Execução %s criada para agente %s com custo %s", execution.id, agent.id, cost)
+
+        return execution
+
+    async def acreate_execution(
+        self, db: AsyncSession, agent: Agent, input_text: str, output_text: str, cost: float,
+        usage: dict | None = None,
+    ) -> Execution:
+        """
+        Versão assíncrona de `create_execution`, usada pelo streaming async.
+        """
+        if execution_writer.enabled:
+            # a pré-alocação de ids pode ir ao banco (um round-trip por bloco)
+            execution, written = await asyncio.to_thread(
+                execution_writer.submit, agent, input_text, output_text, cost, usage
+            )
+            if execution_writer.durable:
+                await asyncio.wrap_future(written)
+            return execution
+
+        logger.info("Criando execução para agente %s - %s", agent.id, agent.name)
+
+        execution = Execution(
+            agent_id=agent.id,
+            input=input_text,
+            output=output_text,
+            created_at=datetime.now(timezone.utc),
         )
+        db.add(execution)
+        await db.flush()
+
+        execution_cost = ExecutionCost(
+            execution_id=execution.id,
+            agent_id=agent.id,
+            cost=cost,
+            # mesmo instante da execução: o dia do rollup não depende do relógio do banco
+            created_at=execution.created_at,
+            provider=agent.provider,
+            model=agent.model,
+            **usage_columns(usage),
+        )
+        db.add(execution_cost)
+        await cost_rollup_service.arecord(db, agent.id, agent.provider, agent.model, cost, execution.created_at)
+
+        await db.commit()
+        await db.refresh(execution)
+
+        logger.info("Execução %s criada para agente %s com custo %s", execution.id, agent.id, cost)
 
         return execution
 
@@ -56,12 +131,12 @@ class ExecutionService:
         """
         agent = db.query(Agent).filter(Agent.id == exec.agent_id).first()
         if not agent:
-            logger.warning(f"Agente {exec.agent_id} não encontrado")
+            logger.warning("Agente %s não encontrado", exec.agent_id)
             raise ValueError("Agente não foi encontrado.")
 
         logger.info(
-            f"Executando agente {agent.id} ({agent.name}) "
-            f"modelo={agent.model}, temp={agent.temperature}"
+            "Executando agente %s (%s) modelo=%s, temp=%s",
+            agent.id, agent.name, agent.model, agent.temperature,
         )
 
         # chamada ao OpenAI
@@ -72,10 +147,14 @@ class ExecutionService:
         )
         output = response.choices[0].message.content
 
-        # custo simplificado (pode ser melhorado com token_usage)
-        cost = 0.001 * len(output)
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "price_version": pricing_engine.version,
+        }
+        cost = pricing_engine.cost(agent.provider, agent.model, usage["prompt_tokens"], usage["completion_tokens"])
 
-        return self.create_execution(db, agent, exec.input, output, cost)
+        return self.create_execution(db, agent, exec.input, output, cost, usage)
 
     def get_execution(self, db: Session, execution_id: int) -> Execution | None:
         """
@@ -83,14 +162,43 @@ class ExecutionService:
         """
         return db.query(Execution).filter(Execution.id == execution_id).first()
 
-    def list_executions(self, db: Session, agent_id: int | None = None) -> list[Execution]:
+    async def aget_execution(self, db: AsyncSession, execution_id: int) -> Execution | None:
+        """Versão assíncrona de `get_execution`."""
+        return await db.get(Execution, execution_id)
+
+    def list_executions(
+        self,
+        db: Session,
+        agent_id: int | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        fields: list[str] | None = None,
+    ) -> tuple[list[dict], str | None]:
         """
-        Lista execuções, opcionalmente filtradas por agente.
+        Lista execuções (mais recentes primeiro), opcionalmente filtradas por
+        agente e intervalo de datas, paginadas por cursor (created_at, id).
+
+        Só as colunas de `fields` são lidas do banco: omitir `input`/`output`
+        evita trafegar os textos longos. Retorna (itens, próximo cursor).
         """
-        query = db.query(Execution)
-        if agent_id:
-            query = query.filter(Execution.agent_id == agent_id)
-        return query.order_by(Execution.created_at.desc()).all()
+        statement, limit = _list_statement(agent_id, limit, cursor, created_from, created_to, fields)
+        return _page(db.execute(statement).all(), limit)
+
+    async def alist_executions(
+        self,
+        db: AsyncSession,
+        agent_id: int | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+        created_from: datetime | None = None,
+        created_to: datetime | None = None,
+        fields: list[str] | None = None,
+    ) -> tuple[list[dict], str | None]:
+        """Versão assíncrona de `list_executions`."""
+        statement, limit = _list_statement(agent_id, limit, cursor, created_from, created_to, fields)
+        return _page((await db.execute(statement)).all(), limit)
 
     def delete_execution(self, db: Session, execution_id: int) -> bool:
         """
@@ -98,11 +206,52 @@ class ExecutionService:
         """
         execution = db.query(Execution).filter(Execution.id == execution_id).first()
         if not execution:
-            logger.warning(f"Tentativa de deletar execução inexistente id={execution_id}")
+            logger.warning("Tentativa de deletar execução inexistente id=%s", execution_id)
             return False
 
+        # desconta dos rollups os custos removidos em cascata, nas linhas em que foram somados
+        cost_rollup_service.remove(db, execution)
         db.delete(execution)
         db.commit()
 
-        logger.info(f"Execução {execution_id} removida com sucesso")
+        logger.info("Execução %s removida com sucesso", execution_id)
         return True
+
+
+def _list_columns(fields: list[str] | None) -> list[str]:
+    if not fields:
+        return list(LIST_FIELDS)
+    unknown = set(fields) - set(LIST_FIELDS)
+    if unknown:
+        raise ValueError(f"Campos inválidos: {', '.join(sorted(unknown))}")
+    requested = {"id", "created_at", *fields}
+    return [name for name in LIST_FIELDS if name in requested]
+
+
+def _list_statement(agent_id, limit, cursor, created_from, created_to, fields):
+    columns = _list_columns(fields)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    statement = select(*[getattr(Execution, name) for name in columns])
+    if agent_id:
+        statement = statement.where(Execution.agent_id == agent_id)
+    if created_from:
+        statement = statement.where(Execution.created_at >= created_from)
+    if created_to:
+        statement = statement.where(Execution.created_at < created_to)
+    if cursor:
+        created_at, execution_id = decode_cursor(cursor)
+        # keyset: continua exatamente após o último item da página anterior
+        statement = statement.where(tuple_(Execution.created_at, Execution.id) < (created_at, execution_id))
+
+    # uma linha a mais indica se há próxima página
+    statement = statement.order_by(Execution.created_at.desc(), Execution.id.desc()).limit(limit + 1)
+    return statement, limit
+
+
+def _page(rows, limit: int) -> tuple[list[dict], str | None]:
+    items = [row._asdict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1]["created_at"], items[-1]["id"])
+    return items, next_cursor
@@ -0,0 +1,360 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from sqlalchemy import func, insert, select, text
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.core.tracing import current_span_context, span
+from app.models.execution import Execution
+from app.models.execution_cost import ExecutionCost
+from app.services.cost_rollup_service import cost_rollup_service, rollup_day
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+WRITE_MODES = ("sync", "buffered", "durable")
+# espera máxima (s) de `submit` por espaço no buffer cheio
+SUBMIT_TIMEOUT = 5.0
+# espera máxima (s) entre tentativas após falhas seguidas
+MAX_BACKOFF = 30.0
+
+
+class BufferFullError(Exception):
+    """Buffer de execuções sem vagas."""
+
+
+class IdAllocator:
+    """
+    Reserva ids de uma tabela em blocos, para atribuí-los antes do INSERT.
+
+    PostgreSQL: `nextval` da sequence da coluna, um bloco por round-trip.
+    Outros bancos (SQLite, desenvolvimento): contador local a partir de MAX(id),
+    válido apenas com um único processo gravando.
+    """
+
+    def __init__(self, session_factory, model, block_size: int):
+        self.session_factory = session_factory
+        self.model = model
+        self.block_size = max(1, block_size)
+        self._ids: deque = deque()
+        self._last = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> int:
+        with self._lock:
+            if not self._ids:
+                self._ids.extend(self._fetch_block())
+            return self._ids.popleft()
+
+    def _fetch_block(self) -> list[int]:
+        table = self.model.__tablename__
+        with self.session_factory() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                return db.execute(
+                    text(f"SELECT nextval(pg_get_serial_sequence('{table}', 'id')) FROM generate_series(1, :n)"),
+                    {"n": self.block_size},
+                ).scalars().all()
+            start = max(self._last, db.execute(select(func.max(self.model.id))).scalar() or 0)
+        self._last = start + self.block_size
+        return list(range(start + 1, self._last + 1))
+
+
+class ExecutionWriter:
+    """
+    Buffer write-behind de execuções e custos.
+
+    `submit` atribui o id (pré-alocado) e devolve a execução na hora; uma thread
+    grava o buffer em lotes multi-row (execuções, custos e rollups numa única
+    transação) ao atingir `batch_size` ou a cada `flush_interval` segundos.
+
+    Modos (`EXECUTION_WRITE_MODE`):
+    - `sync`: desativado, cada execução é gravada na requisição (padrão);
+    - `buffered`: confirma antes de gravar; uma queda do processo perde o buffer;
+    - `durable`: o chamador espera o commit do lote que contém sua execução
+      (group commit: vários chamadores dividem o mesmo commit).
+
+    Um lote que falha é regravado item a item, para isolar o que não grava
+    (ex.: agente removido). No `durable`, o erro vai para o chamador do item;
+    no `buffered`, o item volta para o buffer e, após `max_retries` falhas,
+    é descartado com os dados no log de erro (`dead_lettered`). Falhas
+    seguidas espaçam as tentativas (backoff exponencial).
+
+    O buffer tem no máximo `max_pending` itens: cheio, `submit` espera até
+    `SUBMIT_TIMEOUT` por espaço e então levanta `BufferFullError`.
+    """
+
+    def __init__(
+        self, session_factory, mode: str, batch_size: int, flush_interval: float, id_block_size: int,
+        max_retries: int = 5, max_pending: int = 10_000,
+    ):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"Modo de gravação inválido: {mode}")
+        self.session_factory = session_factory
+        self.mode = mode
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max(1, max_retries)
+        self.max_pending = max(self.batch_size, max_pending)
+        self._ids = IdAllocator(session_factory, Execution, id_block_size)
+        self._buffer: list[dict] = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.rejected = 0
+        self.last_flush_ms = None
+        self._consecutive_failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "sync"
+
+    @property
+    def durable(self) -> bool:
+        return self.mode == "durable"
+
+    def submit(
+        self, agent, input_text: str, output_text: str, cost: float, usage: dict | None = None
+    ) -> tuple[Execution, Future]:
+        """
+        Enfileira a execução e seu custo. Retorna a execução (com id) e um
+        Future resolvido quando o lote for gravado.
+        """
+        execution = Execution(
+            id=self._ids.next(),
+            agent_id=agent.id,
+            input=input_text,
+            output=output_text,
+            created_at=datetime.now(timezone.utc),
+        )
+        written = Future()
+        # cópia dos campos usados nos rollups: a instância ORM não sai da sessão da requisição
+        snapshot = SimpleNamespace(id=agent.id, provider=agent.provider, model=agent.model)
+        item = {
+            "execution": execution, "agent": snapshot, "cost": cost, "usage": usage, "future": written,
+            # o lote é gravado em outra thread: cada requisição vira um link do span do lote
+            "trace": current_span_context(),
+        }
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Buffer de execuções encerrado")
+            self._start()
+            # backpressure: com o buffer cheio (ex.: banco fora), espera a gravação liberar espaço
+            if not self._cond.wait_for(
+                lambda: self._closed or len(self._buffer) < self.max_pending, timeout=SUBMIT_TIMEOUT
+            ):
+                self.rejected += 1
+                raise BufferFullError(f"Buffer de execuções cheio ({self.max_pending} pendentes)")
+            if self._closed:
+                raise RuntimeError("Buffer de execuções encerrado")
+            self._buffer.append(item)
+            self.submitted += 1
+            if self.durable or len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return execution, written
+
+    def flush(self) -> bool:
+        """
+        Grava imediatamente tudo o que está no buffer (na thread chamadora).
+        Para na primeira falha (os itens que falharam voltam ao buffer).
+        """
+        while True:
+            batch = self._take()
+            if not batch:
+                return True
+            if not self._write(batch):
+                return False
+
+    def close(self):
+        """
+        Grava o buffer pendente e encerra a thread de gravação. O que ainda
+        não gravar após `max_retries` tentativas é descartado para o log de erro.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join()
+        for _ in range(self.max_retries):
+            if self.flush():
+                return
+        with self._cond:
+            remaining, self._buffer = self._buffer, []
+        self._dead_letter(remaining, "encerramento com o banco indisponível")
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "mode": self.mode,
+                "pending": len(self._buffer),
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+                "submitted": self.submitted,
+                "written": self.written,
+                "batches": self.batches,
+                "failures": self.failures,
+                "dead_lettered": self.dead_lettered,
+                "rejected": self.rejected,
+                "max_pending": self.max_pending,
+                "last_flush_ms": self.last_flush_ms,
+            }
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="execution-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # durable: grava assim que houver algo (o lote cresce enquanto o anterior grava)
+                self._cond.wait_for(
+                    lambda: self._closed or len(self._buffer) >= self.batch_size
+                    or (self.durable and self._buffer),
+                    timeout=self.flush_interval,
+                )
+                closed = self._closed
+            batch = self._take()
+            if batch and not self._write(batch) and not closed:
+                backoff = min(self.flush_interval * 2 ** (self._consecutive_failures - 1), MAX_BACKOFF)
+                # espera interrompida pelo `close`
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, timeout=backoff)
+            if closed:
+                return
+
+    def _take(self) -> list[dict]:
+        with self._cond:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            if batch:
+                # libera quem espera por espaço no buffer
+                self._cond.notify_all()
+            return batch
+
+    def _write(self, batch: list[dict]) -> bool:
+        # um span por lote, ligado (links) aos spans das requisições que o compõem
+        with span("execution_writer.flush", {"batch.size": len(batch)}, links=[i["trace"] for i in batch]):
+            error = self._write_batch(batch)
+            if error is None:
+                self._consecutive_failures = 0
+                return True
+            # isola os itens que não gravam: os demais do lote seguem
+            if len(batch) > 1:
+                failed = [(i, e) for i in batch if (e := self._write_batch([i])) is not None]
+            else:
+                failed = [(batch[0], error)]
+            if failed:
+                self._consecutive_failures += 1
+                self._fail(failed)
+            return not failed
+
+    def _fail(self, failed: list[tuple[dict, Exception]]):
+        if self.durable:
+            for item, error in failed:
+                item["future"].set_exception(error)
+            return
+        retry, dead = [], []
+        for item, error in failed:
+            item["attempts"] = item.get("attempts", 0) + 1
+            (dead if item["attempts"] >= self.max_retries else retry).append((item, error))
+        with self._cond:
+            self._buffer[0:0] = [item for item, _ in retry]
+        for item, error in dead:
+            self._dead_letter([item], error)
+
+    def _dead_letter(self, items: list[dict], reason):
+        """Descarta itens que não gravam, com os dados no log (para reprocessamento manual)."""
+        if not items:
+            return
+        with self._cond:
+            self.dead_lettered += len(items)
+        for item in items:
+            row = {**_execution_row(item["execution"]), "cost": item["cost"], **usage_columns(item["usage"])}
+            logger.error(
+                "Execução %s descartada após %d tentativas (%s): %r",
+                item["execution"].id, item.get("attempts", 0), reason, row,
+            )
+            if not item["future"].done():
+                item["future"].set_exception(RuntimeError(f"Execução descartada: {reason}"))
+
+    def _write_batch(self, batch: list[dict]) -> Exception | None:
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            db.execute(insert(Execution), [_execution_row(i["execution"]) for i in batch])
+            db.execute(insert(ExecutionCost), [
+                {
+                    "execution_id": i["execution"].id, "agent_id": i["agent"].id, "cost": i["cost"],
+                    "created_at": i["execution"].created_at,
+                    "provider": i["agent"].provider, "model": i["agent"].model,
+                    **usage_columns(i["usage"]),
+                }
+                for i in batch
+            ])
+            # um upsert de rollup por (agente, provedor, modelo, dia), não por execução
+            rollups: dict = {}
+            for i in batch:
+                agent = i["agent"]
+                key = (agent.id, agent.provider, agent.model, rollup_day(i["execution"].created_at))
+                created_at, total, count = rollups.get(key, (i["execution"].created_at, 0.0, 0))
+                rollups[key] = (created_at, total + i["cost"], count + 1)
+            for (agent_id, provider, model, _), (created_at, total, count) in rollups.items():
+                cost_rollup_service.record(db, agent_id, provider, model, total, created_at, executions=count)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            with self._cond:
+                self.failures += 1
+            logger.error("Falha ao gravar lote de %d execuções: %s", len(batch), e)
+            return e
+        finally:
+            db.close()
+
+        with self._cond:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+        for i in batch:
+            i["future"].set_result(i["execution"].id)
+        logger.debug("Lote de %d execuções gravado em %sms", len(batch), self.last_flush_ms)
+        return None
+
+
+def usage_columns(usage: dict | None) -> dict:
+    """Colunas de uso de tokens de `ExecutionCost` a partir do dict de uso."""
+    usage = usage or {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "price_version": usage.get("price_version"),
+    }
+
+
+def _execution_row(execution: Execution) -> dict:
+    return {
+        "id": execution.id,
+        "agent_id": execution.agent_id,
+        "input": execution.input,
+        "output": execution.output,
+        "created_at": execution.created_at,
+    }
+
+
+# único buffer global
+execution_writer = ExecutionWriter(
+    SessionLocal,
+    mode=settings.EXECUTION_WRITE_MODE,
+    batch_size=settings.EXECUTION_BATCH_SIZE,
+    flush_interval=settings.EXECUTION_FLUSH_INTERVAL,
+    id_block_size=settings.EXECUTION_ID_BLOCK_SIZE,
+    max_retries=settings.EXECUTION_MAX_RETRIES,
+    max_pending=settings.EXECUTION_MAX_PENDING,
+)
@@ -24,7 +24,7 @@ class HealthService:
             db.execute(text("SELECT 1"))
             logger.info("Banco de dados disponível")
         except Exception as e:
-            logger.error(f"Banco de dados indisponível: {e}")
+            logger.error("Banco de dados indisponível: %s", e)
             status["status"] = "error"
             status["database"] = "Indisponível"
 
@@ -42,7 +42,7 @@ class HealthService:
                 openai.models.list()
                 logger.info("Conexão com OpenAI OK")
             except Exception as e:
-                logger.error(f"Falha ao conectar com OpenAI: {e}")
+                logger.error("Falha ao conectar com OpenAI: %s", e)
                 status["status"] = "error"
                 status["openai"] = "Indisponível"
 
@@ -56,7 +56,7 @@ class HealthService:
             else:
                 raise Exception("Resposta inválida do Redis")
         except Exception as e:
-            logger.error(f"Redis indisponível: {e}")
+            logger.error("Redis indisponível: %s", e)
             status["status"] = "error"
             status["redis"] = "Indisponível"
 
@@ -1,5 +1,4 @@
-from collections import defaultdict
-from app.core.config import settings
+from app.core.memory import memory_backend
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -7,43 +6,41 @@ logger = get_logger(__name__)
 
 class MemoryService:
     """
-    Serviço simples de memória de agentes em runtime (in-memory).
-    Guarda interações (input/output) de cada agente.
-    Opcionalmente respeita limite e TTL.
+    Serviço de memória de agentes.
+    Guarda interações (input/output) de cada agente no backend compartilhado
+    (Redis entre workers, ou local se indisponível), respeitando limite e TTL.
     """
 
-    def __init__(self):
-        self._store = defaultdict(list)
+    def __init__(self, backend=None):
+        self._backend = backend or memory_backend
 
     def add_interaction(self, agent_id: int, user_input: str, agent_output: str):
         """
         Salva uma interação no histórico de memória de um agente.
         """
-        logger.debug(f"Memória: adicionando interação para agent_id={agent_id}")
-        history = self._store[agent_id]
-
-        history.append({"input": user_input, "output": agent_output})
-
-        if settings.AGENT_MEMORY_LIMIT and len(history) > settings.AGENT_MEMORY_LIMIT:
-            self._store[agent_id] = history[-settings.AGENT_MEMORY_LIMIT :]
+        logger.debug("Memória: adicionando interação para agent_id=%s", agent_id)
+        self._backend.add(agent_id, user_input, agent_output)
 
     def get(self, agent_id: int) -> list[dict]:
         """
         Recupera todo histórico de memória de um agente.
         """
-        return self._store.get(agent_id, [])
+        return self._backend.get(agent_id)
 
     def clear(self, agent_id: int):
         """
         Limpa memória de um agente.
         """
-        if agent_id in self._store:
-            logger.info(f"Memória limpa para agent_id={agent_id}")
-            del self._store[agent_id]
+        logger.info("Memória limpa para agent_id=%s", agent_id)
+        self._backend.clear(agent_id)
 
     def clear_all(self):
         """
         Limpa memória de todos os agentes.
         """
         logger.info("Memória limpa para todos os agentes")
-        self._store.clear()
\ No newline at end of file
+        self._backend.clear_all()
+
+
+# instância única, compartilhada pelas rotas e pelo serviço de execução
+memory_service = MemoryService()
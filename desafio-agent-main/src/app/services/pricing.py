@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PRICING_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "pricing.json")
+
+
+class PricingEngine:
+    """
+    Tabela de preços por token, carregada de um arquivo JSON versionado.
+
+    Preços por 1K tokens de prompt e de completion, por `provider:modelo`.
+    A busca tenta o modelo exato, depois o maior prefixo cadastrado
+    (ex.: `gpt-4o-mini-2024-07-18` → `gpt-4o-mini`), `provider:*` e `default`.
+    O arquivo é relido quando muda (verificado a cada `reload_interval` segundos),
+    sem reiniciar a aplicação; se a nova versão for inválida, a anterior é mantida.
+    """
+
+    def __init__(self, path: str, reload_interval: float):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._table: dict = {"version": None, "models": {}, "default": {"prompt": 0.0, "completion": 0.0}}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    @property
+    def version(self) -> str | None:
+        return self._current().get("version")
+
+    def price(self, provider: str | None, model: str | None) -> dict:
+        """Preço (por 1K tokens) de prompt e completion do modelo."""
+        table = self._current()
+        models = table["models"]
+        provider, model = provider or "", model or ""
+
+        exact = models.get(f"{provider}:{model}")
+        if exact:
+            return exact
+        prefixes = [k for k in models if k.startswith(f"{provider}:") and model.startswith(k.split(":", 1)[1])]
+        if prefixes:
+            return models[max(prefixes, key=len)]
+        return models.get(f"{provider}:*") or table["default"]
+
+    def cost(self, provider: str | None, model: str | None, prompt_tokens: int, completion_tokens: int) -> float:
+        price = self.price(provider, model)
+        prompt_cost = (prompt_tokens or 0) / 1000 * price.get("prompt", 0.0)
+        completion_cost = (completion_tokens or 0) / 1000 * price.get("completion", 0.0)
+        return round(prompt_cost + completion_cost, 8)
+
+    def stats(self) -> dict:
+        table = self._current()
+        return {
+            "path": self.path,
+            "version": table.get("version"),
+            "currency": table.get("currency"),
+            "models": len(table["models"]),
+            "reloads": self.reloads,
+        }
+
+    def _current(self) -> dict:
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.reload_interval:
+            return self._table
+        with self._lock:
+            if self._mtime is None or now - self._checked_at >= self.reload_interval:
+                self._checked_at = now
+                self._reload_if_changed()
+        return self._table
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            if self._mtime is None:
+                logger.error("Tabela de preços indisponível (%s): %s", self.path, e)
+                self._mtime = 0.0
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                table = json.load(fh)
+            table.setdefault("models", {})
+            table.setdefault("default", {"prompt": 0.0, "completion": 0.0})
+        except (OSError, ValueError) as e:
+            logger.error(
+                "Tabela de preços inválida (%s), mantendo a versão %s: %s",
+                self.path, self._table.get("version"), e,
+            )
+            self._mtime = mtime
+            return
+        self._table, self._mtime = table, mtime
+        self.reloads += 1
+        logger.info("Tabela de preços carregada: versão %s (%s modelos)", table.get("version"), len(table["models"]))
+
+
+# única tabela global
+pricing_engine = PricingEngine(
+    path=settings.PRICING_FILE or DEFAULT_PRICING_FILE,
+    reload_interval=settings.PRICING_RELOAD_INTERVAL,
+)
@@ -0,0 +1,138 @@
+from functools import lru_cache
+import tiktoken
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# custo fixo aproximado de cada mensagem no formato de chat (papel + separadores)
+MESSAGE_OVERHEAD_TOKENS = 4
+SUMMARY_HEADER = "Resumo das interações anteriores:"
+SUMMARY_SNIPPET_CHARS = 160
+
+
+@lru_cache(maxsize=64)
+def _encoding_for(model: str):
+    """
+    Tokenizer do modelo, carregado uma única vez por processo.
+    Modelos sem encoding conhecido (ex.: Ollama) usam o cl100k_base como
+    aproximação; sem tokenizer disponível, retorna None (estimativa por caracteres).
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return _base_encoding()
+    except Exception as e:
+        logger.warning("Tokenizer indisponível para %s: %s", model, e)
+        return None
+
+
+@lru_cache(maxsize=1)
+def _base_encoding():
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("Tokenizer cl100k_base indisponível: %s", e)
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Conta os tokens de um texto para o modelo informado.
+    """
+    encoding = _encoding_for(model or "")
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class PromptBuilder:
+    """
+    Monta o prompt de um agente como mensagens de chat (histórico + entrada),
+    respeitando um orçamento de tokens.
+
+    As interações mais recentes têm prioridade; as mais antigas que não cabem
+    são resumidas numa mensagem de sistema ou descartadas. Quando o histórico
+    não cabe inteiro, `summary_tokens` do orçamento ficam reservados ao resumo.
+    """
+
+    def __init__(self, max_tokens: int = settings.AGENT_PROMPT_MAX_TOKENS,
+                 summary_tokens: int = settings.AGENT_PROMPT_SUMMARY_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+
+    def build(self, model: str, history: list[dict], user_input: str) -> list[BaseMessage]:
+        question = HumanMessage(content=user_input)
+        budget = self.max_tokens - self._message_tokens(question, model)
+        history = history or []
+
+        # custo das interações, da mais recente para a mais antiga, até passar do orçamento
+        turns: list[tuple[list[BaseMessage], int]] = []
+        total = 0
+        for turn in reversed(history):
+            messages = [HumanMessage(content=turn["input"]), AIMessage(content=turn["output"])]
+            cost = sum(self._message_tokens(m, model) for m in messages)
+            turns.append((messages, cost))
+            total += cost
+            if total > budget:
+                break
+
+        # nem tudo cabe: o resumo tem a sua parte reservada antes das interações recentes
+        available = budget if total <= budget else budget - self.summary_tokens
+        kept: list[list[BaseMessage]] = []
+        used = 0
+        for messages, cost in turns:
+            if used + cost > available:
+                break
+            kept.append(messages)
+            used += cost
+
+        prompt: list[BaseMessage] = []
+        dropped = list(reversed(history[:len(history) - len(kept)]))
+        if dropped:
+            summary = self._summarize(model, dropped, min(budget - used, self.summary_tokens))
+            if summary:
+                prompt.append(summary)
+            logger.debug("Prompt: %d interações antigas fora do orçamento de tokens", len(dropped))
+
+        for messages in reversed(kept):
+            prompt.extend(messages)
+        prompt.append(question)
+        return prompt
+
+    def count(self, model: str, messages: list[BaseMessage]) -> int:
+        return sum(self._message_tokens(m, model) for m in messages)
+
+    def _summarize(self, model: str, dropped: list[dict], budget: int) -> SystemMessage | None:
+        """
+        Resumo extrativo (sem chamada ao LLM): um trecho de cada interação
+        descartada, das mais recentes para as mais antigas, até caber no orçamento.
+        """
+        budget -= count_tokens(SUMMARY_HEADER, model) + MESSAGE_OVERHEAD_TOKENS
+        lines = []
+        for turn in dropped:
+            line = (
+                f"- Usuário: {_snippet(turn['input'])} | "
+                f"Agente: {_snippet(turn['output'])}"
+            )
+            cost = count_tokens(line, model) + 1
+            if cost > budget:
+                break
+            lines.append(line)
+            budget -= cost
+
+        if not lines:
+            return None
+        return SystemMessage(content="\n".join([SUMMARY_HEADER, *reversed(lines)]))
+
+    @staticmethod
+    def _message_tokens(message: BaseMessage, model: str) -> int:
+        return count_tokens(message.content, model) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= SUMMARY_SNIPPET_CHARS:
+        return text
+    return text[:SUMMARY_SNIPPET_CHARS].rstrip() + "…"
@@ -13,7 +13,7 @@ class PromptService:
     """
 
     def create_prompt(self, db: Session, prompt_in: PromptCreate) -> Prompt:
-        logger.info(f"Criando prompt '{prompt_in.name}' vinculado ao agente {prompt_in.agent_id}")
+        logger.info("Criando prompt '%s' vinculado ao agente %s", prompt_in.name, prompt_in.agent_id)
         prompt = Prompt(
             name=prompt_in.name,
             description=prompt_in.description,
@@ -24,25 +24,25 @@ class PromptService:
         db.add(prompt)
         db.commit()
         db.refresh(prompt)
-        logger.info(f"Prompt criado com sucesso: {prompt.id}")
+        logger.info("Prompt criado com sucesso: %s", prompt.id)
         return prompt
 
     def list_prompts(self, db: Session) -> list[Prompt]:
         prompts = db.query(Prompt).all()
-        logger.info(f"Listando {len(prompts)} prompts")
+        logger.info("Listando %s prompts", len(prompts))
         return prompts
 
     def test_prompt(self, db: Session, agent_id: int, prompt_id: int) -> dict:
-        logger.info(f"Testando prompt {prompt_id} com agente {agent_id}")
+        logger.info("Testando prompt %s com agente %s", prompt_id, agent_id)
         agent = db.query(Agent).filter(Agent.id == agent_id).first()
         prompt = db.query(Prompt).filter(Prompt.id == prompt_id).first()
 
         if not agent or not prompt:
-            logger.warning(f"Agente {agent_id} ou Prompt {prompt_id} não encontrado")
+            logger.warning("Agente %s ou Prompt %s não encontrado", agent_id, prompt_id)
             return None
 
         output = f"Agente: {agent.name} processando: {prompt.content}"
-        logger.info(f"Test prompt concluído: {output}")
+        logger.info("Test prompt concluído: %s", output)
 
         return {
             "agent_id": agent.id,
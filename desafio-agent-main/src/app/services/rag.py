@@ -1,11 +1,17 @@
-import os
-from langchain_community.vectorstores import Chroma
-from langchain.chains import ConversationalRetrievalChain
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
 from langchain.prompts import PromptTemplate
-from langchain_ollama import ChatOllama, OllamaEmbeddings
+from langchain_ollama import ChatOllama
 from app.core.config import settings
 from app.core.logging import get_logger
 from app.core.memory import AgentMemory
+from app.core.metrics import RAG_CONDENSE, RAG_GENERATION, RAG_RETRIEVAL
+from app.core.tracing import span
+from app.services.rag_answer_cache import rag_answer_cache
+from app.services.rag_retrieval import RETRIEVAL_MODES, EmptyRetriever
+from app.services.rag_store import get_embeddings, rag_store_registry
 
 logger = get_logger(__name__)
 
@@ -26,21 +32,25 @@ Responda em português de forma clara e objetiva:
 
 
 class RagService:
+    """
+    Pipeline RAG (condensação da pergunta + busca + geração), montado uma vez
+    por instância e reutilizado entre requisições.
+
+    Equivale ao `ConversationalRetrievalChain` com os mesmos prompts, sem a
+    camada de chains aninhadas: por consulta só restam a busca e as chamadas ao LLM.
+    Todos os componentes são stateless entre chamadas e seguros entre threads.
+
+    Cada agente consulta só a própria partição (coleção Chroma + BM25);
+    sem agente, a busca usa a coleção global.
+    """
+
     def __init__(self):
         self.ollama_url = settings.OLLAMA_BASE_URL
         self.persist_dir = settings.CHROMA_PERSIST_DIR
 
-        self.embeddings = OllamaEmbeddings(
-            model=settings.OLLAMA_EMBED_MODEL,
-            base_url=self.ollama_url
-        )
-
-        self.db = Chroma(
-            persist_directory=self.persist_dir,
-            embedding_function=self.embeddings
-        )
-
-        self.retriever = self.db.as_retriever(search_kwargs={"k": settings.RAG_TOP_K})
+        # mesmos clientes (e cache de embeddings) usados na indexação
+        self.embeddings = get_embeddings()
+        self.stores = rag_store_registry
 
         self.llm = ChatOllama(
             model=settings.OLLAMA_MODEL,
@@ -48,29 +58,214 @@ class RagService:
             base_url=self.ollama_url
         )
 
-    def query_rag(self, query: str, agent_id: int | None = None) -> str:
+    @contextmanager
+    def retriever(self, mode: str | None = None, agent_id: int | None = None):
+        """
+        Retriever do modo informado (`vector`, `keyword` ou `hybrid`) na partição
+        do agente; sem modo, usa `RAG_RETRIEVAL_MODE`. A partição fica reservada
+        durante o bloco; se ainda não existe, não é criada (busca vazia).
+        """
+        mode = mode or settings.RAG_RETRIEVAL_MODE
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Modo de busca inválido: {mode}")
+        with self.stores.lease(agent_id, self.persist_dir, create=False) as store:
+            yield store.retrievers[mode] if store is not None else EmptyRetriever()
+
+    @asynccontextmanager
+    async def aretriever(self, mode: str | None = None, agent_id: int | None = None):
+        """Versão assíncrona de `retriever`: a reserva da partição não bloqueia o event loop."""
+        mode = mode or settings.RAG_RETRIEVAL_MODE
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Modo de busca inválido: {mode}")
+        async with self.stores.alease(agent_id, self.persist_dir, create=False) as store:
+            yield store.retrievers[mode] if store is not None else EmptyRetriever()
+
+    def search(self, query: str, mode: str | None = None, agent_id: int | None = None) -> list:
+        """
+        Apenas a busca, sem LLM. No modo `keyword` não gera embeddings.
+        """
+        with self.retriever(mode, agent_id) as retriever:
+            return retriever.invoke(query)
+
+    def query_rag(self, query: str, agent_id: int | None = None, mode: str | None = None) -> str:
         """
         Executa uma query RAG e retorna resposta em português.
+        Perguntas semanticamente equivalentes a uma já respondida (mesmo agente
+        e modo) são atendidas pelo cache semântico, exceto no meio de uma
+        conversa (a resposta depende do histórico) e na busca só por palavras-chave.
+        """
+        mode = mode or settings.RAG_RETRIEVAL_MODE
+        scope = (agent_id, mode)
+
+        with span("rag.query", {"rag.mode": mode, "agent.id": agent_id or 0}) as query_span:
+            try:
+                with span("rag.memory.get"):
+                    chat_history = AgentMemory.get(agent_id) if agent_id else []
+
+                embedding = None
+                if _cacheable(mode, chat_history):
+                    with span("rag.cache.lookup"):
+                        embedding = self.embeddings.embed_query(query)
+                        cached = rag_answer_cache.get(scope, embedding)
+                    if cached:
+                        query_span.set_attribute("rag.cached", True)
+                        logger.info("RAG (cache, similaridade=%.3f) query='%s...'", cached["similarity"], query[:30])
+                        return cached["answer"]
+
+                mark = time.perf_counter()
+                with span("rag.condense"):
+                    question = self._condense_question(query, chat_history)
+                if chat_history:
+                    RAG_CONDENSE.observe(time.perf_counter() - mark)
+
+                mark = time.perf_counter()
+                with span("rag.retrieve") as retrieve_span, self.retriever(mode, agent_id) as retriever:
+                    docs = retriever.invoke(question)
+                    retrieve_span.set_attribute("rag.documents", len(docs))
+                RAG_RETRIEVAL.observe(time.perf_counter() - mark)
+
+                mark = time.perf_counter()
+                with span("rag.generate"):
+                    answer = self.llm.invoke(self._qa_prompt(question, docs, chat_history)).content
+                RAG_GENERATION.observe(time.perf_counter() - mark)
+
+                if embedding is not None:
+                    rag_answer_cache.put(scope, embedding, docs, answer)
+                logger.info("RAG executado (query='%s...') → resposta gerada", query[:30])
+                return answer
+            except Exception as e:
+                logger.error("Erro no RAG: %s", e)
+                raise
+
+    async def aquery_stream(self, query: str, agent_id: int | None = None, mode: str | None = None):
+        """
+        Variante em streaming de `query_rag`: emite as fontes recuperadas, depois
+        os tokens conforme são gerados e, ao final, as métricas de tempo de cada etapa.
         """
-        chat_history = []
-        if agent_id:
-            chat_history = AgentMemory.get(agent_id)
-
-        chain = ConversationalRetrievalChain.from_llm(
-            self.llm,
-            self.retriever,
-            combine_docs_chain_kwargs={"prompt": QA_PROMPT}
+        started = time.perf_counter()
+        mode = mode or settings.RAG_RETRIEVAL_MODE
+        scope = (agent_id, mode)
+
+        chat_history = await asyncio.to_thread(AgentMemory.get, agent_id) if agent_id else []
+
+        embedding = None
+        if _cacheable(mode, chat_history):
+            embedding = await self.embeddings.aembed_query(query)
+            cached = rag_answer_cache.get(scope, embedding)
+            if cached:
+                yield {"type": "sources", "question": query, "sources": [_source_meta(m) for m in cached["sources"]]}
+                yield {"type": "token", "content": cached["answer"]}
+                yield {
+                    "type": "end",
+                    "answer": cached["answer"],
+                    "cached": True,
+                    "similarity": round(cached["similarity"], 4),
+                    "timings": {"total_ms": _elapsed_ms(started)},
+                }
+                return
+
+        mark = time.perf_counter()
+        question = await self._acondense_question(query, chat_history)
+        condense_ms = _elapsed_ms(mark)
+        if chat_history:
+            RAG_CONDENSE.observe(condense_ms / 1000)
+
+        mark = time.perf_counter()
+        async with self.aretriever(mode, agent_id) as retriever:
+            docs = await retriever.ainvoke(question)
+        retrieval_ms = _elapsed_ms(mark)
+        RAG_RETRIEVAL.observe(retrieval_ms / 1000)
+        yield {"type": "sources", "question": question, "sources": [_source(doc) for doc in docs]}
+
+        mark = time.perf_counter()
+        answer, first_token_ms = "", None
+        async for chunk in self.llm.astream(self._qa_prompt(question, docs, chat_history)):
+            token = chunk.content or ""
+            if not token:
+                continue
+            if first_token_ms is None:
+                first_token_ms = _elapsed_ms(started)
+            answer += token
+            yield {"type": "token", "content": token}
+        generation_ms = _elapsed_ms(mark)
+        RAG_GENERATION.observe(generation_ms / 1000)
+
+        if embedding is not None:
+            rag_answer_cache.put(scope, embedding, docs, answer)
+        logger.info("RAG (stream) executado (query='%s...') → resposta gerada", query[:30])
+        yield {
+            "type": "end",
+            "answer": answer,
+            "cached": False,
+            "timings": {
+                "condense_ms": condense_ms,
+                "retrieval_ms": retrieval_ms,
+                "generation_ms": generation_ms,
+                "first_token_ms": first_token_ms,
+                "total_ms": _elapsed_ms(started),
+            },
+        }
+
+    async def _acondense_question(self, query: str, chat_history: list[dict]) -> str:
+        if not chat_history:
+            return query
+        prompt = CONDENSE_QUESTION_PROMPT.format(
+            chat_history=_format_chat_history(chat_history), question=query
+        )
+        return (await self.llm.ainvoke(prompt)).content
+
+    def _condense_question(self, query: str, chat_history: list[dict]) -> str:
+        """
+        Com histórico, reescreve a pergunta para ser autocontida (usada na busca).
+        """
+        if not chat_history:
+            return query
+        prompt = CONDENSE_QUESTION_PROMPT.format(
+            chat_history=_format_chat_history(chat_history), question=query
         )
+        return self.llm.invoke(prompt).content
+
+    def _qa_prompt(self, question: str, docs: list, chat_history: list[dict]) -> str:
+        return QA_PROMPT.format(
+            context="\n\n".join(doc.page_content for doc in docs),
+            chat_history=_format_chat_history(chat_history),
+            question=question,
+        )
+
+
+def _cacheable(mode: str, chat_history: list[dict]) -> bool:
+    """
+    O cache é indexado pela pergunta crua: com histórico, a mesma pergunta
+    ("E o prazo?") tem outra resposta em cada conversa. No modo `keyword`,
+    a consulta ao cache custaria o único embedding da requisição.
+    """
+    return rag_answer_cache.enabled and not chat_history and mode != "keyword"
+
+
+def _format_chat_history(chat_history: list[dict]) -> str:
+    return "".join(
+        f"\nHuman: {turn['input']}\nAssistant: {turn['output']}" for turn in chat_history
+    )
+
+
+def _source(doc) -> dict:
+    return _source_meta(doc.metadata)
+
+
+def _source_meta(metadata: dict) -> dict:
+    return {
+        "filename": metadata.get("filename"),
+        "page": metadata.get("page"),
+        "chunk": metadata.get("chunk"),
+    }
+
+
+def search_result(doc) -> dict:
+    return {**_source(doc), "content": doc.page_content, "bm25": doc.metadata.get("bm25")}
 
-        try:
-            result = chain.invoke({"question": query, "chat_history": chat_history})
-            answer = result["answer"]
 
-            logger.info(f"RAG executado (query='{query[:30]}...') → resposta gerada")
-            return answer
-        except Exception as e:
-            logger.error(f"Erro no RAG: {str(e)}")
-            raise
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
 
 
 __all__ = ["RagService"]
\ No newline at end of file
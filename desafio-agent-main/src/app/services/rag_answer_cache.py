@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.memory import KEY_PREFIX
+from app.core.redis import redis_client
+
+logger = get_logger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Cache semântico de respostas do RAG.
+
+    Guarda (embedding da pergunta, fontes recuperadas, resposta) por escopo
+    (agente + modo de busca). Uma pergunta nova reaproveita a resposta quando a
+    similaridade de cosseno com uma pergunta em cache passa de `threshold`.
+    Entradas expiram por TTL, são removidas por LRU acima de `max_size` e
+    invalidadas quando algum documento de origem é reindexado; com `client`
+    (Redis), a invalidação é publicada para os demais workers.
+
+    Os embeddings de cada escopo ficam numa matriz mantida no put/remoção:
+    a consulta é um único produto matriz-vetor.
+    """
+
+    def __init__(self, max_size: int, ttl: int, threshold: float, client=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.client = client
+        self.channel = f"{KEY_PREFIX}:rag-answer-cache:invalidate"
+        self._node_id = uuid.uuid4().hex
+        self._entries: OrderedDict = OrderedDict()
+        # escopo -> (chaves, matriz de embeddings na mesma ordem)
+        self._scopes: dict = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        if self.enabled and self.client is not None:
+            self._start_listener()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, scope: tuple, embedding: list[float]) -> dict | None:
+        """
+        Retorna a entrada mais similar do escopo (acima do limiar), ou None.
+        """
+        if not self.enabled:
+            return None
+        query = _normalize(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_expired(now)
+            keys, matrix = self._scopes.get(scope, ([], None))
+            if keys:
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return {**self._entries[key], "similarity": float(scores[best])}
+            self.misses += 1
+            return None
+
+    def put(self, scope: tuple, embedding: list[float], docs: list, answer: str):
+        if not self.enabled:
+            return
+        entry = {
+            "scope": scope,
+            "embedding": _normalize(embedding),
+            "sources": [dict(d.metadata) for d in docs],
+            "filenames": {d.metadata.get("filename") for d in docs},
+            "answer": answer,
+            "created_at": time.monotonic(),
+        }
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._entries[key] = entry
+            keys, matrix = self._scopes.get(scope, ([], None))
+            matrix = entry["embedding"][None, :] if matrix is None else np.vstack([matrix, entry["embedding"]])
+            self._scopes[scope] = (keys + [key], matrix)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_documents(self, filenames: set[str], agent_id: int | None = None):
+        """
+        Remove respostas que usaram chunks dos arquivos informados, na partição
+        do agente (cada agente consulta só os próprios documentos), neste e,
+        via Redis, nos demais workers.
+        """
+        self._invalidate(filenames, agent_id)
+        if self.client is not None and self.enabled:
+            message = {"node": self._node_id, "agent_id": agent_id, "filenames": sorted(filenames)}
+            try:
+                self.client.publish(self.channel, json.dumps(message))
+            except Exception as e:
+                # sem a publicação, o TTL limita a defasagem nos outros workers
+                logger.warning("Invalidação do cache semântico não publicada: %s", e)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def _invalidate(self, filenames: set[str], agent_id: int | None):
+        with self._lock:
+            stale = [
+                k for k, e in self._entries.items()
+                if e["scope"][0] == agent_id and e["filenames"] & filenames
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+        if stale:
+            logger.info("Cache semântico: %s respostas invalidadas (%s)", len(stale), ", ".join(sorted(filenames)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        keys, matrix = self._scopes[entry["scope"]]
+        if len(keys) == 1:
+            del self._scopes[entry["scope"]]
+            return
+        index = keys.index(key)
+        self._scopes[entry["scope"]] = (keys[:index] + keys[index + 1:], np.delete(matrix, index, axis=0))
+
+    def _evict_expired(self, now: float):
+        if self.ttl <= 0:
+            return
+        expired = [k for k, e in self._entries.items() if now - e["created_at"] > self.ttl]
+        for key in expired:
+            self._remove(key)
+            self.evictions += 1
+
+    def _on_invalidate(self, message) -> None:
+        data = json.loads(message["data"])
+        if data["node"] == self._node_id:
+            return
+        self._invalidate(set(data["filenames"]), data["agent_id"])
+
+    def _start_listener(self) -> None:
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_invalidate})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            # sem invalidação remota, o TTL do cache limita a defasagem
+            logger.warning("Invalidação do cache semântico via pub/sub indisponível: %s", e)
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# único cache global
+rag_answer_cache = SemanticAnswerCache(
+    max_size=settings.RAG_ANSWER_CACHE_SIZE,
+    ttl=settings.RAG_ANSWER_CACHE_TTL,
+    threshold=settings.RAG_ANSWER_CACHE_THRESHOLD,
+    client=redis_client,
+)
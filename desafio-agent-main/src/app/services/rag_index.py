@@ -1,53 +1,291 @@
-import os
-from langchain_community.vectorstores import Chroma
-from langchain_ollama import OllamaEmbeddings
+import hashlib
+import time
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterator
 from langchain.docstore.document import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from fastapi import UploadFile
 from pypdf import PdfReader
 from app.core.config import settings
+from app.core.tracing import bind_context, span
+from app.services.rag_answer_cache import rag_answer_cache
+from app.services.rag_retrieval import KeywordIndex
+from app.services.rag_store import RagStore, get_embeddings, rag_store_registry
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
-def process_file(file: UploadFile) -> str:
-    """Extrai texto de PDF, TXT ou Markdown."""
-    content = ""
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
+
+
+def iter_pages(file: UploadFile, stats: dict | None = None) -> Iterator[tuple[int, str]]:
+    """
+    Extrai o texto página a página, sob demanda (PDF, TXT ou Markdown).
+    Arquivos de texto são tratados como uma única página.
+    Se `stats` for informado, registra o total de páginas em `pages_total`.
+    """
+    stats = stats if stats is not None else {}
     if file.filename.endswith(".pdf"):
         pdf = PdfReader(file.file)
+        stats["pages_total"] = len(pdf.pages)
         for page_num, page in enumerate(pdf.pages, start=1):
             page_text = page.extract_text() or ""
-            content += page_text
-            logger.debug(f"Página {page_num} extraída ({len(page_text)} chars)")
+            logger.debug("Página %s extraída (%d chars)", page_num, len(page_text))
+            yield page_num, page_text
     elif file.filename.endswith((".txt", ".md")):
-        content = file.file.read().decode("utf-8")
+        stats["pages_total"] = 1
+        yield 1, file.file.read().decode("utf-8")
     else:
-        logger.error(f"Formato de arquivo não suportado: {file.filename}")
+        logger.error("Formato de arquivo não suportado: %s", file.filename)
         raise ValueError("Formato de arquivo não suportado")
-    return content
 
 
-def index_document(file: UploadFile, persist_dir: str = None):
-    ollama_url = settings.OLLAMA_BASE_URL
-    persist_dir = persist_dir or settings.CHROMA_PERSIST_DIR
+def chunk_hash(text: str, model: str) -> str:
+    """Hash de conteúdo do chunk: texto normalizado + modelo de embeddings."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+def chunk_id(filename: str, content_hash: str) -> str:
+    """Id do chunk no Chroma: conteúdo com escopo no arquivo de origem."""
+    return hashlib.sha256(f"{filename}\0{content_hash}".encode("utf-8")).hexdigest()
 
-    embeddings = OllamaEmbeddings(
-        model=settings.OLLAMA_EMBED_MODEL,
-        base_url=ollama_url
+
+def iter_chunks(filename: str, pages: Iterator[tuple[int, str]], stats: dict) -> Iterator[Document]:
+    """
+    Divide cada página em chunks com sobreposição, preservando a página de origem.
+    Chunks repetidos no mesmo arquivo (mesmo hash) são emitidos uma única vez.
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.RAG_CHUNK_SIZE,
+        chunk_overlap=settings.RAG_CHUNK_OVERLAP,
     )
+    model = settings.OLLAMA_EMBED_MODEL
+    seen = set()
+    for page_num, text in pages:
+        stats["pages"] += 1
+        for chunk_num, chunk in enumerate(splitter.split_text(text)):
+            stats["chunks_parsed"] += 1
+            content_hash = chunk_hash(chunk, model)
+            doc_id = chunk_id(filename, content_hash)
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            yield Document(
+                id=doc_id,
+                page_content=chunk,
+                metadata={
+                    "filename": filename,
+                    "page": page_num,
+                    "chunk": chunk_num,
+                    "content_hash": content_hash,
+                    "embed_model": model,
+                },
+            )
+
+
+def iter_batches(chunks: Iterator[Document], size: int) -> Iterator[list[Document]]:
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _prepare_batch(collection, batch: list[Document], stats: dict) -> tuple[list[Document], dict]:
+    """
+    Separa o lote em chunks já indexados (só atualiza metadados), chunks cujo
+    vetor pode ser reaproveitado de outro arquivo e chunks que precisam de embedding.
+    Retorna (novos chunks, vetores reaproveitados por hash).
+    """
+    indexed_at = datetime.now(timezone.utc).isoformat()
+    for doc in batch:
+        doc.metadata["indexed_at"] = indexed_at
+
+    with span("rag.prepare_batch", {"rag.chunks": len(batch)}):
+        existing = set(collection.get(ids=[d.id for d in batch], include=[])["ids"])
+        unchanged = [d for d in batch if d.id in existing]
+        if unchanged:
+            collection.update(ids=[d.id for d in unchanged], metadatas=[d.metadata for d in unchanged])
+            stats["chunks_skipped"] += len(unchanged)
+
+        new = [d for d in batch if d.id not in existing]
+        reused = {}
+        if new:
+            found = collection.get(
+                where={"content_hash": {"$in": [d.metadata["content_hash"] for d in new]}},
+                include=["embeddings", "metadatas"],
+            )
+            for meta, vector in zip(found["metadatas"], found["embeddings"]):
+                reused[meta["content_hash"]] = vector
+        return new, reused
+
+
+def _write_batch(collection, batch: list[Document], vectors: list[list[float]]) -> int:
+    # escrita em lote direto na coleção: os vetores já foram calculados
+    if batch:
+        with span("rag.write_batch", {"rag.chunks": len(batch)}):
+            collection.upsert(
+                ids=[doc.id for doc in batch],
+                embeddings=vectors,
+                documents=[doc.page_content for doc in batch],
+                metadatas=[doc.metadata for doc in batch],
+            )
+    return len(batch)
+
 
-    db = Chroma(
-        persist_directory=persist_dir,
-        embedding_function=embeddings
+def _embed(embeddings, new: list[Document], reused: dict) -> list[list[float]]:
+    """Gera embeddings apenas dos chunks sem vetor reaproveitável."""
+    missing = [d for d in new if d.metadata["content_hash"] not in reused]
+    with span("rag.embed", {"rag.chunks": len(missing), "rag.chunks_reused": len(new) - len(missing)}):
+        vectors = dict(zip(
+            (d.id for d in missing),
+            embeddings.embed_documents([d.page_content for d in missing]) if missing else [],
+        ))
+    return [vectors.get(d.id) or reused[d.metadata["content_hash"]] for d in new]
+
+
+def _delete_stale(collection, keyword_index: KeywordIndex, filename: str, current_ids: set) -> int:
+    with span("rag.delete_stale"):
+        stored = collection.get(where={"filename": filename}, include=[])["ids"]
+        stale = [i for i in stored if i not in current_ids]
+        if stale:
+            collection.delete(ids=stale)
+            keyword_index.delete(stale)
+        return len(stale)
+
+
+def index_document(file: UploadFile, persist_dir: str = None,
+                   progress: Callable[[dict], None] | None = None, agent_id: int | None = None):
+    """
+    Pipeline de indexação: extrai páginas sob demanda, divide em chunks,
+    gera embeddings em lotes (com concorrência limitada) e grava no Chroma em lote.
+
+    Os chunks também vão para o índice BM25 (busca por palavra-chave).
+
+    Indexação incremental: chunks inalterados (mesmo hash) não são reprocessados,
+    vetores de conteúdo já indexado em outro arquivo são reaproveitados e, ao
+    final, chunks que não existem mais no arquivo são removidos.
+    `progress` recebe os contadores (páginas, chunks) após cada lote gravado.
+    Com `agent_id`, o documento vai para a partição do agente (coleção e BM25
+    próprios); sem ele, para a coleção global.
+    """
+    with span("rag.index_document", {"rag.file": file.filename, "agent.id": agent_id or 0}) as index_span, \
+            rag_store_registry.lease(agent_id, persist_dir) as store:
+        result = _index_document(file, store, progress, agent_id)
+        index_span.set_attributes({
+            f"rag.{key}": result[key] for key in ("pages", "chunks", "chunks_embedded", "chunks_reused", "chunks_deleted")
+        })
+        return result
+
+
+def _index_document(file: UploadFile, store: RagStore,
+                    progress: Callable[[dict], None] | None, agent_id: int | None):
+    embeddings = get_embeddings()
+    collection = store.collection
+    keyword_index = store.keyword_index
+
+    stats = {
+        "pages_total": None, "pages": 0, "chunks_parsed": 0, "chunks": 0,
+        "chunks_embedded": 0, "chunks_reused": 0, "chunks_skipped": 0, "chunks_deleted": 0,
+    }
+    current_ids = set()
+    started = time.perf_counter()
+    batches = iter_batches(
+        iter_chunks(file.filename, iter_pages(file, stats), stats),
+        settings.RAG_EMBED_BATCH_SIZE,
     )
 
-    text = process_file(file)
-    doc = Document(
-        page_content=text,
-        metadata={"filename": file.filename}
+    def finish(future, batch, new, reused):
+        vectors = future.result()
+        _write_batch(collection, new, vectors)
+        # o índice BM25 recebe o lote inteiro (inclusive inalterados): sem custo de embedding
+        keyword_index.upsert(
+            [d.id for d in batch], [d.page_content for d in batch], [d.metadata for d in batch]
+        )
+        stats["chunks_reused"] += sum(1 for d in new if d.metadata["content_hash"] in reused)
+        stats["chunks_embedded"] += sum(1 for d in new if d.metadata["content_hash"] not in reused)
+        stats["chunks"] += len(batch)
+        if progress:
+            progress(dict(stats))
+
+    concurrency = max(1, settings.RAG_EMBED_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rag-embed") as executor:
+        pending = {}
+        for batch in batches:
+            current_ids.update(d.id for d in batch)
+            new, reused = _prepare_batch(collection, batch, stats)
+            # os embeddings rodam no executor, no mesmo trace da indexação
+            pending[executor.submit(bind_context(_embed), embeddings, new, reused)] = (batch, new, reused)
+            # no máximo `concurrency` lotes em voo: a leitura do arquivo acompanha os embeddings
+            if len(pending) >= concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future, *pending.pop(future))
+        for future in list(pending):
+            finish(future, *pending.pop(future))
+
+    stats["chunks_deleted"] = _delete_stale(collection, keyword_index, file.filename, current_ids)
+    if stats["chunks_embedded"] or stats["chunks_reused"] or stats["chunks_deleted"]:
+        # o conteúdo do arquivo mudou: respostas em cache baseadas nele ficam obsoletas
+        rag_answer_cache.invalidate_documents({file.filename}, agent_id)
+
+    elapsed = time.perf_counter() - started
+    result = {
+        "status": "success",
+        "indexed_file": file.filename,
+        "collection": store.name,
+        "pages": stats["pages"],
+        "chunks": stats["chunks"],
+        "chunks_embedded": stats["chunks_embedded"],
+        "chunks_reused": stats["chunks_reused"],
+        "chunks_skipped": stats["chunks_skipped"],
+        "chunks_deleted": stats["chunks_deleted"],
+        "elapsed_seconds": round(elapsed, 3),
+        "chunks_per_second": round(stats["chunks"] / elapsed, 2) if elapsed else 0.0,
+        "pages_per_second": round(stats["pages"] / elapsed, 2) if elapsed else 0.0,
+    }
+    logger.info(
+        "Documento indexado: %s em %s (%s páginas, %s chunks "
+        "[%s novos, %s reaproveitados, %s inalterados, %s removidos] "
+        "em %ss | %s chunks/s, %s páginas/s)",
+        file.filename, store.name, result["pages"], result["chunks"],
+        result["chunks_embedded"], result["chunks_reused"], result["chunks_skipped"], result["chunks_deleted"],
+        result["elapsed_seconds"], result["chunks_per_second"], result["pages_per_second"],
     )
+    return result
+
+
+def list_documents(persist_dir: str = None, page_size: int = 5000, agent_id: int | None = None) -> list[dict]:
+    """
+    Inventário dos documentos indexados (na partição do agente, se informado):
+    chunks, páginas, modelo e data da última indexação.
+    """
+    documents: dict[str, dict] = {}
+    with rag_store_registry.lease(agent_id, persist_dir, create=False) as store:
+        if store is not None:
+            _collect_documents(store.collection, documents, page_size)
+    return sorted(documents.values(), key=lambda d: d["filename"])
 
-    db.add_documents([doc])
-    db.persist()
 
-    logger.info(f"Documento indexado: {file.filename} ({len(text)} chars)")
-    return {"status": "success", "indexed_file": file.filename}
+def _collect_documents(collection, documents: dict[str, dict], page_size: int):
+    offset = 0
+    while True:
+        found = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        for meta in found["metadatas"]:
+            filename = meta.get("filename", "desconhecido")
+            doc = documents.setdefault(filename, {
+                "filename": filename, "chunks": 0, "pages": 0,
+                "embed_model": meta.get("embed_model"), "indexed_at": None,
+            })
+            doc["chunks"] += 1
+            doc["pages"] = max(doc["pages"], meta.get("page") or 0)
+            if meta.get("indexed_at") and (doc["indexed_at"] or "") < meta["indexed_at"]:
+                doc["indexed_at"] = meta["indexed_at"]
+        if len(found["ids"]) < page_size:
+            break
+        offset += page_size
@@ -0,0 +1,185 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import UploadFile
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.tracing import bind_context, span
+from app.services.rag_index import index_document
+
+logger = get_logger(__name__)
+
+
+class QueueFullError(Exception):
+    """Fila de indexação sem vagas."""
+
+
+class RagJobQueue:
+    """
+    Fila de jobs de indexação RAG com pool local de workers.
+
+    O upload é gravado em disco e o job é processado em background; o estado
+    (páginas lidas, chunks gravados, ETA) fica em memória do processo e é
+    consultado por `get`. Jobs finalizados mais antigos são descartados
+    quando passam de `history`.
+
+    Jobs do mesmo arquivo na mesma partição rodam em sequência: a remoção dos
+    chunks antigos de um job apagaria os chunks recém-gravados do outro. O job
+    seguinte espera na fila do arquivo, sem ocupar um worker.
+    """
+
+    def __init__(self, workers: int, max_pending: int, history: int):
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rag-job")
+        self._jobs: OrderedDict = OrderedDict()
+        # (agente, arquivo) com job em andamento -> jobs aguardando a vez
+        self._running_files: dict = {}
+        self._lock = threading.Lock()
+
+    def submit(self, filename: str, path: str, agent_id: int | None = None) -> dict:
+        """
+        Enfileira a indexação do arquivo em `path` (removido ao final do job),
+        na partição do agente informado ou na coleção global.
+        """
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j["status"] in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Fila de indexação cheia ({pending} jobs pendentes)")
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "filename": filename,
+                "agent_id": agent_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "pages_total": None,
+                "pages_parsed": 0,
+                "chunks_parsed": 0,
+                "chunks_embedded": 0,
+                "error": None,
+                "result": None,
+            }
+            self._jobs[job_id] = job
+            self._prune()
+
+            # o job continua o trace da requisição que o enfileirou
+            run = (bind_context(self._run), job_id, path)
+            waiting = self._running_files.get((agent_id, filename))
+            if waiting is None:
+                self._running_files[(agent_id, filename)] = deque()
+                self._executor.submit(*run)
+            else:
+                waiting.append(run)
+
+        logger.info("Job RAG %s enfileirado: %s", job_id, filename)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+        job["elapsed_seconds"] = _elapsed(job)
+        job["eta_seconds"] = _eta(job)
+        return job
+
+    def _run(self, job_id: str, path: str):
+        self._update(job_id, status="running", started_at=time.time())
+        job = self._jobs[job_id]
+        try:
+            with span("rag.job", {"rag.job_id": job_id}), open(path, "rb") as fh:
+                result = index_document(
+                    UploadFile(file=fh, filename=job["filename"]),
+                    progress=lambda stats: self._on_progress(job_id, stats),
+                    agent_id=job["agent_id"],
+                )
+            self._update(job_id, status="completed", finished_at=time.time(), result=result,
+                         pages_parsed=result["pages"], chunks_embedded=result["chunks"])
+            logger.info("Job RAG %s concluído", job_id)
+        except Exception as e:
+            self._update(job_id, status="failed", finished_at=time.time(), error=str(e))
+            logger.error("Job RAG %s falhou: %s", job_id, e)
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self._next_for_file((job["agent_id"], job["filename"]))
+
+    def _next_for_file(self, key: tuple):
+        with self._lock:
+            waiting = self._running_files[key]
+            if waiting:
+                self._executor.submit(*waiting.popleft())
+            else:
+                del self._running_files[key]
+
+    def _on_progress(self, job_id: str, stats: dict):
+        self._update(
+            job_id,
+            pages_total=stats["pages_total"],
+            pages_parsed=stats["pages"],
+            chunks_parsed=stats["chunks_parsed"],
+            chunks_embedded=stats["chunks"],
+        )
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _prune(self):
+        finished = [k for k, j in self._jobs.items() if j["status"] in ("completed", "failed")]
+        for key in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[key]
+
+
+def _elapsed(job: dict) -> float | None:
+    if not job["started_at"]:
+        return None
+    end = job["finished_at"] or time.time()
+    return round(end - job["started_at"], 3)
+
+
+def _eta(job: dict) -> float | None:
+    """
+    Estima o tempo restante pela taxa de chunks gravados, projetando o total
+    de chunks a partir das páginas já lidas.
+    """
+    if job["status"] == "completed":
+        return 0.0
+    if job["status"] != "running" or not job["chunks_embedded"] or not job["pages_parsed"]:
+        return None
+
+    pages_total = job["pages_total"] or job["pages_parsed"]
+    chunks_total = job["chunks_parsed"] / job["pages_parsed"] * pages_total
+    remaining = max(0.0, chunks_total - job["chunks_embedded"])
+    rate = job["chunks_embedded"] / (time.time() - job["started_at"])
+    return round(remaining / rate, 1)
+
+
+def save_upload(file: UploadFile) -> str:
+    """
+    Copia o upload para um arquivo temporário (o UploadFile é fechado ao fim da requisição).
+    """
+    suffix = os.path.splitext(file.filename or "")[1]
+    with tempfile.NamedTemporaryFile(prefix="rag-upload-", suffix=suffix, delete=False) as tmp:
+        while chunk := file.file.read(1024 * 1024):
+            tmp.write(chunk)
+        return tmp.name
+
+
+# única fila global
+rag_job_queue = RagJobQueue(
+    workers=settings.RAG_JOB_WORKERS,
+    max_pending=settings.RAG_JOB_MAX_PENDING,
+    history=settings.RAG_JOB_HISTORY,
+)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+RETRIEVAL_MODES = ("vector", "keyword", "hybrid")
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class KeywordIndex:
+    """
+    Índice invertido persistente (SQLite FTS5) com ranking BM25.
+
+    Os chunks ficam numa tabela comum (`chunks`) e o FTS5 usa conteúdo externo,
+    sincronizado por triggers; acentos são ignorados (`remove_diacritics`).
+    A conexão é aberta sob demanda, no primeiro acesso, e pode ser fechada
+    (`close`) quando o índice fica ocioso. O arquivo só é criado na primeira
+    escrita: buscas num índice inexistente não retornam nada.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def upsert(self, ids: list[str], texts: list[str], metadatas: list[dict]):
+        if not ids:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT INTO chunks (id, content, metadata) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET content = excluded.content, metadata = excluded.metadata",
+                [(i, t, json.dumps(m, ensure_ascii=False)) for i, t, m in zip(ids, texts, metadatas)],
+            )
+            conn.commit()
+
+    def delete(self, ids: list[str]):
+        if not ids:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+            conn.commit()
+
+    def search(self, query: str, k: int) -> list[Document]:
+        """
+        Busca BM25. Cada termo da consulta vira uma frase FTS5 (ex.: `8.666/93`
+        casa a sequência exata `8 666 93`), combinadas com OR.
+        """
+        match = _match_expression(query)
+        if not match:
+            return []
+        with self._lock:
+            conn = self._connection(create=False)
+            if conn is None:
+                return []
+            # ranqueia só no FTS e junta o conteúdo apenas dos k melhores
+            rows = conn.execute(
+                "SELECT c.id, c.content, c.metadata, f.score FROM ("
+                "  SELECT rowid, bm25(chunks_fts) AS score FROM chunks_fts"
+                "  WHERE chunks_fts MATCH ? ORDER BY score LIMIT ?"
+                ") f JOIN chunks c ON c.rowid = f.rowid ORDER BY f.score",
+                (match, k),
+            ).fetchall()
+        return [
+            Document(id=row[0], page_content=row[1], metadata={**json.loads(row[2]), "bm25": -row[3]})
+            for row in rows
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            conn = self._connection(create=False)
+            return conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0] if conn else 0
+
+    def close(self):
+        """Fecha a conexão; o próximo acesso reabre o índice."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connection(self, create: bool = True) -> sqlite3.Connection | None:
+        # leituras num índice que ainda não existe não criam o arquivo
+        if self._conn is None and not create and not os.path.exists(self.path):
+            return None
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    rowid INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL UNIQUE,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL
+                );
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                    content, content='chunks', content_rowid='rowid',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, content) VALUES ('delete', old.rowid, old.content);
+                    INSERT INTO chunks_fts(rowid, content) VALUES (new.rowid, new.content);
+                END;
+            """)
+            self._conn = conn
+        return self._conn
+
+
+def _match_expression(query: str) -> str:
+    phrases = []
+    for term in query.split():
+        words = WORD_RE.findall(term)
+        if words:
+            phrases.append('"' + " ".join(words) + '"')
+    return " OR ".join(dict.fromkeys(phrases))
+
+
+def reciprocal_rank_fusion(results: list[list[Document]], k: int, rrf_k: int = 60) -> list[Document]:
+    """
+    Funde listas ranqueadas: score(d) = Σ 1 / (rrf_k + posição de d em cada lista).
+    """
+    scores: dict[str, float] = {}
+    docs: dict[str, Document] = {}
+    for ranking in results:
+        for position, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + position)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[key] for key in ranked]
+
+
+def _doc_key(doc: Document) -> str:
+    meta = doc.metadata or {}
+    if meta.get("content_hash"):
+        return f"{meta.get('filename')}:{meta['content_hash']}"
+    return doc.page_content
+
+
+class EmptyRetriever(BaseRetriever):
+    """Retriever de uma partição que ainda não existe: nenhum documento."""
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return []
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        return []
+
+
+class KeywordRetriever(BaseRetriever):
+    """Retriever BM25 (não gera embeddings)."""
+
+    index: KeywordIndex
+    k: int = 4
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.index.search(query, self.k)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        # numa thread: a busca espera o lock do índice, mantido pelos jobs de indexação
+        return await asyncio.to_thread(self.index.search, query, self.k)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Busca vetorial + BM25, fundidas por reciprocal rank fusion.
+    A profundidade de cada busca é o `k` dos retrievers internos; `k` aqui
+    é o número de documentos após a fusão.
+    """
+
+    vector: BaseRetriever
+    keyword: KeywordRetriever
+    k: int = 4
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return reciprocal_rank_fusion(
+            [self.vector.invoke(query), self.keyword.invoke(query)], self.k, self.rrf_k
+        )
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        vector_docs, keyword_docs = await asyncio.gather(
+            self.vector.ainvoke(query), self.keyword.ainvoke(query)
+        )
+        return reciprocal_rank_fusion([vector_docs, keyword_docs], self.k, self.rrf_k)
@@ -0,0 +1,278 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+from langchain_community.vectorstores import Chroma
+from langchain_ollama import OllamaEmbeddings
+from app.core.config import settings
+from app.core.embedding_cache import CachedEmbeddings, embedding_cache
+from app.services.rag_retrieval import HybridRetriever, KeywordIndex, KeywordRetriever
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# coleção original (anterior às coleções por agente): documentos sem agente
+GLOBAL_COLLECTION = "langchain"
+
+
+@lru_cache(maxsize=1)
+def get_embeddings() -> CachedEmbeddings:
+    """Cliente de embeddings compartilhado (um por processo), com cache."""
+    embeddings = OllamaEmbeddings(
+        model=settings.OLLAMA_EMBED_MODEL,
+        base_url=settings.OLLAMA_BASE_URL
+    )
+    return CachedEmbeddings(embeddings, embedding_cache, settings.OLLAMA_EMBED_MODEL)
+
+
+@lru_cache(maxsize=8)
+def get_chroma_client(persist_dir: str):
+    """
+    Cliente Chroma compartilhado por diretório de persistência.
+
+    Com `RAG_VECTOR_MEMORY_LIMIT_MB`, os índices HNSW ficam num cache LRU
+    limitado em memória: coleções frias são descarregadas e recarregadas do
+    disco no próximo acesso.
+    """
+    limit = settings.RAG_VECTOR_MEMORY_LIMIT_MB * 1024 * 1024
+    client_settings = ChromaSettings(
+        is_persistent=True,
+        persist_directory=persist_dir,
+        anonymized_telemetry=False,
+        chroma_segment_cache_policy="LRU" if limit > 0 else None,
+        chroma_memory_limit_bytes=limit,
+    )
+    return chromadb.Client(client_settings)
+
+
+def collection_name(agent_id: int | None) -> str:
+    """Coleção do agente (`agent-<id>`); sem agente, a coleção global."""
+    return GLOBAL_COLLECTION if agent_id is None else f"agent-{agent_id}"
+
+
+def partition_exists(persist_dir: str, agent_id: int | None) -> bool:
+    """Se a coleção da partição já foi criada (sem criá-la)."""
+    try:
+        get_chroma_client(persist_dir).get_collection(collection_name(agent_id))
+    except ValueError:
+        return False
+    return True
+
+
+class RagStore:
+    """
+    Partição do índice RAG: coleção Chroma, índice BM25 e retrievers de um agente
+    (ou da coleção global). Buscas só percorrem os documentos da partição.
+    """
+
+    def __init__(self, persist_dir: str, agent_id: int | None = None):
+        self.agent_id = agent_id
+        self.name = collection_name(agent_id)
+        self.vector_store = Chroma(
+            client=get_chroma_client(persist_dir),
+            collection_name=self.name,
+            embedding_function=get_embeddings(),
+        )
+        # o BM25 global continua no arquivo original; os dos agentes ficam em bm25/
+        if agent_id is None:
+            index_path = os.path.join(persist_dir, "bm25.sqlite3")
+        else:
+            index_path = os.path.join(persist_dir, "bm25", f"{self.name}.sqlite3")
+        self.keyword_index = KeywordIndex(index_path)
+
+        # um retriever por modo de busca; o híbrido funde vetorial + BM25 (RRF)
+        top_k, candidates = settings.RAG_TOP_K, settings.RAG_HYBRID_CANDIDATES
+        self.retrievers = {
+            "vector": self.vector_store.as_retriever(search_kwargs={"k": top_k}),
+            "keyword": KeywordRetriever(index=self.keyword_index, k=top_k),
+            "hybrid": HybridRetriever(
+                vector=self.vector_store.as_retriever(search_kwargs={"k": candidates}),
+                keyword=KeywordRetriever(index=self.keyword_index, k=candidates),
+                k=top_k,
+                rrf_k=settings.RAG_RRF_K,
+            ),
+        }
+
+    @property
+    def collection(self):
+        return self.vector_store._collection
+
+    def close(self):
+        self.keyword_index.close()
+
+
+class RagStoreRegistry:
+    """
+    Partições carregadas sob demanda, por (diretório, agente).
+
+    Mantém no máximo `max_size` partições abertas (LRU) e fecha as ociosas há
+    mais de `idle_ttl` segundos; a memória dos vetores é limitada à parte,
+    pelo cache de segmentos do Chroma.
+
+    As partições são usadas via `lease`: uma partição descarregada enquanto
+    ainda está em uso só é fechada quando o último uso termina, e é
+    reaproveitada se pedida de novo antes disso (nunca há dois índices
+    abertos no mesmo arquivo).
+    """
+
+    def __init__(self, max_size: int, idle_ttl: int):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._stores: OrderedDict = OrderedDict()
+        self._last_used: dict = {}
+        # usos em andamento por partição (inclusive as já descarregadas)
+        self._leases: dict = {}
+        # descarregadas ainda em uso: fechadas no fim do último uso
+        self._retired: dict = {}
+        # uma carga por partição: outras requisições esperam sem segurar `_lock`
+        self._loading: dict = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.unloads = 0
+
+    @contextmanager
+    def lease(self, agent_id: int | None = None, persist_dir: str | None = None, create: bool = True):
+        """
+        Partição do agente durante o bloco. Com `create=False` (leituras), uma
+        partição que ainda não existe não é criada: o bloco recebe None.
+        """
+        key = (persist_dir or settings.CHROMA_PERSIST_DIR, agent_id)
+        store = self._acquire(key, create)
+        try:
+            yield store
+        finally:
+            if store is not None:
+                self._release(key, store)
+
+    @asynccontextmanager
+    async def alease(self, agent_id: int | None = None, persist_dir: str | None = None, create: bool = True):
+        """
+        Versão assíncrona de `lease`: reserva e liberação (lock, Chroma e SQLite
+        numa partição fria) rodam numa thread, fora do event loop.
+        """
+        key = (persist_dir or settings.CHROMA_PERSIST_DIR, agent_id)
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self._acquire, key, create))
+        try:
+            store = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # a thread termina a reserva mesmo com a requisição cancelada: devolve ao concluir
+            acquiring.add_done_callback(lambda done: self._release_acquired(key, done))
+            raise
+        try:
+            yield store
+        finally:
+            if store is not None:
+                await asyncio.to_thread(self._release, key, store)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": len(self._stores),
+                "max_size": self.max_size,
+                "idle_ttl": self.idle_ttl,
+                "loads": self.loads,
+                "unloads": self.unloads,
+                "in_use": sum(self._leases.values()),
+                "retired": len(self._retired),
+                "collections": [store.name for store in self._stores.values()],
+            }
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._stores):
+                self._unload(key)
+
+    def _acquire(self, key, create: bool) -> RagStore | None:
+        store = self._lease_loaded(key)
+        if store is not None:
+            return store
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            # outra requisição pode ter carregado enquanto esperávamos
+            store = self._lease_loaded(key)
+            if store is not None:
+                return store
+            try:
+                # I/O do Chroma fora de `_lock`: outras partições seguem atendidas
+                store = RagStore(*key) if create or partition_exists(*key) else None
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+
+            with self._lock:
+                self._loading.pop(key, None)
+                if store is None:
+                    return None
+                self._stores[key] = store
+                self.loads += 1
+                self._touch(key, store)
+                self._evict()
+            logger.info("Partição RAG carregada: %s", store.name)
+            return store
+
+    def _lease_loaded(self, key) -> RagStore | None:
+        with self._lock:
+            self._unload_idle(time.monotonic())
+            store = self._stores.get(key)
+            if store is None and key in self._retired:
+                # descarregada, mas ainda em uso: volta ao cache em vez de abrir outra
+                store = self._stores[key] = self._retired.pop(key)
+            if store is None:
+                return None
+            self._touch(key, store)
+            self._evict()
+            return store
+
+    def _touch(self, key, store):
+        self._stores.move_to_end(key)
+        self._last_used[key] = time.monotonic()
+        self._leases[key] = self._leases.get(key, 0) + 1
+
+    def _release_acquired(self, key, acquiring: asyncio.Future):
+        if not acquiring.cancelled() and acquiring.exception() is None and acquiring.result() is not None:
+            self._release(key, acquiring.result())
+
+    def _release(self, key, store):
+        with self._lock:
+            self._leases[key] -= 1
+            if self._leases[key]:
+                return
+            del self._leases[key]
+            if self._retired.get(key) is store:
+                del self._retired[key]
+                store.close()
+
+    def _evict(self):
+        while len(self._stores) > max(1, self.max_size):
+            self._unload(next(iter(self._stores)))
+
+    def _unload_idle(self, now: float):
+        if self.idle_ttl <= 0:
+            return
+        for key in [k for k, used in self._last_used.items() if now - used > self.idle_ttl]:
+            self._unload(key)
+
+    def _unload(self, key):
+        store = self._stores.pop(key)
+        self._last_used.pop(key, None)
+        if self._leases.get(key):
+            self._retired[key] = store
+        else:
+            store.close()
+        self.unloads += 1
+        logger.info("Partição RAG descarregada: %s", store.name)
+
+
+# único registro global
+rag_store_registry = RagStoreRegistry(
+    max_size=settings.RAG_STORE_CACHE_SIZE,
+    idle_ttl=settings.RAG_STORE_IDLE_TTL,
+)
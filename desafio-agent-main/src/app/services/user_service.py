@@ -13,7 +13,7 @@ class UserService:
 
     def list_users(self, db: Session) -> list[User]:
         users = db.query(User).all()
-        logger.info(f"Listando {len(users)} usuários")
+        logger.info("Listando %s usuários", len(users))
         return users
 
     def get_user(self, db: Session, user_id: int) -> User | None:
@@ -24,7 +24,7 @@ class UserService:
         db.add(user)
         db.commit()
         db.refresh(user)
-        logger.info(f"Usuário criado com sucesso: {user.id}")
+        logger.info("Usuário criado com sucesso: %s", user.id)
         return user
 
     def update_user(self, db: Session, db_user: User, user_update: UserUpdate) -> User:
@@ -32,10 +32,10 @@ class UserService:
             setattr(db_user, key, value)
         db.commit()
         db.refresh(db_user)
-        logger.info(f"Usuário {db_user.id} atualizado com sucesso")
+        logger.info("Usuário %s atualizado com sucesso", db_user.id)
         return db_user
 
     def delete_user(self, db: Session, db_user: User) -> None:
         db.delete(db_user)
         db.commit()
-        logger.info(f"Usuário {db_user.id} deletado com sucesso")
\ No newline at end of file
+        logger.info("Usuário %s deletado com sucesso", db_user.id)
@@ -1,3 +1,5 @@
+import gzip
+import json
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -113,3 +115,89 @@ def test_import_agents():
     data = response.json()
     assert data["status"] == "ok"
     assert data["stats"]["created"] >= 1
+
+
+def test_import_agents_bulk_upsert_and_dry_run(monkeypatch):
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    db = next(override_get_db())
+    existing = create_agent_with_prompt(db, name="AgenteBulk")
+
+    def package(description):
+        return [
+            {
+                "name": "AgenteBulk",
+                "description": description,
+                "model": "llama3",
+                "temperature": 0.2,
+                "owner_id": 1,
+                "prompts": [
+                    {"name": "Prompt Teste", "content": "atualizado"},
+                    {"name": "Novo Prompt", "content": "novo"},
+                ],
+            },
+            {"name": "AgenteBulkNovo", "description": None, "model": "llama3", "temperature": 0.5, "owner_id": 1,
+             "prompts": [{"name": "P1", "content": "a"}]},
+            # repetido no pacote: mesclado com o anterior
+            {"name": "AgenteBulkNovo", "description": "último", "model": "llama3", "temperature": 0.5, "owner_id": 1,
+             "prompts": [{"name": "P2", "content": "b"}]},
+        ]
+
+    response = client.post("/api/v1/agents/import?dry_run=true", json=package("simulado"))
+    assert response.status_code == 200, response.text
+    stats = response.json()["stats"]
+    assert (stats["created"], stats["updated"]) == (1, 1)
+    assert (stats["prompts_created"], stats["prompts_updated"]) == (3, 1)
+    assert stats["dry_run"] is True
+    db.expire_all()
+    assert db.query(Agent).filter(Agent.name == "AgenteBulkNovo").count() == 0
+
+    response = client.post("/api/v1/agents/import", json=package("real"))
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    db.refresh(existing)
+    assert existing.description == "real"
+    assert {p.name: p.content for p in existing.prompts} == {"Prompt Teste": "atualizado", "Novo Prompt": "novo"}
+    new_agent = db.query(Agent).filter(Agent.name == "AgenteBulkNovo").one()
+    assert new_agent.description == "último"
+    assert sorted(p.name for p in new_agent.prompts) == ["P1", "P2"]
+
+    # reimportar o mesmo pacote só atualiza
+    stats = client.post("/api/v1/agents/import", json=package("real")).json()["stats"]
+    assert (stats["created"], stats["prompts_created"]) == (0, 0)
+    assert (stats["updated"], stats["prompts_updated"]) == (2, 4)
+
+
+def test_export_stream_roundtrip_gzip(monkeypatch):
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    db = next(override_get_db())
+    create_agent_with_prompt(db, name="AgenteStream")
+    total = db.query(Agent).count()
+
+    response = client.get("/api/v1/agents/export/stream")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["version"] == 1
+    assert len(lines) == total + 1
+    streamed = next(a for a in lines[1:] if a["name"] == "AgenteStream")
+    assert streamed["prompts"][0]["name"] == "Prompt Teste"
+
+    response = client.get("/api/v1/agents/export/stream?gzip=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    unzipped = [json.loads(line) for line in gzip.decompress(response.content).decode().splitlines()]
+    assert unzipped[1:] == lines[1:]
+
+    # reimportar o próprio export só atualiza
+    response = client.post("/api/v1/agents/import/stream?dry_run=true", content=response.content)
+    assert response.status_code == 200, response.text
+    stats = response.json()["stats"]
+    assert stats["created"] == 0
+    assert stats["updated"] == len({(a["owner_id"], a["name"]) for a in lines[1:]})
+
+
+def test_import_stream_reports_invalid_line(monkeypatch):
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    body = b'{"version": 1}\n{"name": "SemModelo"}\n'
+    response = client.post("/api/v1/agents/import/stream", content=body)
+    assert response.status_code == 400
+    assert "Linha 2" in response.json()["detail"]
@@ -3,8 +3,10 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncio
 from app.main import app
-from app.core.db import Base, get_db
+from app.core.db import Base, get_db, get_async_db
 from app.models.agent import Agent
 import json
 
@@ -32,6 +34,29 @@ app.dependency_overrides[get_db] = override_get_db
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
 
+# Engine assíncrono usado pelo streaming (aiosqlite in-memory)
+async_engine = create_async_engine(
+    "sqlite+aiosqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+AsyncTestingSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+
+async def _create_async_tables():
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+asyncio.run(_create_async_tables())
+
 client = TestClient(app)
 
 # ----------------------
@@ -52,6 +77,24 @@ def create_agent_in_db(db, name="AgenteTeste", provider="ollama", model="llama3"
     return agent
 
 
+def create_agent_in_async_db(name="AgenteStream", provider="ollama", model="llama3"):
+    async def _create():
+        async with AsyncTestingSessionLocal() as db:
+            agent = Agent(
+                name=name,
+                model=model,
+                temperature=0.5,
+                owner_id=1,
+                provider=provider,
+                base_url="http://localhost:11434",
+            )
+            db.add(agent)
+            await db.commit()
+            return agent
+
+    return asyncio.run(_create())
+
+
 # ----------------------
 # Tests
 # ----------------------
@@ -79,15 +122,16 @@ def test_list_agents():
 
 
 def test_run_agent_stream(monkeypatch):
-    db = next(override_get_db())
-    agent = create_agent_in_db(db)
+    # outros módulos de teste registram o próprio override na importação
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
+    agent = create_agent_in_async_db()
 
-    # Dummy para simular o stream do ChatOllama
+    # Dummy para simular o astream do ChatOllama
     class DummyStream:
         def __init__(self, content):
             self.content = content
 
-    def fake_stream(prompt):
+    async def fake_astream(prompt):
         yield DummyStream("Olá")
         yield DummyStream(" mundo!")
 
@@ -95,12 +139,13 @@ def test_run_agent_stream(monkeypatch):
         def __init__(self, *args, **kwargs):
             pass
 
-        def stream(self, prompt):
-            return fake_stream(prompt)
+        def astream(self, prompt):
+            return fake_astream(prompt)
 
-    # mocka a classe inteira ChatOllama
-    import langchain_ollama
-    monkeypatch.setattr(langchain_ollama, "ChatOllama", DummyChatOllama)
+    # mocka a classe ChatOllama usada pelo registro de clientes
+    from app.core.llm_registry import llm_registry
+    monkeypatch.setattr("app.core.llm_registry.ChatOllama", DummyChatOllama)
+    llm_registry.clear()
 
     payload = {"input": "Diga olá"}
     response = client.post(f"/api/v1/agents/{agent.id}/run/stream", json=payload)
@@ -108,7 +153,15 @@ def test_run_agent_stream(monkeypatch):
     assert response.status_code == 200, response.text
     lines = [line for line in response.iter_lines() if line]
     parsed = [json.loads(line) for line in lines]
-    return
+    assert [e["content"] for e in parsed if e["type"] == "token"] == ["Olá", " mundo!"]
+    assert parsed[-1]["type"] == "end"
+    assert parsed[-1]["answer"] == "Olá mundo!"
+    assert parsed[-1]["execution_id"]
+
+
+def test_run_agent_stream_not_found():
+    response = client.post("/api/v1/agents/9999/run/stream", json={"input": "oi"})
+    assert response.status_code == 404, response.text
 
 def test_list_agent_costs(monkeypatch):
     db = next(override_get_db())
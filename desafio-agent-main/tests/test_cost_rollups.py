@@ -0,0 +1,135 @@
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core.db import Base
+from app.models.agent import Agent
+from app.models.cost_rollup import AgentCostDaily, AgentCostTotal
+from app.models.execution import Execution
+from app.models.execution_cost import ExecutionCost
+from app.services.cost_rollup_service import cost_rollup_service, rollup_day
+from app.services.cost_service import CostService
+from app.services.execution_service import ExecutionService
+
+engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+
+
+def make_agent(db, provider="ollama", model="llama3"):
+    agent = Agent(name="Rollup", model=model, temperature=0.0, owner_id=1, provider=provider)
+    db.add(agent)
+    db.commit()
+    return agent
+
+
+def test_rollups_follow_executions(db):
+    agent = make_agent(db)
+    service = ExecutionService()
+    first = service.create_execution(db, agent, "a", "b", 0.5)
+    service.create_execution(db, agent, "c", "d", 1.5)
+
+    summary = CostService().summarize_agent_costs(db, agent.id)
+    assert summary == {"total_cost": 2.0, "average_cost": 1.0, "executions": 2, "by_provider": {"ollama": 2.0}}
+    daily = db.query(AgentCostDaily).filter(AgentCostDaily.agent_id == agent.id).one()
+    assert (daily.total_cost, daily.executions) == (2.0, 2)
+
+    service.delete_execution(db, first.id)
+    summary = CostService().summarize_agent_costs(db, agent.id)
+    assert (summary["total_cost"], summary["executions"]) == (1.5, 1)
+
+
+def test_backfill_rebuilds_from_execution_costs(db):
+    agent = make_agent(db, provider=None)
+    for i, day in enumerate([1, 1, 2], start=1):
+        db.add(Execution(id=i, agent_id=agent.id, input="a", output="b", created_at=datetime(2025, 5, day, 23, 30)))
+        # custo gravado com o relógio do banco, já no dia seguinte: o dia vem da execução
+        db.add(ExecutionCost(execution_id=i, agent_id=agent.id, cost=1.0, created_at=datetime(2025, 5, day + 1, 0, 5)))
+    db.commit()
+    assert cost_rollup_service.summary(db, agent.id)["executions"] == 0
+
+    assert cost_rollup_service.backfill(db) == {"totals": 1, "daily": 2}
+    summary = cost_rollup_service.summary(db, agent.id)
+    assert summary["total_cost"] == 3.0
+    assert summary["by_provider"] == {None: 3.0}
+    days = {d.day: d.executions for d in db.query(AgentCostDaily)}
+    assert days == {date(2025, 5, 1): 2, date(2025, 5, 2): 1}
+
+
+def test_delete_uses_execution_day_and_drops_empty_rows(db):
+    agent = make_agent(db)
+    service = ExecutionService()
+    execution = service.create_execution(db, agent, "a", "b", 0.5)
+    # relógio do banco em outro fuso/dia: não afeta o dia do rollup
+    execution.costs[0].created_at = datetime(2030, 1, 1, tzinfo=timezone(timedelta(hours=-3)))
+    db.commit()
+
+    service.delete_execution(db, execution.id)
+    assert db.query(AgentCostDaily).count() == 0
+    assert db.query(AgentCostTotal).count() == 0
+
+
+def test_rollup_day_is_utc():
+    brt = timezone(timedelta(hours=-3))
+    assert rollup_day(datetime(2025, 5, 1, 22, 0, tzinfo=brt)) == date(2025, 5, 2)
+    assert rollup_day(datetime(2025, 5, 1, 22, 0)) == date(2025, 5, 1)
+
+
+def test_register_cost_for_unknown_agent(db):
+    with pytest.raises(ValueError):
+        CostService().register_execution_cost(db, execution_id=1, agent_id=999, cost=1.0)
+
+
+def rollup_rows(db):
+    totals = {(r.provider, r.model): (r.total_cost, r.executions) for r in db.query(AgentCostTotal)}
+    daily = {(r.day, r.provider, r.model): (r.total_cost, r.executions) for r in db.query(AgentCostDaily)}
+    return totals, daily
+
+
+def test_rollups_keep_model_of_each_execution(db):
+    agent = make_agent(db)
+    service = ExecutionService()
+    older = service.create_execution(db, agent, "a", "b", 0.5)
+    service.create_execution(db, agent, "c", "d", 1.0)
+
+    # import de agentes pode trocar o modelo: custos antigos seguem no modelo original
+    agent.model = "llama3.1"
+    db.commit()
+    service.create_execution(db, agent, "e", "f", 2.0)
+    totals, _ = rollup_rows(db)
+    assert totals == {("ollama", "llama3"): (1.5, 2), ("ollama", "llama3.1"): (2.0, 1)}
+
+    service.delete_execution(db, older.id)
+    totals, daily = rollup_rows(db)
+    assert totals == {("ollama", "llama3"): (1.0, 1), ("ollama", "llama3.1"): (2.0, 1)}
+    summary = cost_rollup_service.summary(db, agent.id)
+    assert (summary["total_cost"], summary["executions"]) == (3.0, 2)
+
+    # o backfill reconstrói exatamente os rollups incrementais
+    cost_rollup_service.backfill(db)
+    assert rollup_rows(db) == (totals, daily)
+
+
+def test_delete_counts_execution_once_with_several_costs(db):
+    agent = make_agent(db)
+    service = ExecutionService()
+    execution = service.create_execution(db, agent, "a", "b", 0.5)
+    service.create_execution(db, agent, "c", "d", 1.0)
+    CostService().register_execution_cost(db, execution_id=execution.id, agent_id=agent.id, cost=0.25)
+    totals, daily = rollup_rows(db)
+    assert totals == {("ollama", "llama3"): (1.75, 2)}
+
+    cost_rollup_service.backfill(db)
+    assert rollup_rows(db) == (totals, daily)
+
+    service.delete_execution(db, execution.id)
+    assert rollup_rows(db)[0] == {("ollama", "llama3"): (1.0, 1)}
@@ -1,24 +1,27 @@
+import os
+import tempfile
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from app.main import app
-from app.core.db import Base, get_db
+from app.core.db import Base, get_db, get_async_db
 from app.models.agent import Agent
 from app.models.execution_cost import ExecutionCost
 
 # ----------------------
-# Configuração banco de teste (SQLite in-memory compartilhado)
+# Configuração banco de teste (SQLite em arquivo, visto pelos engines sync e async)
 # ----------------------
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="test-costs-"), "test.sqlite3")
+engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# rotas de leitura usam AsyncSession (aiosqlite no mesmo arquivo)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
 
 def override_get_db():
     db = TestingSessionLocal()
@@ -28,6 +31,11 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
 Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
@@ -62,7 +70,8 @@ def create_execution_cost(db, agent_id: int, cost: float = 0.123):
 # ----------------------
 # Tests
 # ----------------------
-def test_get_agent_costs_success():
+def test_get_agent_costs_success(monkeypatch):
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
     db = next(override_get_db())
     agent = create_agent(db)
     create_execution_cost(db, agent.id, cost=0.456)
@@ -71,8 +80,73 @@ def test_get_agent_costs_success():
     return response
 
 
+def test_costs_summary_from_rollups(monkeypatch):
+    from datetime import datetime
+    from app.services.cost_rollup_service import cost_rollup_service
+
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
+    db = next(override_get_db())
+    agent = create_agent(db, name="AgenteResumo")
+    for cost in (0.5, 1.5):
+        cost_rollup_service.record(db, agent.id, agent.provider, agent.model, cost, datetime(2025, 3, 1))
+    db.commit()
+
+    response = client.get(f"/api/v1/agents/{agent.id}/costs/summary")
+    assert response.status_code == 200, response.text
+    assert response.json() == {
+        "total_cost": 2.0, "average_cost": 1.0, "executions": 2, "by_provider": {"ollama": 2.0},
+    }
+
+
 def test_get_agent_costs_not_found():
     response = client.get("/api/v1/agents/999/costs")
     assert response.status_code == 404, response.text
     data = response.json()
-    assert "Nenhum custo encontrado" in data["detail"]
\ No newline at end of file
+    assert "Nenhum custo encontrado" in data["detail"]
+
+def test_costs_aggregated_paginated_and_rolled_up(monkeypatch):
+    from datetime import datetime
+    import json
+
+    # outros módulos de teste registram o próprio override na importação
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
+    db = next(override_get_db())
+    agent = create_agent(db, name="AgenteRollup")
+    days = [1, 1, 2, 3, 3]
+    for i, day in enumerate(days, start=1):
+        db.add(ExecutionCost(execution_id=i, agent_id=agent.id, cost=1.5, created_at=datetime(2025, 3, day, 10 + i)))
+    db.commit()
+
+    response = client.get(f"/api/v1/costs/agent/{agent.id}", params={"limit": 2, "bucket": "day"})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["total_cost"] == 7.5
+    assert data["executions_count"] == 5
+    assert len(data["executions"]) == 2
+    assert [(r["bucket"][:10], r["executions"]) for r in data["rollups"]] == [
+        ("2025-03-01", 2), ("2025-03-02", 1), ("2025-03-03", 2),
+    ]
+
+    # páginas seguintes até esgotar o cursor
+    ids = [c["id"] for c in data["executions"]]
+    cursor = data["next_cursor"]
+    while cursor:
+        response = client.get(f"/api/v1/agents/{agent.id}/costs", params={"limit": 2, "cursor": cursor})
+        ids += [c["id"] for c in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+    assert len(set(ids)) == 5
+
+    # o período filtra a página junto com os totais
+    response = client.get(
+        f"/api/v1/costs/agent/{agent.id}",
+        params={"created_from": "2025-03-02T00:00:00", "created_to": "2025-03-03T00:00:00"},
+    )
+    data = response.json()
+    assert data["executions_count"] == 1
+    assert [c["created_at"][:10] for c in data["executions"]] == ["2025-03-02"]
+
+    streamed = client.get(f"/api/v1/costs/agent/{agent.id}/stream", params={"created_from": "2025-03-02T00:00:00"})
+    rows = [json.loads(line) for line in streamed.text.splitlines()]
+    assert len(rows) == 3
+    assert all(r["agent_id"] == agent.id for r in rows)
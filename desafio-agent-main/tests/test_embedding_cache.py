@@ -0,0 +1,57 @@
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 0.5] for t in texts]
+
+
+def test_cached_embeddings_only_embed_misses(tmp_path):
+    inner = CountingEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), memory_size=10, disk_max_entries=100)
+    embeddings = CachedEmbeddings(inner, cache, "nomic")
+
+    first = embeddings.embed_documents(["a", "bb"])
+    second = embeddings.embed_documents(["bb", "ccc"])
+
+    assert inner.texts == ["a", "bb", "ccc"]
+    assert second[0] == first[1]
+    assert embeddings.embed_query("a") == [1.0, 0.5]
+    stats = cache.stats()
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 3
+
+
+def test_disk_tier_survives_new_process(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    CachedEmbeddings(CountingEmbeddings(), EmbeddingCache(path, 10, 100), "nomic").embed_documents(["texto"])
+
+    inner = CountingEmbeddings()
+    cache = EmbeddingCache(path, 10, 100)
+    assert CachedEmbeddings(inner, cache, "nomic").embed_query("texto") == [5.0, 0.5]
+    assert inner.texts == []
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_key_includes_model(tmp_path):
+    inner = CountingEmbeddings()
+    cache = EmbeddingCache(None, memory_size=10, disk_max_entries=0)
+    CachedEmbeddings(inner, cache, "modelo-a").embed_query("x")
+    CachedEmbeddings(inner, cache, "modelo-b").embed_query("x")
+    assert inner.texts == ["x", "x"]
+
+
+def test_lru_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), memory_size=2, disk_max_entries=3)
+    embeddings = CachedEmbeddings(CountingEmbeddings(), cache, "nomic")
+    for text in ["a", "b", "c", "d", "e"]:
+        embeddings.embed_query(text)
+
+    stats = cache.stats()
+    assert stats["memory_size"] == 2
+    assert stats["disk_size"] == 3
+    assert stats["evictions"] == 2
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.db import Base
+from app.models.agent import Agent
+from app.models.execution import Execution
+from app.models.execution_cost import ExecutionCost
+from app.services import execution_service as execution_module
+from app.services.cost_rollup_service import cost_rollup_service
+from app.services.execution_writer import ExecutionWriter
+
+# arquivo, não StaticPool: a thread de gravação e a alocação de ids precisam de conexões próprias
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="test-writer-"), "test.sqlite3")
+engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def agent():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with TestingSessionLocal() as db:
+        agent = Agent(name="Writer", model="llama3", temperature=0.0, owner_id=1, provider="ollama")
+        db.add(agent)
+        db.commit()
+        db.refresh(agent)
+        db.expunge(agent)
+    return agent
+
+
+def make_writer(mode, batch_size=3):
+    return ExecutionWriter(TestingSessionLocal, mode=mode, batch_size=batch_size, flush_interval=60, id_block_size=2)
+
+
+def test_buffered_writes_in_batches(agent):
+    writer = make_writer("buffered")
+    executions = [writer.submit(agent, f"in {i}", "out", 0.5)[0] for i in range(7)]
+
+    # ids pré-alocados, únicos e crescentes, antes de qualquer gravação
+    ids = [e.id for e in executions]
+    assert ids == sorted(set(ids))
+
+    writer.close()
+    stats = writer.stats()
+    assert stats["written"] == 7
+    assert stats["pending"] == 0
+    assert stats["batches"] == 3  # 3 + 3 + 1
+
+    with TestingSessionLocal() as db:
+        assert sorted(id for (id,) in db.query(Execution.id)) == ids
+        assert db.query(ExecutionCost).count() == 7
+        summary = cost_rollup_service.summary(db, agent.id)
+    assert (summary["total_cost"], summary["executions"]) == (3.5, 7)
+
+
+def test_durable_mode_waits_for_commit(agent, monkeypatch):
+    writer = make_writer("durable", batch_size=100)
+    monkeypatch.setattr(execution_module, "execution_writer", writer)
+
+    execution = execution_module.ExecutionService().create_execution(None, agent, "pergunta", "resposta", 1.0)
+
+    # confirmado só após o commit: já está no banco, mesmo com flush_interval longo
+    with TestingSessionLocal() as db:
+        stored = db.get(Execution, execution.id)
+        assert stored.output == "resposta"
+    writer.close()
+
+
+def test_buffered_dead_letters_poison_item_without_blocking_others(agent):
+    writer = make_writer("buffered")
+    writer.max_retries = 2
+    first, _ = writer.submit(agent, "ok 1", "out", 0.5)
+    assert writer.flush()
+    # id duplicado: o item nunca grava
+    poison, _ = writer.submit(agent, "duplicada", "out", 0.5)
+    poison.id = first.id
+    writer.submit(agent, "ok 2", "out", 0.5)
+
+    assert not writer.flush()  # o lote falha; o item válido é gravado sozinho
+    assert (writer.stats()["written"], writer.stats()["pending"]) == (2, 1)
+
+    writer.submit(agent, "ok 3", "out", 0.5)
+    writer.close()
+    stats = writer.stats()
+    assert (stats["written"], stats["dead_lettered"], stats["pending"]) == (3, 1, 0)
+
+
+def test_submit_rejects_when_buffer_full(agent, monkeypatch):
+    from app.services import execution_writer as writer_module
+
+    monkeypatch.setattr(writer_module, "SUBMIT_TIMEOUT", 0.01)
+    writer = ExecutionWriter(
+        TestingSessionLocal, mode="buffered", batch_size=2, flush_interval=60, id_block_size=2, max_pending=2,
+    )
+    writer._start = lambda: None  # sem thread de gravação: o buffer não esvazia sozinho
+    writer.submit(agent, "1", "out", 0.1)
+    writer.submit(agent, "2", "out", 0.1)
+    with pytest.raises(writer_module.BufferFullError):
+        writer.submit(agent, "3", "out", 0.1)
+    assert writer.stats()["rejected"] == 1
+    writer.close()
+    assert writer.stats()["written"] == 2
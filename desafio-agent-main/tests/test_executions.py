@@ -0,0 +1,114 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.main import app
+from app.core.db import Base, get_db, get_async_db
+from app.models.agent import Agent
+from app.models.execution import Execution
+
+# ----------------------
+# Configuração banco de teste (SQLite em arquivo, visto pelos engines sync e async)
+# ----------------------
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="test-executions-"), "test.sqlite3")
+engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture
+def client(monkeypatch):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # outros módulos de teste registram o próprio override na importação
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
+    return TestClient(app)
+
+
+@pytest.fixture
+def executions():
+    """Dois agentes; 5 execuções cada, com datas distintas e um empate de created_at."""
+    db = TestingSessionLocal()
+    base = datetime(2025, 1, 1, 12, 0, 0)
+    ids = {}
+    for name in ("A", "B"):
+        agent = Agent(name=name, model="llama3", temperature=0.0, owner_id=1, provider="ollama")
+        db.add(agent)
+        db.flush()
+        for i in range(5):
+            # as duas últimas execuções de cada agente têm o mesmo created_at
+            created_at = base + timedelta(hours=min(i, 3))
+            db.add(Execution(agent_id=agent.id, input=f"in {i}" * 100, output="out", created_at=created_at))
+        ids[name] = agent.id
+    db.commit()
+    db.close()
+    return ids
+
+
+def test_list_executions_keyset_pagination(client, executions):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, "agent_id": executions["A"]}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/v1/executions/", params=params).json()
+        seen += page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == 5
+    assert len({e["id"] for e in seen}) == 5
+    keys = [(e["created_at"], e["id"]) for e in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert all(e["agent_id"] == executions["A"] for e in seen)
+
+
+def test_list_executions_date_range_and_projection(client, executions):
+    response = client.get("/api/v1/executions/", params={
+        "created_from": "2025-01-01T13:00:00",
+        "created_to": "2025-01-01T15:00:00",
+        "fields": "agent_id",
+    })
+    assert response.status_code == 200, response.text
+    items = response.json()["items"]
+
+    # 2 agentes x 2 execuções (13h e 14h)
+    assert len(items) == 4
+    assert all(set(item) == {"id", "agent_id", "created_at"} for item in items)
+
+
+def test_list_executions_rejects_bad_input(client, executions):
+    assert client.get("/api/v1/executions/", params={"fields": "senha"}).status_code == 400
+    assert client.get("/api/v1/executions/", params={"cursor": "xyz"}).status_code == 400
+    assert client.get("/api/v1/executions/", params={"limit": 0}).status_code == 422
+
+
+def test_get_execution(client, executions):
+    page = client.get("/api/v1/executions/", params={"limit": 1, "agent_id": executions["B"]}).json()
+    execution_id = page["items"][0]["id"]
+
+    response = client.get(f"/api/v1/executions/{execution_id}")
+    assert response.status_code == 200, response.text
+    assert response.json()["agent_id"] == executions["B"]
+    assert client.get("/api/v1/executions/999999").status_code == 404
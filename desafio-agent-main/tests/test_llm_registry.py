@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+import pytest
+from app.core.llm_registry import LLMClientRegistry
+
+
+class DummyHttpClient:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+class DummyChatOllama:
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+        # como o ChatOllama: clientes do pacote `ollama`, cada um com um httpx interno
+        self._client = SimpleNamespace(_client=DummyHttpClient())
+        self._async_client = SimpleNamespace(_client=DummyHttpClient())
+
+    @property
+    def closed(self):
+        return self._client._client.closed and self._async_client._client.closed
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr("app.core.llm_registry.ChatOllama", DummyChatOllama)
+    return LLMClientRegistry(max_size=2, ttl=60)
+
+
+def test_registry_reuses_client(registry):
+    first = registry.get("ollama", "llama3", "http://localhost:11434", 0.5)
+    second = registry.get("ollama", "llama3", "http://localhost:11434", 0.5)
+
+    assert first is second
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size"] == 1
+
+
+def test_registry_keys_by_config(registry):
+    a = registry.get("ollama", "llama3", "http://localhost:11434", 0.5)
+    b = registry.get("ollama", "llama3", "http://localhost:11434", 0.9)
+
+    assert a is not b
+    assert registry.stats()["misses"] == 2
+
+
+def test_registry_lru_eviction(registry):
+    a = registry.get("ollama", "m1", None, 0)
+    registry.get("ollama", "m2", None, 0)
+    registry.get("ollama", "m1", None, 0)  # m1 passa a ser o mais recente
+    registry.get("ollama", "m3", None, 0)  # remove m2
+
+    stats = registry.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert registry.get("ollama", "m1", None, 0) is a
+
+
+def test_registry_ttl_eviction(registry, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.llm_registry.time.monotonic", lambda: now[0])
+
+    a = registry.get("ollama", "llama3", None, 0)
+    now[0] += 61
+    b = registry.get("ollama", "llama3", None, 0)
+
+    assert a is not b
+    assert registry.stats()["evictions"] == 1
+
+
+def test_registry_unsupported_provider(registry):
+    assert registry.get("desconhecido", "x", None, 0) is None
+    assert registry.stats()["size"] == 0
+    assert registry.stats()["misses"] == 0
+
+
+def test_registry_closes_evicted_clients_after_grace(monkeypatch):
+    from app.core import llm_registry
+
+    monkeypatch.setattr("app.core.llm_registry.ChatOllama", DummyChatOllama)
+    registry = LLMClientRegistry(max_size=2, ttl=0)
+    now = [1000.0]
+    monkeypatch.setattr("app.core.llm_registry.time.monotonic", lambda: now[0])
+
+    a = registry.get("ollama", "m1", None, 0)
+    registry.get("ollama", "m2", None, 0)
+    registry.get("ollama", "m3", None, 0)  # remove m1 (LRU)
+    # pode haver um stream em andamento com m1: ainda não fechado
+    assert not a.closed
+    assert registry.stats()["closing"] == 1
+
+    now[0] += llm_registry.CLOSE_GRACE
+    registry.get("ollama", "m3", None, 0)
+    assert a.closed
+    assert registry.stats()["closing"] == 0
+
+    b = registry.get("ollama", "m3", None, 0)
+    registry.clear()
+    assert b.closed
+
+
+def test_registry_closes_clients_losing_creation_race(registry, monkeypatch):
+    built = []
+    original = registry._build
+
+    def build(*args):
+        client = original(*args)
+        built.append(client)
+        if len(built) == 1:
+            # outra requisição registra o mesmo cliente enquanto este é construído
+            monkeypatch.setattr(registry, "_build", original)
+            registry.get(*args)
+        return client
+
+    monkeypatch.setattr(registry, "_build", build)
+    winner = registry.get("ollama", "llama3", None, 0)
+
+    assert winner is not built[0]
+    assert built[0].closed
+    assert not winner.closed
+
+
+def test_registry_round_robin_shards(monkeypatch):
+    monkeypatch.setattr("app.core.llm_registry.ChatOllama", DummyChatOllama)
+    registry = LLMClientRegistry(max_size=2, ttl=60, shards=2)
+
+    first = registry.get("ollama", "llama3", None, 0)
+    second = registry.get("ollama", "llama3", None, 0)
+    third = registry.get("ollama", "llama3", None, 0)
+
+    assert first is not second
+    assert first is third
+    assert registry.stats()["size"] == 1
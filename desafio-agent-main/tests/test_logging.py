@@ -0,0 +1,71 @@
+import json
+import logging
+import queue
+from app.core.logging import JsonFormatter, LogQueueHandler, QueuedRotatingFileHandler
+
+
+def make_record(level: int, msg: str = "mensagem %s", args=("x",)) -> logging.LogRecord:
+    return logging.LogRecord("teste", level, __file__, 1, msg, args, None)
+
+
+def drain(log_queue: queue.Queue) -> list:
+    records = []
+    while not log_queue.empty():
+        records.append(log_queue.get_nowait())
+    return records
+
+
+def test_json_formatter_matches_default_timestamp():
+    record = make_record(logging.INFO, "olá %s", ("mundo",))
+    line = json.loads(JsonFormatter().format(record))
+
+    assert line["mensagem"] == "olá mundo"
+    assert line["nivel"] == "INFO"
+    assert line["timestamp"] == logging.Formatter().formatTime(record)
+
+
+def test_queue_handler_defers_formatting():
+    handler = LogQueueHandler(queue.Queue(maxsize=10), sample=1)
+    record = make_record(logging.INFO)
+    handler.handle(record)
+
+    queued = drain(handler.queue)
+    assert queued == [record]
+    # a mensagem só é montada no listener
+    assert (queued[0].msg, queued[0].args) == ("mensagem %s", ("x",))
+
+
+def test_queue_handler_samples_then_drops_under_overload():
+    handler = LogQueueHandler(queue.Queue(maxsize=10), sample=4)  # amostra a partir de 8 na fila
+    for _ in range(8):
+        handler.handle(make_record(logging.INFO))
+    # sobrecarga: 1 a cada 4 registros INFO entra
+    for _ in range(8):
+        handler.handle(make_record(logging.INFO))
+    assert (handler.queue.qsize(), handler.sampled_out) == (10, 6)
+
+    # fila cheia: WARNING não é amostrado, espera por espaço e é descartado
+    handler.handle(make_record(logging.WARNING))
+    assert handler.dropped == 1
+
+    # com espaço de novo, as perdas são avisadas no próprio log
+    drain(handler.queue)
+    handler.handle(make_record(logging.ERROR, "erro", ()))
+    queued = drain(handler.queue)
+    assert [r.getMessage() for r in queued] == [
+        "erro", "7 registros de log descartados ou amostrados sob sobrecarga",
+    ]
+    assert handler.stats()["enqueued"] == 11
+
+
+def test_queued_file_handler_rotates_by_tracked_size(tmp_path):
+    path = tmp_path / "app.log"
+    handler = QueuedRotatingFileHandler(str(path), maxBytes=150, backupCount=1, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for n in range(5):
+        handler.handle(make_record(logging.INFO, "registro %s " + "ç" * 20, (n,)))
+    handler.close()
+
+    # 32 caracteres, mas 52 bytes por linha: 2 por arquivo, a 3ª rotaciona
+    assert path.with_name("app.log.1").read_text(encoding="utf-8").count("\n") == 2
+    assert path.read_text(encoding="utf-8").splitlines() == ["registro 4 " + "ç" * 20]
@@ -0,0 +1,140 @@
+import fnmatch
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.memory import MemoryBackend, RedisMemoryBackend, InMemoryBackend
+from app.services.memory_service import MemoryService, memory_service
+
+client = TestClient(app)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        return [getattr(self.redis, name)(*args) for name, args in self.commands]
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def subscribe(self, **handlers):
+        self.redis.subscribers.extend(handlers.values())
+
+    def run_in_thread(self, **kwargs):
+        return None
+
+
+class FakeRedis:
+    """Subconjunto do redis-py usado pelo backend de memória."""
+
+    def __init__(self):
+        self.lists = {}
+        self.subscribers = []
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:end + 1]
+
+    def expire(self, key, ttl):
+        pass
+
+    def delete(self, key):
+        self.lists.pop(key, None)
+
+    def publish(self, channel, data):
+        for handler in self.subscribers:
+            handler({"data": data})
+
+    def lrange(self, key, start, end):
+        self.round_trips += 1
+        return list(self.lists.get(key, []))
+
+    def scan_iter(self, match, count=None):
+        return [k for k in list(self.lists) if fnmatch.fnmatch(k, match)]
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+def test_redis_backend_trims_and_orders(redis):
+    backend = RedisMemoryBackend(redis, limit=2, ttl=0, cache_ttl=0)
+    for i in range(3):
+        backend.add(1, f"in{i}", f"out{i}")
+
+    history = backend.get(1)
+    assert [h["input"] for h in history] == ["in1", "in2"]
+
+
+def test_redis_backend_local_cache(redis):
+    backend = RedisMemoryBackend(redis, limit=5, ttl=0, cache_ttl=60)
+    backend.add(1, "a", "b")
+    backend.get(1)
+    trips = redis.round_trips
+
+    backend.get(1)
+    backend.get(1)
+    assert redis.round_trips == trips
+
+    # write-through: a nova interação aparece sem nova leitura no Redis
+    backend.add(1, "c", "d")
+    assert [h["input"] for h in backend.get(1)] == ["a", "c"]
+
+
+def test_redis_backend_invalidates_other_workers(redis):
+    worker_a = RedisMemoryBackend(redis, limit=5, ttl=0, cache_ttl=60)
+    worker_b = RedisMemoryBackend(redis, limit=5, ttl=0, cache_ttl=60)
+
+    worker_a.add(1, "a", "b")
+    assert len(worker_b.get(1)) == 1
+
+    worker_a.add(1, "c", "d")
+    assert len(worker_b.get(1)) == 2
+
+    worker_a.clear(1)
+    assert worker_b.get(1) == []
+
+
+def test_incomplete_backend_fails_at_construction():
+    class PartialBackend(MemoryBackend):
+        def add(self, agent_id, user_input, agent_output):
+            pass
+
+        def get(self, agent_id):
+            return []
+
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+
+def test_services_share_backend():
+    backend = InMemoryBackend(limit=5)
+    MemoryService(backend).add_interaction(1, "oi", "olá")
+    assert MemoryService(backend).get(1) == [{"input": "oi", "output": "olá"}]
+
+
+def test_clear_memory_route_clears_shared_store():
+    memory_service.add_interaction(999, "oi", "olá")
+    assert memory_service.get(999)
+
+    response = client.delete("/api/v1/agents/999/memory")
+    assert response.status_code == 200
+    assert memory_service.get(999) == []
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.main import app
+from app.core.db import Base, get_async_db
+from starlette.routing import Route
+from app.core.metrics import UNMATCHED_ROUTE, _route_template, instrument_engine, observe_llm_stream
+from app.models.agent import Agent
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="test-metrics-"), "test.sqlite3")
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_PATH}", poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+instrument_engine(async_engine.sync_engine)
+
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
+    return TestClient(app)
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_request_latency_and_db_queries_per_route(client):
+    route = {"method": "GET", "route": "/api/v1/agents/"}
+    requests_before = sample("http_request_duration_seconds_count", **route, status="200")
+    queries_before = sample("http_request_db_queries_sum", **route)
+
+    assert client.get("/api/v1/agents/").status_code == 200
+    assert client.get("/api/v1/nao-existe/123").status_code == 404
+
+    assert sample("http_request_duration_seconds_count", **route, status="200") == requests_before + 1
+    # a consulta roda no greenlet do AsyncSession e ainda conta para a requisição
+    assert sample("http_request_db_queries_sum", **route) == queries_before + 1
+    # sem rota: uma série só, não uma por URL
+    assert sample("http_request_duration_seconds_count", method="GET", route="<unmatched>", status="404") >= 1
+
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_bucket{le="0.005",method="GET",route="/api/v1/agents/",status="200"}' in body
+    assert 'db_pool_checkout_wait_seconds_count{pool="sync"}' in body
+
+
+def test_llm_stream_metrics():
+    labels = {"provider": "ollama", "model": "metrics-test"}
+    observe_llm_stream("ollama", "metrics-test", started=10.0, first_token=10.5, finished=12.5, tokens=100)
+    # stream sem tokens: nada registrado
+    observe_llm_stream("ollama", "metrics-test", started=10.0, first_token=None, finished=11.0, tokens=0)
+
+    assert sample("llm_time_to_first_token_seconds_count", **labels) == 1
+    assert sample("llm_time_to_first_token_seconds_sum", **labels) == 0.5
+    assert sample("llm_tokens_per_second_sum", **labels) == 50
+
+
+def test_route_template_falls_back_to_route_path_format():
+    route = Route("/items/{item_id:int}", lambda request: None)
+
+    assert _route_template({"route": route}) == "/items/{item_id}"
+    assert _route_template({"fastapi": {}, "route": route}) == "/items/{item_id}"
+    assert _route_template({}) == UNMATCHED_ROUTE
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import pytest
+from sqlalchemy import create_engine, exc, text
+from app.core.pool_metrics import PoolMetrics
+
+
+@pytest.fixture
+def engine():
+    path = os.path.join(tempfile.mkdtemp(prefix="test-pool-"), "pool.sqlite3")
+    engine = create_engine(f"sqlite:///{path}", pool_size=1, max_overflow=0, pool_timeout=0.1)
+    yield engine
+    engine.dispose()
+
+
+def test_checkout_histogram_gauges_and_timeouts(engine):
+    metrics = PoolMetrics(engine, "teste")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert metrics.stats()["in_use"] == 1
+        # pool de 1 conexão ocupado: o segundo checkout esgota o pool_timeout
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    stats = metrics.stats()
+    assert (stats["checkouts"], stats["timeouts"], stats["in_use"], stats["peak_in_use"]) == (1, 1, 0, 1)
+    assert stats["wait_ms"]["buckets"]["+Inf"] == 1
+    assert stats["connects"] == 1
+
+    # o dispose troca o pool; a medição continua no novo
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert metrics.stats()["checkouts"] == 2
+
+
+def test_idle_ping_replaces_dead_connection(engine, monkeypatch):
+    metrics = PoolMetrics(engine, "teste", ping_idle=0)
+    with engine.connect():
+        pass
+
+    pings = iter([False])
+    monkeypatch.setattr(engine.dialect, "do_ping", lambda conn: next(pings, True))
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    stats = metrics.stats()
+    # 0 = ping em todo checkout: 1º checkout, conexão morta e a substituta
+    assert (stats["pings"], stats["ping_failures"]) == (3, 1)
+    assert stats["connects"] == 2
+    assert stats["invalidations"] == 1
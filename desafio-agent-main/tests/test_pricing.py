@@ -0,0 +1,61 @@
+import json
+from types import SimpleNamespace
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from app.services.agent_execution_service import AgentExecutionService
+from app.services.pricing import PricingEngine
+
+
+def write_table(path, version, gpt4o_prompt):
+    path.write_text(json.dumps({
+        "version": version,
+        "models": {
+            "openai:gpt-4o": {"prompt": gpt4o_prompt, "completion": 0.01},
+            "openai:gpt-4o-mini": {"prompt": 0.00015, "completion": 0.0006},
+            "ollama:*": {"prompt": 0.0, "completion": 0.001},
+        },
+        "default": {"prompt": 0.0, "completion": 0.0},
+    }))
+
+
+def test_price_lookup_order(tmp_path):
+    path = tmp_path / "pricing.json"
+    write_table(path, "v1", 0.0025)
+    engine = PricingEngine(str(path), reload_interval=0)
+
+    assert engine.cost("openai", "gpt-4o", 1000, 1000) == 0.0125
+    # maior prefixo cadastrado: não cai no preço do gpt-4o
+    assert engine.price("openai", "gpt-4o-mini-2024-07-18")["prompt"] == 0.00015
+    assert engine.cost("ollama", "llama3", 5000, 2000) == 0.002
+    assert engine.cost("anthropic", "x", 1000, 1000) == 0.0
+
+
+def test_hot_reload_keeps_last_valid_version(tmp_path):
+    import os
+
+    path = tmp_path / "pricing.json"
+    write_table(path, "v1", 0.0025)
+    engine = PricingEngine(str(path), reload_interval=0)
+    assert engine.version == "v1"
+
+    write_table(path, "v2", 0.005)
+    os.utime(path, (1, 1))  # garante mtime diferente
+    assert engine.version == "v2"
+    assert engine.cost("openai", "gpt-4o", 1000, 0) == 0.005
+
+    path.write_text("{ inválido")
+    os.utime(path, (2, 2))
+    assert engine.version == "v2"
+
+
+def test_usage_from_stream_or_estimated():
+    service = AgentExecutionService()
+    agent = SimpleNamespace(provider="openai", model="gpt-4o-mini")
+
+    chunk = AIMessageChunk(content="", usage_metadata={"input_tokens": 12, "output_tokens": 30, "total_tokens": 42})
+    assert service._extract_usage(chunk) == {"prompt_tokens": 12, "completion_tokens": 30}
+    assert service._extract_usage(AIMessageChunk(content="oi")) == {}
+
+    # sem uso informado: estimativa pelo tokenizer
+    usage = service._complete_usage(agent, [HumanMessage(content="Qual o prazo?")], "Cinco dias úteis.", {})
+    assert usage["prompt_tokens"] > 0 and usage["completion_tokens"] > 0
+    assert service._calculate_cost(agent, usage) > 0
@@ -0,0 +1,62 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from app.services.prompt_builder import PromptBuilder, SUMMARY_HEADER
+
+
+def make_history(n: int, size: int = 50) -> list[dict]:
+    return [{"input": f"pergunta {i} " + "x" * size, "output": f"resposta {i} " + "y" * size} for i in range(n)]
+
+
+def test_build_renders_chat_messages():
+    builder = PromptBuilder(max_tokens=4096, summary_tokens=0)
+    messages = builder.build("gpt-4o-mini", make_history(2), "oi")
+
+    assert [type(m) for m in messages] == [HumanMessage, AIMessage, HumanMessage, AIMessage, HumanMessage]
+    assert messages[0].content.startswith("pergunta 0")
+    assert messages[-1].content == "oi"
+
+
+def test_build_trims_oldest_turns_to_budget():
+    builder = PromptBuilder(max_tokens=120, summary_tokens=0)
+    history = make_history(10, size=200)
+    messages = builder.build("llama3", history, "oi")
+
+    assert builder.count("llama3", messages) <= 120
+    assert messages[-1].content == "oi"
+    # as interações mantidas são as mais recentes
+    kept = [m.content for m in messages if isinstance(m, HumanMessage)][:-1]
+    assert kept
+    assert all("pergunta 9" in c or "pergunta 8" in c for c in kept)
+
+
+def test_build_summarizes_dropped_turns():
+    builder = PromptBuilder(max_tokens=600, summary_tokens=200)
+    history = make_history(10, size=400)
+    messages = builder.build("llama3", history, "oi")
+
+    assert isinstance(messages[0], SystemMessage)
+    assert messages[0].content.startswith(SUMMARY_HEADER)
+    assert builder.count("llama3", messages) <= 600
+
+
+def test_build_reserves_summary_budget():
+    builder = PromptBuilder(max_tokens=400, summary_tokens=150)
+    history = make_history(20, size=100)
+    messages = builder.build("llama3", history, "oi")
+
+    # as interações recentes não consomem a parte do resumo
+    assert isinstance(messages[0], SystemMessage)
+    assert any(isinstance(m, AIMessage) for m in messages)
+    assert "pergunta 19" in messages[-3].content
+    assert builder.count("llama3", messages) <= 400
+
+
+def test_build_keeps_everything_that_fits_without_summary():
+    builder = PromptBuilder(max_tokens=4096, summary_tokens=1024)
+    messages = builder.build("llama3", make_history(5), "oi")
+    assert len(messages) == 11
+    assert not isinstance(messages[0], SystemMessage)
+
+
+def test_build_without_history():
+    messages = PromptBuilder().build("gpt-4o", [], "olá")
+    assert messages == [HumanMessage(content="olá")]
@@ -0,0 +1,133 @@
+import io
+import pytest
+from fastapi import UploadFile
+from app.core.config import settings
+from app.services import rag_index
+from app.services.rag_store import partition_exists
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0, 0.0]
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    embeddings = FakeEmbeddings()
+    monkeypatch.setattr(rag_index, "get_embeddings", lambda: embeddings)
+    return embeddings
+
+
+def make_upload(name: str, text: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(text.encode("utf-8")), filename=name)
+
+
+def partition(persist_dir, agent_id=None):
+    with rag_index.rag_store_registry.lease(agent_id, persist_dir) as store:
+        return store
+
+
+def test_index_document_chunks_and_batches(tmp_path, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_CHUNK_SIZE", 100)
+    monkeypatch.setattr(settings, "RAG_CHUNK_OVERLAP", 20)
+    monkeypatch.setattr(settings, "RAG_EMBED_BATCH_SIZE", 4)
+
+    text = " ".join(f"frase número {i}." for i in range(200))
+    result = rag_index.index_document(make_upload("doc.txt", text), persist_dir=str(tmp_path))
+
+    assert result["pages"] == 1
+    assert result["chunks"] > 4
+    assert result["chunks"] == sum(fake_embeddings.calls)
+    assert max(fake_embeddings.calls) <= 4
+    assert result["chunks_per_second"] > 0
+
+    collection = partition(str(tmp_path)).collection
+    assert collection.count() == result["chunks"]
+    stored = collection.get(limit=1, include=["metadatas"])["metadatas"][0]
+    assert stored["filename"] == "doc.txt"
+    assert stored["page"] == 1
+
+
+def test_index_document_rejects_unknown_format(tmp_path, fake_embeddings):
+    with pytest.raises(ValueError):
+        rag_index.index_document(make_upload("doc.exe", "x"), persist_dir=str(tmp_path))
+
+
+def test_reindex_skips_unchanged_and_deletes_stale(tmp_path, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_CHUNK_SIZE", 60)
+    monkeypatch.setattr(settings, "RAG_CHUNK_OVERLAP", 0)
+    paragraphs = [f"parágrafo {i} com algum conteúdo relevante." for i in range(6)]
+    persist_dir = str(tmp_path)
+
+    first = rag_index.index_document(make_upload("doc.md", "\n\n".join(paragraphs)), persist_dir=persist_dir)
+    assert first["chunks_embedded"] == first["chunks"]
+
+    # mesmo arquivo, sem mudanças: nada é reprocessado
+    calls = sum(fake_embeddings.calls)
+    again = rag_index.index_document(make_upload("doc.md", "\n\n".join(paragraphs)), persist_dir=persist_dir)
+    assert again["chunks_skipped"] == first["chunks"]
+    assert sum(fake_embeddings.calls) == calls
+
+    # arquivo alterado: só o trecho novo é embedado e o antigo é removido
+    changed = paragraphs[:-1] + ["parágrafo totalmente novo."]
+    result = rag_index.index_document(make_upload("doc.md", "\n\n".join(changed)), persist_dir=persist_dir)
+    assert result["chunks_embedded"] == 1
+    assert result["chunks_deleted"] == 1
+
+    collection = partition(persist_dir).collection
+    assert collection.count() == first["chunks"]
+
+
+def test_reindex_reuses_vectors_across_files(tmp_path, fake_embeddings):
+    persist_dir = str(tmp_path)
+    rag_index.index_document(make_upload("a.txt", "conteúdo compartilhado"), persist_dir=persist_dir)
+    result = rag_index.index_document(make_upload("b.txt", "conteúdo compartilhado"), persist_dir=persist_dir)
+
+    assert result["chunks_reused"] == 1
+    assert result["chunks_embedded"] == 0
+
+    documents = rag_index.list_documents(persist_dir)
+    assert [d["filename"] for d in documents] == ["a.txt", "b.txt"]
+    assert all(d["chunks"] == 1 and d["indexed_at"] for d in documents)
+
+
+def test_keyword_index_follows_ingestion(tmp_path, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(settings, "RAG_CHUNK_SIZE", 80)
+    monkeypatch.setattr(settings, "RAG_CHUNK_OVERLAP", 0)
+    persist_dir = str(tmp_path)
+    text = "Contratos seguem a Lei 8.666/93.\n\nO prazo de entrega é de cinco dias úteis."
+    rag_index.index_document(make_upload("lei.md", text), persist_dir=persist_dir)
+
+    index = partition(persist_dir).keyword_index
+    docs = index.search("lei 8.666/93", k=2)
+    assert "8.666/93" in docs[0].page_content
+    # acentos são ignorados na busca
+    assert "prazo" in index.search("uteis", k=1)[0].page_content
+
+    # arquivo substituído: chunks removidos saem também do índice BM25
+    rag_index.index_document(make_upload("lei.md", "Novo conteúdo sem identificadores."), persist_dir=persist_dir)
+    assert index.search("8.666/93", k=2) == []
+    assert index.count() == 1
+
+
+def test_agent_collections_are_isolated(tmp_path, fake_embeddings):
+    persist_dir = str(tmp_path)
+    rag_index.index_document(make_upload("a.txt", "manual do agente um"), persist_dir=persist_dir, agent_id=1)
+    result = rag_index.index_document(make_upload("b.txt", "manual do agente dois"), persist_dir=persist_dir, agent_id=2)
+
+    assert result["collection"] == "agent-2"
+    assert [d["filename"] for d in rag_index.list_documents(persist_dir, agent_id=1)] == ["a.txt"]
+    assert [d["filename"] for d in rag_index.list_documents(persist_dir, agent_id=2)] == ["b.txt"]
+    # leitura de partição inexistente não cria a coleção
+    assert rag_index.list_documents(persist_dir) == []
+    assert not partition_exists(persist_dir, None)
+
+    keyword = partition(persist_dir, 2).keyword_index
+    assert [d.metadata["filename"] for d in keyword.search("manual", k=5)] == ["b.txt"]
@@ -0,0 +1,148 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import settings
+from app.services import rag_index
+from app.services.rag_jobs import RagJobQueue, QueueFullError
+
+client = TestClient(app)
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+
+@pytest.fixture(autouse=True)
+def fake_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_index, "get_embeddings", lambda: FakeEmbeddings())
+    monkeypatch.setattr(settings, "CHROMA_PERSIST_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "RAG_CHUNK_SIZE", 100)
+    monkeypatch.setattr(settings, "RAG_CHUNK_OVERLAP", 10)
+
+
+def wait_job(job_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/v1/rag/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("job não terminou")
+
+
+def test_upload_returns_job_and_completes():
+    text = " ".join(f"linha {i}." for i in range(100))
+    response = client.post("/api/v1/rag/upload", files={"file": ("doc.txt", text.encode(), "text/plain")})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] in ("queued", "running", "completed")
+
+    job = wait_job(job["job_id"])
+    assert job["status"] == "completed"
+    assert job["pages_parsed"] == 1
+    assert job["chunks_embedded"] == job["result"]["chunks"] > 1
+    assert job["eta_seconds"] == 0.0
+
+
+def test_upload_rejects_unknown_format():
+    response = client.post("/api/v1/rag/upload", files={"file": ("doc.exe", b"x", "application/octet-stream")})
+    assert response.status_code == 400
+
+
+def test_job_not_found():
+    assert client.get("/api/v1/rag/jobs/inexistente").status_code == 404
+
+
+def test_queue_rejects_when_full(tmp_path):
+    queue = RagJobQueue(workers=1, max_pending=0, history=10)
+    with pytest.raises(QueueFullError):
+        queue.submit("doc.txt", str(tmp_path / "doc.txt"))
+
+
+def test_jobs_for_same_file_run_one_at_a_time(tmp_path, monkeypatch):
+    import threading
+    from app.services import rag_jobs
+
+    running, overlaps, order = set(), [], []
+    lock = threading.Lock()
+
+    def fake_index(file, progress=None, agent_id=None):
+        key = (agent_id, file.filename)
+        with lock:
+            overlaps.append(key in running)
+            running.add(key)
+        time.sleep(0.05)
+        with lock:
+            running.discard(key)
+            order.append(file.file.read().decode())
+        return {"pages": 1, "chunks": 1}
+
+    monkeypatch.setattr(rag_jobs, "index_document", fake_index)
+    queue = RagJobQueue(workers=3, max_pending=10, history=10)
+    jobs = []
+    for n, (name, agent_id) in enumerate([("a.txt", 1), ("a.txt", 1), ("a.txt", 2), ("a.txt", 1)]):
+        path = tmp_path / f"upload-{n}"
+        path.write_text(f"{name}-{agent_id}-{n}")
+        jobs.append(queue.submit(name, str(path), agent_id)["job_id"])
+
+    deadline = time.time() + 5
+    while any(queue.get(j)["status"] != "completed" for j in jobs) and time.time() < deadline:
+        time.sleep(0.01)
+    assert all(queue.get(j)["status"] == "completed" for j in jobs)
+    # nunca dois jobs do mesmo arquivo/partição ao mesmo tempo; a ordem de envio é mantida
+    assert not any(overlaps)
+    assert [o for o in order if o.startswith("a.txt-1")] == ["a.txt-1-0", "a.txt-1-1", "a.txt-1-3"]
+
+
+def test_list_documents_after_upload():
+    response = client.post("/api/v1/rag/upload", files={"file": ("inventario.txt", b"texto do documento", "text/plain")})
+    wait_job(response.json()["job_id"])
+
+    documents = client.get("/api/v1/rag/documents").json()
+    assert [d["filename"] for d in documents] == ["inventario.txt"]
+    assert documents[0]["chunks"] == 1
+
+
+@pytest.fixture
+def empty_db(monkeypatch):
+    import asyncio
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from app.core.db import Base, get_async_db, get_db
+
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+
+    async def create_tables():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+
+    def override_get_db():
+        with sessionmaker(bind=engine)() as db:
+            yield db
+
+    async def override_get_async_db():
+        async with async_sessionmaker(bind=async_engine, class_=AsyncSession)() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
+
+
+def test_reads_reject_unknown_agent(empty_db, tmp_path):
+    body = {"question": "prazo", "agent_id": 999, "mode": "keyword"}
+    assert client.post("/api/v1/rag/search", json=body).status_code == 404
+    assert client.post("/api/v1/rag/query", json=body).status_code == 404
+    assert client.post("/api/v1/rag/query/stream", json=body).status_code == 404
+    assert client.get("/api/v1/rag/documents", params={"agent_id": 999}).status_code == 404
+    # nenhuma partição criada em disco
+    assert not (tmp_path / "bm25").exists()
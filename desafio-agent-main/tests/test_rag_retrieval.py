@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+from langchain_core.documents import Document
+from app.services.rag_retrieval import KeywordIndex, KeywordRetriever, reciprocal_rank_fusion
+
+
+def doc(text: str) -> Document:
+    return Document(page_content=text)
+
+
+def test_reciprocal_rank_fusion_prefers_docs_in_both_lists():
+    a, b, c = doc("a"), doc("b"), doc("c")
+    fused = reciprocal_rank_fusion([[a, b], [c, b]], k=3)
+    assert fused[0].page_content == "b"
+    assert {d.page_content for d in fused} == {"a", "b", "c"}
+
+
+def test_keyword_index_ranks_by_bm25(tmp_path):
+    index = KeywordIndex(str(tmp_path / "bm25.sqlite3"))
+    index.upsert(
+        ["1", "2", "3"],
+        ["contrato de locação residencial", "processo nº 0001234-56.2024", "locação comercial e locação residencial"],
+        [{"filename": "a"}, {"filename": "b"}, {"filename": "c"}],
+    )
+
+    assert index.search("0001234-56.2024", k=3)[0].id == "2"
+    assert [d.id for d in index.search("locação", k=3)] == ["3", "1"]
+    assert index.search("!!!", k=3) == []
+
+    index.upsert(["1"], ["texto novo"], [{"filename": "a"}])
+    index.delete(["3"])
+    assert index.search("locação", k=3) == []
+    assert index.count() == 2
+
+
+def test_keyword_retriever_async_does_not_block_loop_on_index_lock(tmp_path):
+    index = KeywordIndex(str(tmp_path / "bm25.sqlite3"))
+    index.upsert(["1"], ["contrato de locação"], [{"filename": "a"}])
+    retriever = KeywordRetriever(index=index, k=1)
+
+    async def scenario():
+        index._lock.acquire()  # indexação em andamento
+        threading.Timer(0.5, index._lock.release).start()
+        search = asyncio.create_task(retriever.ainvoke("locação"))
+        started = time.perf_counter()
+        await asyncio.sleep(0.05)
+        # o loop segue atendendo enquanto a busca espera o lock
+        assert time.perf_counter() - started < 0.4
+        return await search
+
+    assert [d.id for d in asyncio.run(scenario())] == ["1"]
@@ -0,0 +1,177 @@
+from contextlib import nullcontext
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+from app.services import rag
+from app.services.rag_answer_cache import SemanticAnswerCache
+
+
+class FakeRetriever(BaseRetriever):
+    queries: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        self.queries.append(query)
+        return [Document(page_content="O prazo de entrega é de 5 dias.")]
+
+
+class FakeEmbeddings:
+    """Bag of words: perguntas com as mesmas palavras têm similaridade 1."""
+
+    def embed_query(self, text):
+        vector = [0.0] * 64
+        for word in text.lower().strip("?!. ").split():
+            vector[hash(word) % 64] += 1.0
+        return vector
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+@pytest.fixture(autouse=True)
+def answer_cache(monkeypatch):
+    cache = SemanticAnswerCache(max_size=10, ttl=60, threshold=0.95)
+    monkeypatch.setattr(rag, "rag_answer_cache", cache)
+    return cache
+
+
+def make_service(monkeypatch, responses):
+    monkeypatch.setattr(rag, "ChatOllama", lambda **kwargs: FakeListChatModel(responses=responses))
+    service = rag.RagService()
+    service.embeddings = FakeEmbeddings()
+    service.fake_retriever = FakeRetriever(queries=[])
+    service.retriever = lambda mode=None, agent_id=None: nullcontext(service.fake_retriever)
+    service.aretriever = service.retriever
+    return service
+
+
+def test_query_rag_without_history(monkeypatch):
+    service = make_service(monkeypatch, ["5 dias"])
+
+    assert service.query_rag("Qual o prazo?") == "5 dias"
+    assert service.fake_retriever.queries == ["Qual o prazo?"]
+
+
+def test_query_rag_condenses_question_with_history(monkeypatch):
+    service = make_service(monkeypatch, ["Qual o prazo de entrega?", "5 dias"])
+    monkeypatch.setattr(rag.AgentMemory, "get", classmethod(
+        lambda cls, agent_id: [{"input": "Vocês entregam?", "output": "Sim"}]
+    ))
+
+    assert service.query_rag("E o prazo?", agent_id=1) == "5 dias"
+    # a busca usa a pergunta reescrita (autocontida)
+    assert service.fake_retriever.queries == ["Qual o prazo de entrega?"]
+
+
+def test_rag_query_stream_route(monkeypatch):
+    import json
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.api.v1 import rag as rag_routes
+
+    service = rag_routes.rag_service
+    monkeypatch.setattr(service, "llm", FakeListChatModel(responses=["5 dias"]))
+    fake = FakeRetriever(queries=[])
+    monkeypatch.setattr(service, "aretriever", lambda mode=None, agent_id=None: nullcontext(fake))
+    monkeypatch.setattr(service, "embeddings", FakeEmbeddings())
+
+    response = TestClient(app).post("/api/v1/rag/query/stream", json={"question": "Qual o prazo?"})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+    assert events[0]["type"] == "sources"
+    assert len(events[0]["sources"]) == 1
+    tokens = [e["content"] for e in events if e["type"] == "token"]
+    assert "".join(tokens) == "5 dias"
+    end = events[-1]
+    assert end["type"] == "end"
+    assert end["answer"] == "5 dias"
+    assert set(end["timings"]) == {"condense_ms", "retrieval_ms", "generation_ms", "first_token_ms", "total_ms"}
+
+
+def test_query_rag_uses_semantic_cache(monkeypatch, answer_cache):
+    service = make_service(monkeypatch, ["5 dias", "outra resposta"])
+
+    assert service.query_rag("Qual o prazo?") == "5 dias"
+    assert service.query_rag("qual o prazo") == "5 dias"
+    assert service.fake_retriever.queries == ["Qual o prazo?"]
+    assert answer_cache.stats()["hits"] == 1
+
+    # escopo por agente: outro agente não reaproveita a resposta
+    assert service.query_rag("Qual o prazo?", agent_id=7) == "outra resposta"
+
+
+def test_semantic_cache_skipped_with_history_and_keyword(monkeypatch, answer_cache):
+    service = make_service(monkeypatch, ["Qual o prazo do contrato?", "30 dias", "5 dias"])
+    history = {7: [{"input": "E o contrato?", "output": "Assinado"}]}
+    monkeypatch.setattr(rag.AgentMemory, "get", classmethod(lambda cls, agent_id: history.get(agent_id, [])))
+
+    # a resposta depende do histórico da conversa: nem consulta nem grava no cache
+    assert service.query_rag("E o prazo?", agent_id=7) == "30 dias"
+    assert answer_cache.stats()["size"] == 0
+
+    service.embeddings = None  # keyword: nenhum embedding é gerado
+    assert service.query_rag("E o prazo?", agent_id=3, mode="keyword") == "5 dias"
+    assert answer_cache.stats()["size"] == 0
+
+
+def test_answer_cache_invalidated_by_document(answer_cache):
+    docs = [Document(page_content="x", metadata={"filename": "manual.pdf"})]
+    answer_cache.put((None, "hybrid"), [1.0, 0.0], docs, "resposta")
+    assert answer_cache.get((None, "hybrid"), [0.99, 0.01])
+
+    answer_cache.invalidate_documents({"outro.pdf"})
+    assert answer_cache.get((None, "hybrid"), [1.0, 0.0])
+
+    # reindexar um arquivo de mesmo nome em outro agente não afeta a coleção global
+    answer_cache.invalidate_documents({"manual.pdf"}, agent_id=3)
+    assert answer_cache.get((None, "hybrid"), [1.0, 0.0])
+
+    answer_cache.invalidate_documents({"manual.pdf"})
+    assert answer_cache.get((None, "hybrid"), [1.0, 0.0]) is None
+
+
+class FakeBus:
+    """Pub/sub do redis-py entre caches de workers diferentes."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return self
+
+    def subscribe(self, **handlers):
+        self.subscribers.extend(handlers.values())
+
+    def run_in_thread(self, **kwargs):
+        return None
+
+    def publish(self, channel, data):
+        for handler in self.subscribers:
+            handler({"data": data})
+
+
+def test_answer_cache_invalidation_reaches_other_workers():
+    bus = FakeBus()
+    workers = [SemanticAnswerCache(max_size=10, ttl=60, threshold=0.95, client=bus) for _ in range(2)]
+    docs = [Document(page_content="x", metadata={"filename": "manual.pdf"})]
+    for cache in workers:
+        cache.put((3, "hybrid"), [1.0, 0.0], docs, "resposta")
+
+    # o job de indexação roda num worker só
+    workers[0].invalidate_documents({"manual.pdf"}, agent_id=3)
+    assert [cache.get((3, "hybrid"), [1.0, 0.0]) for cache in workers] == [None, None]
+    assert [cache.stats()["invalidations"] for cache in workers] == [1, 1]
+
+
+def test_answer_cache_matrix_follows_evictions():
+    cache = SemanticAnswerCache(max_size=2, ttl=60, threshold=0.95)
+    docs = [Document(page_content="x", metadata={"filename": "manual.pdf"})]
+    cache.put((None, "hybrid"), [1.0, 0.0], docs, "primeira")
+    cache.put((None, "hybrid"), [0.0, 1.0], docs, "segunda")
+    cache.put((7, "hybrid"), [1.0, 0.0], docs, "outro agente")  # LRU: sai a primeira
+
+    assert cache.get((None, "hybrid"), [1.0, 0.0]) is None
+    assert cache.get((None, "hybrid"), [0.0, 1.0])["answer"] == "segunda"
+    assert cache.get((7, "hybrid"), [1.0, 0.0])["answer"] == "outro agente"
+
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import threading
+from app.services.rag_store import RagStoreRegistry, collection_name
+
+
+def test_collection_name():
+    assert collection_name(None) == "langchain"
+    assert collection_name(7) == "agent-7"
+
+
+def load(registry, agent_id, persist_dir):
+    with registry.lease(agent_id, persist_dir) as store:
+        return store
+
+
+def test_registry_unloads_least_recently_used(tmp_path):
+    registry = RagStoreRegistry(max_size=2, idle_ttl=0)
+    persist_dir = str(tmp_path)
+
+    first = load(registry, 1, persist_dir)
+    assert load(registry, 1, persist_dir) is first
+    load(registry, 2, persist_dir)
+    load(registry, 1, persist_dir)
+    load(registry, 3, persist_dir)  # agente 2 é o menos usado
+
+    stats = registry.stats()
+    assert stats["loaded"] == 2
+    assert stats["unloads"] == 1
+    assert sorted(stats["collections"]) == ["agent-1", "agent-3"]
+
+
+def test_registry_unloads_idle_and_reopens(tmp_path, monkeypatch):
+    from app.services import rag_store
+
+    clock = [0.0]
+    monkeypatch.setattr(rag_store.time, "monotonic", lambda: clock[0])
+    registry = RagStoreRegistry(max_size=10, idle_ttl=60)
+    persist_dir = str(tmp_path)
+
+    store = load(registry, 1, persist_dir)
+    store.keyword_index.upsert(["c1"], ["prazo de entrega"], [{"filename": "a.txt"}])
+
+    clock[0] = 120.0
+    reopened = load(registry, 1, persist_dir)
+    assert reopened is not store
+    assert registry.stats()["unloads"] == 1
+    # dados persistidos: a partição recarregada enxerga o mesmo índice
+    assert reopened.keyword_index.count() == 1
+    registry.clear()
+
+
+def test_registry_keeps_leased_store_open_until_released(tmp_path):
+    registry = RagStoreRegistry(max_size=1, idle_ttl=0)
+    persist_dir = str(tmp_path)
+
+    with registry.lease(1, persist_dir) as store:
+        store.keyword_index.upsert(["c1"], ["prazo de entrega"], [{"filename": "a.txt"}])
+        load(registry, 2, persist_dir)  # descarrega o agente 1, ainda em uso
+        assert store.keyword_index._conn is not None
+        assert registry.stats()["retired"] == 1
+
+        # pedida de novo durante o uso: a mesma instância volta ao cache
+        assert load(registry, 1, persist_dir) is store
+
+        load(registry, 2, persist_dir)
+    # fim do último uso de uma partição descarregada: fechada
+    assert store.keyword_index._conn is None
+    assert registry.stats()["retired"] == 0
+
+
+def test_registry_reads_do_not_create_partitions(tmp_path):
+    registry = RagStoreRegistry(max_size=10, idle_ttl=0)
+    persist_dir = str(tmp_path)
+
+    with registry.lease(42, persist_dir, create=False) as store:
+        assert store is None
+    assert registry.stats()["loads"] == 0
+    assert not os.path.exists(os.path.join(persist_dir, "bm25", "agent-42.sqlite3"))
+
+    load(registry, 42, persist_dir)
+    with registry.lease(42, persist_dir, create=False) as store:
+        # coleção criada, índice BM25 ainda sem escrita: a busca não cria o arquivo
+        assert store.keyword_index.search("prazo", k=1) == []
+    assert not os.path.exists(os.path.join(persist_dir, "bm25", "agent-42.sqlite3"))
+
+
+def test_registry_async_lease_runs_off_the_event_loop(tmp_path):
+    registry = RagStoreRegistry(max_size=10, idle_ttl=0)
+    persist_dir = str(tmp_path)
+    load(registry, 1, persist_dir)
+    threads = []
+    acquire = registry._acquire
+
+    def tracked_acquire(key, create):
+        threads.append(threading.current_thread())
+        return acquire(key, create)
+
+    registry._acquire = tracked_acquire
+
+    async def query():
+        async with registry.alease(1, persist_dir, create=False) as store:
+            assert store is not None
+            assert registry.stats()["in_use"] == 1
+        async with registry.alease(2, persist_dir, create=False) as store:
+            assert store is None
+
+    asyncio.run(query())
+    assert threading.main_thread() not in threads
+    assert registry.stats()["in_use"] == 0
+    registry.clear()
@@ -0,0 +1,84 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.core import tracing
+from app.core.db import Base
+from app.models.agent import Agent
+from app.services.agent_execution_service import AgentExecutionService
+
+
+@pytest.fixture
+def spans():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracing.configure(provider)
+    yield exporter
+    tracing.shutdown()
+
+
+def by_name(exporter) -> dict:
+    return {s.name: s for s in exporter.get_finished_spans()}
+
+
+def test_disabled_tracing_is_a_shared_noop():
+    assert not tracing.enabled()
+    assert tracing.span("x") is tracing.span("y")
+    assert tracing.stream_span("x") is tracing.span("x")
+    fn = lambda: None  # noqa: E731
+    assert tracing.bind_context(fn) is fn
+
+
+def test_run_stream_spans_each_stage(spans, monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    tracing.trace_engine(engine)
+    db = sessionmaker(bind=engine)()
+    agent = Agent(name="trace", model="llama3", temperature=0, owner_id=1, provider="ollama")
+    db.add(agent)
+    db.commit()
+
+    class FakeLLM:
+        def stream(self, prompt):
+            for token in ("Olá", " mundo"):
+                yield SimpleNamespace(content=token)
+
+    service = AgentExecutionService()
+    monkeypatch.setattr(service, "_build_llm", lambda agent: FakeLLM())
+    events = list(service.run_stream(db, agent, "oi"))
+    db.close()
+
+    assert events[-1]["answer"] == "Olá mundo"
+    named = by_name(spans)
+    run = named["agent.run"]
+    for stage in ("agent.input", "llm.stream", "execution.create", "agent.memory.save"):
+        assert named[stage].parent.span_id == run.context.span_id, stage
+    for stage in ("agent.memory.get", "agent.prompt.build"):
+        assert named[stage].parent.span_id == named["agent.input"].context.span_id
+    assert [e.name for e in named["llm.stream"].events] == ["first_token"]
+    assert named["llm.stream"].attributes["gen_ai.usage.output_tokens"] > 0
+    # consultas do create_execution ficam abaixo do span da etapa
+    assert named["db.insert"].parent.span_id == named["execution.create"].context.span_id
+
+
+def test_bind_context_propagates_to_other_threads(spans):
+    def work():
+        with tracing.span("background"):
+            pass
+
+    with tracing.span("request"):
+        thread = threading.Thread(target=tracing.bind_context(work))
+    thread.start()
+    thread.join()
+
+    named = by_name(spans)
+    assert named["background"].context.trace_id == named["request"].context.trace_id
+    assert named["background"].parent.span_id == named["request"].context.span_id